@@ -24,11 +24,11 @@
 
 
 """
-Aggregates IPv4 or IPv6 prefixes.
+Aggregates IPv4 and IPv6 prefixes.
 
 Core method is aggrega_prefixes in module aggregate_prefixes.
-It gets an unsorted list IPv4 or IPv6 prefixes and returns a sorted list of
-aggregates.
+It gets an unsorted list IPv4 and IPv6 prefixes and returns a sorted list of
+aggregates, IPv4 first.
 
 Example:
     >>> from aggregate_prefixes.aggregate_prefixes import aggregate_prefixes
@@ -39,6 +39,8 @@ Example:
     >>>
 """
 
+import importlib
+
 from .__about__ import (
     __author__,
     __author_email__,
@@ -48,10 +50,65 @@ from .__about__ import (
     __url__,
     __version__,
 )
-from .aggregate_prefixes import aggregate_prefixes
+
+# Submodule aggregate_prefixes shares its name with the function, which must
+# shadow it: it is imported upfront. Other public names are imported on first
+# access, so that importing the package only pays for the modules it uses
+from .aggregate_prefixes import (
+    aggregate_prefixes,
+    aggregate_provenance,
+    aggregate_records,
+    diff_aggregates,
+    merge_aggregates,
+)
+
+_EXPORTS = {
+    "Aggregator": "aggregator",
+    "AggregateCache": "cache",
+    "PrefixIndex": "lookup",
+    "Prefix": "prefix",
+    "PrefixArray": "prefix",
+    "difference": "setops",
+    "intersection": "setops",
+    "symmetric_difference": "setops",
+    "union": "setops",
+    "Stats": "stats",
+    "aggregate_stream": "stream",
+    "PrefixTrie": "trie",
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
 
 __all__ = [
     "aggregate_prefixes",
+    "aggregate_records",
+    "aggregate_provenance",
+    "merge_aggregates",
+    "diff_aggregates",
+    "Aggregator",
+    "aggregate_stream",
+    "Stats",
+    "difference",
+    "intersection",
+    "union",
+    "symmetric_difference",
+    "PrefixTrie",
+    "AggregateCache",
+    "Prefix",
+    "PrefixArray",
+    "PrefixIndex",
     "__version__",
     "__author__",
     "__author_email__",
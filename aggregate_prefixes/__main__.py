@@ -23,41 +23,115 @@
 # SOFTWARE.
 
 
+
 """
-Provides CLI interface for package aggregate-prefixes
+Provides CLI entry point for package aggregate-prefixes
+
+Short invocations are dominated by interpreter startup and imports. The most
+common ones, aggregating a single file or STDIN with --max-length, --truncate
+and --strip-host-mask, are parsed by hand and run with the few modules they
+need. Anything else is handed to argparse in module cli.
 """
 
-import argparse
-import logging
 import sys
-from ipaddress import IPv4Network, IPv6Network
-from typing import Union
-
-from aggregate_prefixes import aggregate_prefixes
-
-from .__about__ import __version__ as VERSION
+from typing import Optional
+
+from .aggregate_prefixes import aggregate_records
+from .compression import decompression_errors, open_input
+from .formatting import format_records, write_lines
+# Used to live here, kept importable for compatibility
+from .formatting import strip_host_mask  # noqa: F401 pylint: disable=unused-import
+from .parser import read_prefixes
+
+# Subcommands need the full parser. Spelled out rather than imported from
+# setops, which would load ipaddress
+_SUBCOMMANDS = ("diff", "intersect", "union", "symdiff", "serve", "match")
+_FAST_FLAGS = {"-s": "strip_host_mask", "--strip-host-mask": "strip_host_mask"}
+_FAST_OPTIONS = {
+    "-m": "max_length",
+    "--max-length": "max_length",
+    "-t": "truncate",
+    "--truncate": "truncate",
+}
+
+
+def parse_fast_args(argv: list[str]) -> Optional[dict]:
+    """
+    Parses command line arguments of common invocations
 
+    Arguments:
+    ----------
+    argv: list[str]
+        Command line arguments
 
-def strip_host_mask(prefix: Union[IPv4Network, IPv6Network]) -> str:
+    Returns:
+    --------
+    Optional[dict]: Path, max_length, truncate and strip_host_mask. None if
+        arguments need the full parser
     """
-    Prefix formatting function.
-    Removes netmask if prefix is a host route (/32 IPv4 or /128 IPv6)
+    args = {"path": None, "max_length": 128, "truncate": False, "strip_host_mask": False}
+    if argv and (argv[0] in _SUBCOMMANDS):
+        return None
+
+    arguments = iter(argv)
+    for argument in arguments:
+        option, equals, value = argument.partition("=")
+        if argument in _FAST_FLAGS:
+            args[_FAST_FLAGS[argument]] = True
+        elif option in _FAST_OPTIONS:
+            value = value if equals else next(arguments, "")
+            try:
+                args[_FAST_OPTIONS[option]] = int(value)
+            except ValueError:
+                return None
+        elif args["path"] is None and (argument == "-" or argument[:1] not in ("-", "")):
+            # Glob patterns are expanded by the full parser
+            if any(character in argument for character in "*?["):
+                return None
+            args["path"] = argument
+        else:
+            return None
+
+    if args["path"] is None:
+        args["path"] = "-"
+    return args
+
+
+def fast_main(argv: list[str]) -> bool:
+    """
+    Aggregates IPv4 or IPv6 prefixes from a single file or STDIN, if
+    arguments allow it
 
     Arguments:
     ----------
-    prefix: Union[IPv4Network, IPv6Network]
-        Prefix to be formatted
+    argv: list[str]
+        Command line arguments
 
     Returns:
     --------
-    str: Formatted prefix
+    bool: False if nothing was done, because arguments need the full parser
     """
-    if (prefix.version == 4 and prefix.prefixlen == 32) or (
-        prefix.version == 6 and prefix.prefixlen == 128
-    ):
-        return str(prefix.network_address)
+    args = parse_fast_args(argv)
+    if args is None:
+        return False
+    try:
+        file = open_input(args["path"])
+    except OSError:
+        # The full parser reports errors
+        return False
 
-    return str(prefix)
+    try:
+        for version, records in aggregate_records(
+            read_prefixes(file), args["max_length"], args["truncate"]
+        ):
+            write_lines(format_records(records, version, args["strip_host_mask"]), sys.stdout)
+    except (ValueError, TypeError, *decompression_errors()) as error:
+        sys.exit(f"ERROR: {error}")
+    finally:
+        # STDIN is left open
+        if args["path"] != "-":
+            file.close()
+    return True
 
 
 def main() -> None:
@@ -67,81 +141,12 @@ def main() -> None:
     Reads a list of unsorted IPv4 or IPv6 prefixes from a file or STDIN.
     Returns a sorted list of aggregates to STDOUT.
     """
+    if fast_main(sys.argv[1:]):
+        return
 
-    parser = argparse.ArgumentParser(
-        prog="aggregate-prefixes",
-        description="Aggregates IPv4 or IPv6 prefixes from file or STDIN",
-    )
-    parser.add_argument(
-        "prefixes",
-        type=argparse.FileType("r"),
-        nargs="?",
-        help="Text file of unsorted list of IPv4 or IPv6 prefixes. No argument means STDIN.",
-        default=sys.stdin,
-    )
-    parser.add_argument(
-        "--max-length",
-        "-m",
-        metavar="LENGTH",
-        type=int,
-        help="Discard longer prefixes prior to processing",
-        default=128,
-    )
-    parser.add_argument(
-        "--strip-host-mask",
-        "-s",
-        dest="strip_host_mask",
-        help="Do not print netmask if prefix is a host route (/32 IPv4, /128 IPv6)",
-        action="store_true",
-        default=False,
-    )
-    parser.add_argument(
-        "--truncate",
-        "-t",
-        metavar="MASK",
-        type=int,
-        help="Truncate IP/mask to network/mask",
-        default=False,
-    )
-    parser.add_argument(
-        "--verbose",
-        "-v",
-        help="Display verbose information about the optimisations",
-        action="store_true",
-    )
-    parser.add_argument("--version", "-V", action="version", version="%(prog)s " + VERSION)
-    args = parser.parse_args()
-
-    # Read and cleanup prefixes
-    prefixes = []
-    for line in args.prefixes:
-        text = next(iter(line.split("#"))).strip()
-        if text:
-            prefixes += text.split(" ")
-
-    # Activate verbose logging
-    if args.verbose:
-        logging.basicConfig()
-        logger = logging.getLogger("aggregate_prefixes")
-        logger.propagate = True
-        logger.setLevel(logging.DEBUG)
-
-    try:
-        # Aggregate
-        aggregates = aggregate_prefixes(prefixes, args.max_length, args.truncate)
-    except (ValueError, TypeError) as error:
-        sys.exit(f"ERROR: {error}")
-
-    # Define output formatting function
-    if args.strip_host_mask:
-        formatting_function = strip_host_mask
-    else:
-        formatting_function = str
+    from .cli import main as cli_main  # pylint: disable=import-outside-toplevel
 
-    # Process aggregates and print one per line
-    aggregates = "\n".join(map(formatting_function, aggregates))
-    if aggregates:
-        print(aggregates)
+    cli_main()
 
 
 if __name__ == "__main__":
@@ -28,17 +28,89 @@ Provides core functions for package aggregate-prefixes
 """
 
 
-import logging
-from collections.abc import Iterator
-from ipaddress import IPv4Network, IPv6Network, ip_network
-from typing import Union
+import operator
+import sys
+from collections.abc import Iterable, Iterator
+from contextlib import nullcontext
+from itertools import groupby
+from typing import TYPE_CHECKING, Optional, Union
+
+from .engine import (
+    MAX_PREFIXLEN,
+    aggregate_sorted,
+    aggregate_sorted_provenance,
+    check_lengths,
+    check_sorted,
+    find_ranges,
+    fit_budget,
+    merge_buddies,
+    range_to_prefixes,
+    truncate_records,
+)
+from .parser import parse_prefixes, parse_sorted
+
+# NumPy, process pools, hashing, network objects, logging and anything
+# else that is not needed to aggregate integers is imported when used: they
+# would make up most of the startup time otherwise
+if TYPE_CHECKING:
+    from ipaddress import IPv4Network, IPv6Network
+
+    from .cache import AggregateCache
+    from .prefix import PrefixArray
+    from .stats import Stats
+
+# Value of logging.DEBUG
+_DEBUG = 10
+
+
+class _Logger:
+    """
+    Module logger, imported on first use
+
+    Logging cannot be configured before being imported, so messages are
+    dropped without importing it until someone else does.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.logger = None
+
+    def _get(self):
+        """Returns the logger, if logging was imported"""
+        if self.logger is None and "logging" in sys.modules:
+            self.logger = sys.modules["logging"].getLogger(self.name)
+        return self.logger
+
+    def isEnabledFor(self, level: int) -> bool:  # pylint: disable=invalid-name
+        """Tells whether messages of level are handled"""
+        logger = self._get()
+        return logger is not None and logger.isEnabledFor(level)
+
+    def debug(self, msg: str, *args) -> None:
+        """Logs a debug message"""
+        logger = self._get()
+        if logger is not None:
+            logger.debug(msg, *args)
+
+
+LOGGER = _Logger(__name__)
 
-LOGGER = logging.getLogger(__name__)
+
+def _untimed(_stage: str) -> nullcontext:
+    """
+    Stands in for Stats.timer when stats are not collected
+
+    Parameters:
+    -----------
+    _stage: str
+        Name of the stage, ignored
+    """
+    return nullcontext()
 
 
 def find_aggregatables(
-    prefixes: list[Union[IPv4Network, IPv6Network]],
-) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    prefixes: list[Union["IPv4Network", "IPv6Network"]],
+) -> Iterator[Union["IPv4Network", "IPv6Network"]]:
     """
     Split prefix lists into aggregatable chunks
 
@@ -83,8 +155,8 @@ def find_aggregatables(
 
 
 def aggregate_aggregatable(
-    aggregatable: list[Union[IPv4Network, IPv6Network]],
-) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    aggregatable: list[Union["IPv4Network", "IPv6Network"]],
+) -> Iterator[Union["IPv4Network", "IPv6Network"]]:
     """
     Aggregates aggregatable chunks
 
@@ -100,99 +172,659 @@ def aggregate_aggregatable(
         Aggregates serialized as either IPv4Network or IPv6Network
     """
     LOGGER.debug("Aggregatables: %s", ", ".join(map(str, aggregatable)))
-    aggregatable_end = aggregatable[-1].broadcast_address
-
-    # Assume first item is an agggregte
-    try:
-        aggregate = next(iter(aggregatable))
-    except StopIteration:
+    if not aggregatable:
         return
-    aggregate_end = False
+    network_class = type(aggregatable[0])
+    records = ((int(prefix.network_address), prefix.prefixlen) for prefix in aggregatable)
 
-    for prefix in aggregatable:
-        # Skip prefixes that are part of the current aggregate
-        if aggregate_end and aggregate_end >= prefix.broadcast_address:
-            LOGGER.debug("  Skipping: %s", prefix)
-            continue
-        LOGGER.debug(" Prefix: %s", prefix)
-
-        # Iteratively reduce aggregate length
-        for tentative_len in range(prefix.prefixlen, -1, -1):
-            tentative = ip_network(f"{prefix.network_address}/{tentative_len}", False)
-            LOGGER.debug("  Tentative aggregate: %s", tentative)
-            # If boundaries are exceeded, then exit the loop
-            if (
-                prefix.network_address != tentative.network_address
-                or tentative.broadcast_address > aggregatable_end
-            ):
-                LOGGER.debug("  Boundaries exceeded by netmask: /%d", tentative_len)
-                break
-
-            # At the end of every loop, consider the update aggregate to
-            # current length
-            aggregate = tentative
-            aggregate_end = aggregate.broadcast_address
-
-        # Return aggregate
+    # Buddy blocks are merged in a single pass, instead of trying every
+    # shorter length for every prefix
+    for network, prefixlen in merge_buddies(records, aggregatable[0].max_prefixlen):
+        aggregate = network_class((network, prefixlen))
         LOGGER.debug(" Aggregate found: %s", aggregate)
         yield aggregate
 
 
-def aggregate_prefixes(
-    prefixes: list[Union[str, IPv4Network, IPv6Network]],
+def _aggregate_records(
+    records: list[tuple[int, int]],
+    version: int,
+    engine: str,
+    stats: Optional["Stats"],
+    presorted: bool = False,
+) -> Iterator[tuple[int, int]]:
+    """
+    Aggregates prefixes serialized as integers with the selected engine
+
+    When stats are collected, aggregates are computed upfront so that every
+    stage can be timed. Otherwise they are computed lazily.
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        Unsorted list of (network, prefixlen) tuples. Sorted in place
+    version: int
+        IP version of the records
+    engine: str
+        Aggregation backend
+    stats: Optional[Stats]
+        Collects counters and timings
+    presorted: bool
+        Records are sorted already, python engine skips sorting them
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Sorted iterable of aggregates serialized as (network, prefixlen) tuples
+    """
+    width = MAX_PREFIXLEN[version]
+    timer = stats.timer if stats is not None else _untimed
+
+    if engine == "trie":
+        with timer("build"):
+            from .trie import PrefixTrie  # pylint: disable=import-outside-toplevel
+
+            trie = PrefixTrie()
+            for network, prefixlen in records:
+                trie.insert(version, network, prefixlen)
+        return trie.records(version)
+
+    if engine == "numpy":
+        from . import numpy_engine  # pylint: disable=import-outside-toplevel
+
+        with timer("aggregate"):
+            return numpy_engine.aggregate_records(records, version)
+
+    # Sort prefixes. Smaller network goes first, on tie shorter prefixlen wins
+    if stats is None:
+        if not presorted:
+            records.sort()
+        return aggregate_sorted(records, width)
+
+    if not presorted:
+        with stats.timer("sort"):
+            records.sort()
+    with stats.timer("chunk"):
+        ranges = list(find_ranges(records, width, stats))
+    return (record for first, last in ranges for record in range_to_prefixes(first, last, width))
+
+
+def aggregate_records(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    max_length: int = 128,
+    truncate: int = False,
+    workers: int = 1,
+    engine: str = "python",
+    stats: Optional["Stats"] = None,
+    assume_sorted: bool = False,
+    validate_sorted: bool = False,
+    cache: Optional["AggregateCache"] = None,
+    max_prefixes: Optional[int] = None,
+) -> list[tuple[int, Iterable[tuple[int, int]]]]:
+    """
+    Aggregates IPv4 or IPv6 prefixes into integers.
+
+    Like aggregate_prefixes, but aggregates are left as (network, prefixlen)
+    tuples, so that callers formatting or serializing them never build
+    network objects. Prefixes are consumed right away, aggregates are
+    computed lazily unless stats are collected.
+
+    Parameters
+    ----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    workers: int
+        Number of processes
+    engine: str
+        Aggregation backend
+    stats: Optional[Stats]
+        Collects counters and per-stage timings
+    assume_sorted: bool
+        Prefixes are sorted by network and prefixlen already
+    validate_sorted: bool
+        Like assume_sorted, but order is checked
+    cache: Optional[AggregateCache]
+        Stores and returns aggregates of identical inputs. Not used with
+        assume_sorted or validate_sorted
+    max_prefixes: Optional[int]
+        Maximum number of aggregates of every IP version
+
+    Returns
+    -------
+    list[tuple[int, Iterable[tuple[int, int]]]]:
+        IP version and sorted iterable of aggregates serialized as
+        (network, prefixlen) tuples, for every IP version found in input.
+        IPv4 comes first
+    """
+
+    # Checked before work is split across engines, which fail differently
+    check_lengths(max_length, truncate)
+    if engine not in ("python", "trie", "numpy"):
+        raise ValueError(f"Unknown engine: {engine}")
+    if engine == "numpy":
+        from . import numpy_engine  # pylint: disable=import-outside-toplevel
+
+        if not numpy_engine.AVAILABLE:
+            LOGGER.debug("NumPy is not installed, falling back to python engine")
+            engine = "python"
+
+    # Verbose logging reports stats once, rather than every prefix
+    log_stats = stats is None and LOGGER.isEnabledFor(_DEBUG)
+    if log_stats:
+        from .stats import Stats  # pylint: disable=import-outside-toplevel
+
+        stats = Stats()
+    timer = stats.timer if stats is not None else _untimed
+
+    # Fingerprints ignore input order, while results of assume_sorted and
+    # validate_sorted depend on it
+    if cache is not None and not (assume_sorted or validate_sorted):
+        from .cache import fingerprint  # pylint: disable=import-outside-toplevel
+
+        prefixes = list(prefixes)
+        with timer("cache"):
+            key = fingerprint(prefixes, max_length, truncate, max_prefixes)
+            entry = cache.get(key)
+        LOGGER.debug("Cache %s for %s", "miss" if entry is None else "hit", key)
+        if entry is None:
+            groups = [
+                (version, list(records))
+                for version, records in aggregate_records(
+                    prefixes,
+                    max_length,
+                    truncate,
+                    workers,
+                    engine,
+                    stats,
+                    assume_sorted,
+                    validate_sorted,
+                    max_prefixes=max_prefixes,
+                )
+            ]
+            cache.put(key, groups)
+        else:
+            from .binary import unpack_records  # pylint: disable=import-outside-toplevel
+
+            groups = [(version, unpack_records(buffer, version)) for version, buffer in entry]
+            if stats is not None:
+                stats.inputs += len(prefixes)
+                with timer("aggregate"):
+                    groups = [(version, list(records)) for version, records in groups]
+                stats.aggregates += sum(len(records) for _, records in groups)
+        if log_stats:
+            LOGGER.debug("Aggregation stats:\n%s", stats)
+        return groups
+
+    if workers > 1:
+        from .parallel import (  # pylint: disable=import-outside-toplevel
+            aggregate_parallel_records,
+        )
+
+        groups = aggregate_parallel_records(
+            prefixes,
+            max_length,
+            truncate,
+            workers,
+            stats,
+            assume_sorted,
+            validate_sorted,
+            engine,
+        )
+    else:
+        groups = _aggregate_groups(
+            prefixes, max_length, truncate, engine, stats, assume_sorted, validate_sorted
+        )
+
+    if max_prefixes is not None:
+        with timer("budget"):
+            fitted = []
+            for version, records in groups:
+                records, added = fit_budget(records, MAX_PREFIXLEN[version], max_prefixes)
+                LOGGER.debug("Added %d addresses to fit %d prefixes", added, max_prefixes)
+                if stats is not None:
+                    stats.added += added
+                fitted.append((version, records))
+        groups = fitted
+
+    if stats is not None:
+        with timer("aggregate"):
+            groups = [(version, list(records)) for version, records in groups]
+        stats.aggregates += sum(len(records) for _, records in groups)
+        if log_stats:
+            LOGGER.debug("Aggregation stats:\n%s", stats)
+    return groups
+
+
+def _prepare_records(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    max_length: int,
+    truncate: int,
+    stats: Optional["Stats"],
+    validate_sorted: bool = False,
+) -> list[tuple[int, list[tuple[int, int]]]]:
+    """
+    Parses, filters and truncates IPv4 and IPv6 prefixes
+
+    Prefixes are split by IP version as they are parsed, so that every
+    version is then sorted and scanned on its own, comparing plain integers.
+
+    Parameters:
+    -----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    stats: Optional[Stats]
+        Collects counters and per-stage timings
+    validate_sorted: bool
+        Check that prefixes are sorted by network and prefixlen
+
+    Returns
+    -------
+    list[tuple[int, list[tuple[int, int]]]]:
+        IP version and list of (network, prefixlen) tuples, for every IP
+        version found in input. IPv4 comes first
+    """
+    timer = stats.timer if stats is not None else _untimed
+
+    # Translate prefixes into (network, prefixlen) tuples and discard those
+    # that exceed maxlen
+    with timer("parse"):
+        parsed = parse_prefixes(prefixes)
+    with timer("filter"):
+        ipv4 = [record for record in parsed[4] if record[1] <= max_length]
+        ipv6 = [record for record in parsed[6] if record[1] <= max_length]
+    if stats is not None:
+        stats.inputs += len(parsed[4]) + len(parsed[6])
+        stats.filtered += len(parsed[4]) + len(parsed[6]) - len(ipv4) - len(ipv6)
+    del parsed
+
+    groups = []
+    for version, records in ((4, ipv4), (6, ipv6)):
+        if not records:
+            continue
+        width = MAX_PREFIXLEN[version]
+
+        # Apply truncate
+        if truncate is not False:
+            with timer("filter"):
+                if stats is not None and truncate < width:
+                    stats.truncated += sum(1 for _, prefixlen in records if prefixlen > truncate)
+                records = truncate_records(records, truncate, width)
+
+        # Presorted input stays sorted, as truncating sorted prefixes keeps
+        # them sorted
+        if validate_sorted:
+            with timer("sort"):
+                check_sorted(records, version)
+
+        groups.append((version, records))
+    return groups
+
+
+def _aggregate_groups(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    max_length: int,
+    truncate: int,
+    engine: str,
+    stats: Optional["Stats"],
+    assume_sorted: bool,
+    validate_sorted: bool,
+) -> list[tuple[int, Iterable[tuple[int, int]]]]:
+    """
+    Aggregates IPv4 and IPv6 prefixes in the current process
+
+    Parameters:
+    -----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    engine: str
+        Aggregation backend
+    stats: Optional[Stats]
+        Collects counters and per-stage timings
+    assume_sorted: bool
+        Prefixes are sorted by network and prefixlen already
+    validate_sorted: bool
+        Like assume_sorted, but order is checked
+
+    Returns
+    -------
+    list[tuple[int, Iterable[tuple[int, int]]]]:
+        IP version and sorted iterable of aggregates serialized as
+        (network, prefixlen) tuples, for every IP version found in input.
+        IPv4 comes first
+    """
+    return [
+        (
+            version,
+            _aggregate_records(records, version, engine, stats, assume_sorted or validate_sorted),
+        )
+        for version, records in _prepare_records(
+            prefixes, max_length, truncate, stats, validate_sorted
+        )
+    ]
+
+
+def aggregate_provenance(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
     max_length: int = 128,
     truncate: int = False,
-) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    stats: Optional["Stats"] = None,
+) -> list[tuple[int, list[tuple[int, int]], list[tuple[int, int, int, int]]]]:
     """
-    Aggregates IPv4 or IPv6 prefixes.
+    Aggregates IPv4 or IPv6 prefixes, keeping track of the input prefixes
+    covered by every aggregate.
 
-    Gets a list of unsorted IPv4 or IPv6 prefixes and returns a sorted iterable
-    of aggregates.
+    Inputs are referenced as index ranges into the sorted input, found while
+    aggregates are: no per prefix list or log line is built.
 
     Parameters
     ----------
-    prefixes : list[Union[str, IPv4Network, IPv6Network]]
-        Unsorted list of IPv4 or IPv6 prefixes serialized as either string,
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
         IPv4Network or IPv6Network
     max_length: int
         Discard longer prefixes prior to processing
     truncate: int
         Truncate IP/mask to network/mask
+    stats: Optional[Stats]
+        Collects counters and per-stage timings
+
+    Returns
+    -------
+    list[tuple[int, list[tuple[int, int]], list[tuple[int, int, int, int]]]]:
+        IP version, sorted input serialized as (network, prefixlen) tuples,
+        after max_length and truncate are applied, and aggregates serialized
+        as (network, prefixlen, start, end) tuples: inputs[start:end] are the
+        prefixes covered by the aggregate, for every IP version found in
+        input. IPv4 comes first
+    """
+    timer = stats.timer if stats is not None else _untimed
+
+    check_lengths(max_length, truncate)
+    groups = []
+    for version, records in _prepare_records(prefixes, max_length, truncate, stats):
+        with timer("sort"):
+            records.sort()
+        with timer("aggregate"):
+            aggregates = list(aggregate_sorted_provenance(records, MAX_PREFIXLEN[version]))
+        if stats is not None:
+            stats.aggregates += len(aggregates)
+        groups.append((version, records, aggregates))
+    return groups
+
+
+def aggregate_prefixes(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    max_length: int = 128,
+    truncate: int = False,
+    workers: int = 1,
+    engine: str = "python",
+    stats: Optional["Stats"] = None,
+    assume_sorted: bool = False,
+    validate_sorted: bool = False,
+    cache: Optional["AggregateCache"] = None,
+    max_prefixes: Optional[int] = None,
+    result_type: str = "network",
+) -> Union[Iterator[Union["IPv4Network", "IPv6Network"]], "PrefixArray"]:
+    """
+    Aggregates IPv4 and IPv6 prefixes.
+
+    Gets a list of unsorted IPv4 and IPv6 prefixes and returns a sorted iterable
+    of aggregates. IP versions are aggregated independently, IPv4 aggregates
+    come first.
+
+    Parameters
+    ----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network. Generators are consumed once
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    workers: int
+        Number of processes. More than one spreads the work over a process
+        pool
+    engine: str
+        Aggregation backend: "python" sorts prefixes and scans them, "trie"
+        inserts them in a radix trie, "numpy" uses array operations and
+        falls back to "python" when NumPy is not installed
+    stats: Optional[Stats]
+        Collects counters and per-stage timings. Aggregates are computed
+        upfront when provided
+    assume_sorted: bool
+        Prefixes are sorted by network and prefixlen already, like outputs
+        of previous runs are. Sorting is skipped and order is trusted
+    validate_sorted: bool
+        Like assume_sorted, but order is checked in a linear pass and
+        ValueError is raised if prefixes are not sorted
+    cache: Optional[AggregateCache]
+        Returns stored aggregates when the same prefixes, in any order, were
+        aggregated with the same max_length, truncate and max_prefixes before.
+        Not used with assume_sorted or validate_sorted, whose results depend
+        on input order
+    max_prefixes: Optional[int]
+        Lossy aggregation: aggregates are merged into supernets, adding the
+        fewest addresses, until at most max_prefixes are left for every IP
+        version. Added addresses are counted by stats
+    result_type: str
+        "network" lazily yields IPv4Network or IPv6Network objects, "compact"
+        returns a PrefixArray, computed upfront
+
+    Returns
+    -------
+    Union[Iterator[Union[IPv4Network, IPv6Network]], PrefixArray]:
+        Sorted iterable of IPv4 and IPv6 aggregated prefixes serialized as
+        either IPv4Network or IPv6Network, or PrefixArray. IPv4 comes first
+    """
+    if result_type not in ("network", "compact"):
+        raise ValueError(f"Unknown result type: {result_type}")
+
+    arguments = (
+        prefixes,
+        max_length,
+        truncate,
+        workers,
+        engine,
+        stats,
+        assume_sorted,
+        validate_sorted,
+        cache,
+        max_prefixes,
+    )
+    if result_type == "compact":
+        from .prefix import PrefixArray  # pylint: disable=import-outside-toplevel
+
+        aggregates = PrefixArray()
+        for version, records in aggregate_records(*arguments):
+            aggregates.extend_records(version, records)
+        return aggregates
+
+    return _aggregate_networks(*arguments)
+
+
+def _aggregate_networks(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    max_length: int,
+    truncate: int,
+    workers: int,
+    engine: str,
+    stats: Optional["Stats"],
+    assume_sorted: bool,
+    validate_sorted: bool,
+    cache: Optional["AggregateCache"],
+    max_prefixes: Optional[int],
+) -> Iterator[Union["IPv4Network", "IPv6Network"]]:
+    """
+    Aggregates IPv4 or IPv6 prefixes into network objects, lazily.
+
+    Backs aggregate_prefixes with result_type "network": being a generator,
+    nothing is parsed nor aggregated until the first aggregate is requested.
+    Arguments are those of aggregate_records.
+
+    Returns
+    -------
+    Iterator[Union[IPv4Network, IPv6Network]]:
+        Sorted iterable of IPv4 and IPv6 aggregated prefixes serialized as
+        either IPv4Network or IPv6Network. IPv4 comes first
+    """
+    # Aggregation starts on first iteration
+    groups = aggregate_records(
+        prefixes,
+        max_length,
+        truncate,
+        workers,
+        engine,
+        stats,
+        assume_sorted,
+        validate_sorted,
+        cache,
+        max_prefixes,
+    )
+
+    from ipaddress import IPv4Network, IPv6Network  # pylint: disable=import-outside-toplevel
+
+    # Turn integers back into network objects
+    for version, records in groups:
+        network_class = IPv4Network if version == 4 else IPv6Network
+        if stats is not None:
+            with stats.timer("aggregate"):
+                records = [network_class(record) for record in records]
+            yield from records
+        else:
+            for record in records:
+                yield network_class(record)
+
+
+def merge_aggregates(
+    *iterables: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    validate_sorted: bool = True,
+) -> Iterator[Union["IPv4Network", "IPv6Network"]]:
+    """
+    Merges sorted iterables of IPv4 and IPv6 prefixes, typically aggregates.
+
+    Iterables are heap-merged and the merged stream is aggregated in a single
+    linear pass, without sorting it nor holding it in memory.
+
+    Parameters
+    ----------
+    iterables : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Iterables of IPv4 and IPv6 prefixes sorted by network and prefixlen,
+        IPv4 first, serialized as either string, IPv4Network or IPv6Network
+    validate_sorted: bool
+        Raise ValueError if an iterable is not sorted
 
     Returns
     -------
     Iterator[Union[IPv4Network, IPv6Network]]:
-        Sorted iterable of IPv4 or IPv6 aggregated prefixes serialized as
+        Sorted iterable of IPv4 and IPv6 aggregated prefixes serialized as
+        either IPv4Network or IPv6Network. IPv4 comes first
+    """
+    # pylint: disable=import-outside-toplevel
+    import heapq
+    from ipaddress import IPv4Network, IPv6Network
+
+    merged = heapq.merge(*(parse_sorted(iterable, validate_sorted) for iterable in iterables))
+    for version, records in groupby(merged, key=operator.itemgetter(0)):
+        network_class = IPv4Network if version == 4 else IPv6Network
+        records = ((network, prefixlen) for _, network, prefixlen in records)
+        for record in aggregate_sorted(records, MAX_PREFIXLEN[version]):
+            yield network_class(record)
+
+
+def diff_records(
+    previous: Iterable[tuple[int, int, int]], current: Iterable[tuple[int, int, int]]
+) -> Iterator[tuple[str, int, int, int]]:
+    """
+    Compares two sorted lists of prefixes in a single linear merge pass
+
+    Parameters:
+    -----------
+    previous: Iterable[tuple[int, int, int]]
+        Previous prefixes serialized as (version, network, prefixlen) tuples,
+        sorted
+    current: Iterable[tuple[int, int, int]]
+        Current prefixes serialized as (version, network, prefixlen) tuples,
+        sorted
+
+    Returns
+    -------
+    Iterator[tuple[str, int, int, int]]:
+        Sorted iterable of (sign, version, network, prefixlen) tuples, where
+        sign is "+" for prefixes only found in current and "-" for prefixes
+        only found in previous
+    """
+    # Duplicates are compared once
+    previous = map(operator.itemgetter(0), groupby(previous))
+    current = map(operator.itemgetter(0), groupby(current))
+    old = next(previous, None)
+    new = next(current, None)
+
+    while old is not None and new is not None:
+        if old == new:
+            old = next(previous, None)
+            new = next(current, None)
+        elif old < new:
+            yield ("-", *old)
+            old = next(previous, None)
+        else:
+            yield ("+", *new)
+            new = next(current, None)
+
+    if old is not None:
+        yield ("-", *old)
+        for record in previous:
+            yield ("-", *record)
+    if new is not None:
+        yield ("+", *new)
+        for record in current:
+            yield ("+", *record)
+
+
+def diff_aggregates(
+    previous: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    current: Iterable[Union[str, "IPv4Network", "IPv6Network"]],
+    validate_sorted: bool = True,
+) -> Iterator[tuple[str, Union["IPv4Network", "IPv6Network"]]]:
+    """
+    Compares aggregates with the ones of a previous run.
+
+    Both iterables are walked once, side by side, so that only added and
+    removed aggregates are returned. Neither is sorted nor held in memory.
+
+    Parameters
+    ----------
+    previous : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Previous IPv4 and IPv6 aggregates sorted by network and prefixlen,
+        IPv4 first, serialized as either string, IPv4Network or IPv6Network
+    current : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Current IPv4 and IPv6 aggregates sorted by network and prefixlen,
+        IPv4 first, serialized as either string, IPv4Network or IPv6Network
+    validate_sorted: bool
+        Raise ValueError if an iterable is not sorted
+
+    Returns
+    -------
+    Iterator[tuple[str, Union[IPv4Network, IPv6Network]]]:
+        Sorted iterable of (sign, prefix) tuples, where sign is "+" for
+        added aggregates and "-" for removed ones. Prefixes are serialized as
         either IPv4Network or IPv6Network
     """
+    from ipaddress import IPv4Network, IPv6Network  # pylint: disable=import-outside-toplevel
 
-    # Translate prefixes into a parsable data structure and discard those that
-    # exceed maxlen
-    filtered_prefixes = []
-    for prefix in prefixes:
-        prefix = ip_network(prefix, False)
-        if prefix.prefixlen <= max_length:
-            filtered_prefixes.append(prefix)
-    prefixes = filtered_prefixes
-
-    # Apply truncate
-    if truncate is not False and truncate < 128:
-        prefixes = [
-            (
-                ip_network(f"{prefix.network_address}/{truncate}", False)
-                if prefix.prefixlen > truncate
-                else prefix
-            )
-            for prefix in prefixes
-        ]
-
-    # Sort and filter prefixes. Smaller network goes firt, on tie larger
-    # prefixlen wins
-    prefixes.sort(key=lambda p: (p.network_address, p.prefixlen))
-
-    # Split prefix list into aggregatable chunks
-    aggregatables = find_aggregatables(prefixes)
-
-    # Aggregate aggregatables
-    for aggregatable in aggregatables:
-        yield from aggregate_aggregatable(aggregatable)
+    for sign, version, network, prefixlen in diff_records(
+        parse_sorted(previous, validate_sorted), parse_sorted(current, validate_sorted)
+    ):
+        network_class = IPv4Network if version == 4 else IPv6Network
+        yield sign, network_class((network, prefixlen))
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides incremental aggregation for package aggregate-prefixes
+"""
+
+
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterable, Iterator
+from ipaddress import IPv4Network, IPv6Network
+from typing import Optional, Union
+
+from .engine import MAX_PREFIXLEN, broadcast, range_to_prefixes, truncate_records
+from .parser import parse_prefix, parse_prefixes
+
+
+def _split_records(
+    records: list[tuple[int, int]], width: int
+) -> Iterator[tuple[int, int, list[tuple[int, int]]]]:
+    """
+    Split sorted prefixes into contiguous address ranges, keeping members
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        List of (network, prefixlen) tuples sorted by network and prefixlen
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    Iterator[tuple[int, int, list[tuple[int, int]]]]:
+        Iterable of (first, last, members) tuples, where members is the
+        sorted list of prefixes within the range
+    """
+    if not records:
+        return
+    start = 0
+    first = records[0][0]
+    last = broadcast(records[0][0], records[0][1], width)
+    for index in range(1, len(records)):
+        network, prefixlen = records[index]
+        if network <= last:
+            continue
+        if network != last + 1:
+            yield first, last, records[start:index]
+            start = index
+            first = network
+        last = broadcast(network, prefixlen, width)
+    yield first, last, records[start:]
+
+
+class _Ranges:
+    """
+    Contiguous address ranges of a single IP version, their members and their
+    aggregates, computed again only when a range changes
+
+    Parameters
+    ----------
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.counts: dict[tuple[int, int], int] = {}
+        self._firsts: list[int] = []
+        self._lasts: list[int] = []
+        self._members: list[list[tuple[int, int]]] = []
+        self._aggregates: list[Optional[list[tuple[int, int]]]] = []
+
+    def extend(self, records: list[tuple[int, int]]) -> None:
+        """
+        Adds prefixes to an empty set, all at once
+
+        Parameters:
+        -----------
+        records: list[tuple[int, int]]
+            List of (network, prefixlen) tuples
+        """
+        for record in records:
+            self.counts[record] = self.counts.get(record, 0) + 1
+        for first, last, members in _split_records(sorted(self.counts), self.width):
+            self._firsts.append(first)
+            self._lasts.append(last)
+            self._members.append(members)
+            self._aggregates.append(None)
+
+    def add(self, record: tuple[int, int]) -> None:
+        """
+        Adds a prefix
+
+        Parameters:
+        -----------
+        record: tuple[int, int]
+            (network, prefixlen) tuple
+        """
+        count = self.counts.get(record, 0)
+        self.counts[record] = count + 1
+        if count:
+            return
+
+        first = record[0]
+        last = broadcast(record[0], record[1], self.width)
+
+        # Find ranges overlapping or adjacent to the prefix
+        end = bisect_right(self._firsts, last + 1)
+        start = end
+        while start > 0 and self._lasts[start - 1] + 1 >= first:
+            start -= 1
+
+        members = [member for members in self._members[start:end] for member in members]
+        insort(members, record)
+        if start < end:
+            first = min(first, self._firsts[start])
+            last = max(last, self._lasts[end - 1])
+
+        self._firsts[start:end] = [first]
+        self._lasts[start:end] = [last]
+        self._members[start:end] = [members]
+        self._aggregates[start:end] = [None]
+
+    def remove(self, record: tuple[int, int]) -> bool:
+        """
+        Removes a prefix
+
+        Parameters:
+        -----------
+        record: tuple[int, int]
+            (network, prefixlen) tuple
+
+        Returns
+        -------
+        bool: False if the prefix was never added
+        """
+        count = self.counts.get(record)
+        if not count:
+            return False
+        if count > 1:
+            self.counts[record] = count - 1
+            return True
+        del self.counts[record]
+
+        # Split the range the prefix belonged to
+        index = bisect_right(self._firsts, record[0]) - 1
+        members = self._members[index]
+        del members[bisect_left(members, record)]
+        ranges = list(_split_records(members, self.width))
+
+        self._firsts[index:index + 1] = [first for first, _, _ in ranges]
+        self._lasts[index:index + 1] = [last for _, last, _ in ranges]
+        self._members[index:index + 1] = [members for _, _, members in ranges]
+        self._aggregates[index:index + 1] = [None] * len(ranges)
+        return True
+
+    def records(self) -> Iterator[tuple[int, int]]:
+        """
+        Returns the current aggregates serialized as integers
+
+        Returns
+        -------
+        Iterator[tuple[int, int]]:
+            Sorted iterable of aggregates serialized as (network, prefixlen)
+            tuples
+        """
+        for index, aggregates in enumerate(self._aggregates):
+            if aggregates is None:
+                aggregates = list(
+                    range_to_prefixes(self._firsts[index], self._lasts[index], self.width)
+                )
+                self._aggregates[index] = aggregates
+            yield from aggregates
+
+
+class Aggregator:
+    """
+    Keeps a set of IPv4 and IPv6 prefixes aggregated while it changes.
+
+    Input prefixes are grouped in contiguous address ranges, the same chunks
+    find_aggregatables identifies. Adding or removing a prefix only touches
+    the ranges it belongs to, and only their aggregates are computed again.
+    Every IP version is kept on its own.
+
+    Parameters
+    ----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Initial IPv4 and IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    """
+
+    def __init__(
+        self,
+        prefixes: Iterable[Union[str, IPv4Network, IPv6Network]] = (),
+        max_length: int = 128,
+        truncate: int = False,
+    ):
+        self.max_length = max_length
+        self.truncate = truncate
+        self._ranges = {version: _Ranges(width) for version, width in MAX_PREFIXLEN.items()}
+        for version, records in parse_prefixes(prefixes).items():
+            self._ranges[version].extend(self._filter(records, version))
+
+    def _filter(self, records: list[tuple[int, int]], version: int) -> list[tuple[int, int]]:
+        """
+        Applies max_length and truncate to prefixes
+
+        Parameters:
+        -----------
+        records: list[tuple[int, int]]
+            List of (network, prefixlen) tuples
+        version: int
+            IP version of the records
+
+        Returns
+        -------
+        list[tuple[int, int]]: List of (network, prefixlen) tuples
+        """
+        records = [record for record in records if record[1] <= self.max_length]
+        if self.truncate is not False:
+            records = truncate_records(records, self.truncate, MAX_PREFIXLEN[version])
+        return records
+
+    def _parse(
+        self, prefix: Union[str, IPv4Network, IPv6Network]
+    ) -> Optional[tuple[int, tuple[int, int]]]:
+        """
+        Translates prefix into a (network, prefixlen) tuple
+
+        Parameters:
+        -----------
+        prefix: Union[str, IPv4Network, IPv6Network]
+            Prefix serialized as either string, IPv4Network or IPv6Network
+
+        Returns
+        -------
+        Optional[tuple[int, tuple[int, int]]]:
+            IP version and (network, prefixlen) tuple, None if the prefix is
+            discarded
+        """
+        version, network, prefixlen = parse_prefix(prefix)
+        records = self._filter([(network, prefixlen)], version)
+        if not records:
+            return None
+        return version, records[0]
+
+    def add(self, prefix: Union[str, IPv4Network, IPv6Network]) -> None:
+        """
+        Adds a prefix
+
+        Parameters:
+        -----------
+        prefix: Union[str, IPv4Network, IPv6Network]
+            Prefix serialized as either string, IPv4Network or IPv6Network
+        """
+        parsed = self._parse(prefix)
+        if parsed is not None:
+            version, record = parsed
+            self._ranges[version].add(record)
+
+    def remove(self, prefix: Union[str, IPv4Network, IPv6Network]) -> None:
+        """
+        Removes a prefix
+
+        Parameters:
+        -----------
+        prefix: Union[str, IPv4Network, IPv6Network]
+            Prefix serialized as either string, IPv4Network or IPv6Network
+
+        Raises
+        ------
+        KeyError: If prefix was never added
+        """
+        parsed = self._parse(prefix)
+        if parsed is None:
+            return
+        version, record = parsed
+        if not self._ranges[version].remove(record):
+            raise KeyError(prefix)
+
+    def aggregates(self) -> Iterator[Union[IPv4Network, IPv6Network]]:
+        """
+        Returns the current aggregates
+
+        Returns
+        -------
+        Iterator[Union[IPv4Network, IPv6Network]]:
+            Sorted iterable of IPv4 and IPv6 aggregated prefixes serialized as
+            either IPv4Network or IPv6Network. IPv4 comes first
+        """
+        for version, ranges in self._ranges.items():
+            network_class = IPv4Network if version == 4 else IPv6Network
+            for record in ranges.records():
+                yield network_class(record)
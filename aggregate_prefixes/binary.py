@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides binary prefix-set format for package aggregate-prefixes
+
+A binary prefix set is a 16 bytes header followed by fixed-width records
+sorted by network and prefix length. The header is made of the magic
+"APFX", the format version, the IP version and the number of records.
+Records are network and prefix length in network byte order: 5 bytes for
+IPv4, 17 bytes for IPv6.
+
+Files are memory-mapped when possible, so that records are decoded straight
+from the page cache.
+"""
+
+
+import mmap
+import struct
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import TYPE_CHECKING, BinaryIO, Optional, Union
+
+from .engine import MAX_PREFIXLEN, check_lengths, find_ranges, range_to_prefixes
+
+if TYPE_CHECKING:
+    from .stats import Stats
+
+# Network and prefix length in network byte order. Byte order of records
+# matches numeric order of (network, prefixlen) tuples
+RECORD_STRUCTS = {4: struct.Struct(">IB"), 6: struct.Struct(">QQB")}
+HEADER_STRUCT = struct.Struct(">4sBB2xQ")
+MAGIC = b"APFX"
+FORMAT_VERSION = 1
+_BATCH_RECORDS = 65536
+
+
+def pack_records(records: Iterable[tuple[int, int]], version: int) -> bytes:
+    """
+    Serializes prefixes as fixed-width binary records
+
+    Parameters:
+    -----------
+    records: Iterable[tuple[int, int]]
+        Iterable of (network, prefixlen) tuples
+    version: int
+        IP version of the records
+
+    Returns
+    -------
+    bytes: Binary records
+    """
+    pack = RECORD_STRUCTS[version].pack
+    if version == 4:
+        return b"".join([pack(network, prefixlen) for network, prefixlen in records])
+    return b"".join(
+        [
+            pack(network >> 64, network & 0xFFFFFFFFFFFFFFFF, prefixlen)
+            for network, prefixlen in records
+        ]
+    )
+
+
+def unpack_records(buffer: bytes, version: int) -> Iterator[tuple[int, int]]:
+    """
+    Deserializes fixed-width binary records
+
+    Parameters:
+    -----------
+    buffer: bytes
+        Binary records, length must be a multiple of the record size
+    version: int
+        IP version of the records
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]: Iterable of (network, prefixlen) tuples
+    """
+    records = RECORD_STRUCTS[version].iter_unpack(buffer)
+    if version == 4:
+        return records
+    return ((high << 64 | low, prefixlen) for high, low, prefixlen in records)
+
+
+def _map(file: BinaryIO) -> Union[mmap.mmap, bytes]:
+    """
+    Memory-maps a file, reads it when it can not be mapped (pipes, empty files)
+
+    Parameters:
+    -----------
+    file: BinaryIO
+        File opened in binary mode
+
+    Returns
+    -------
+    Union[mmap.mmap, bytes]: File content
+    """
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return file.read()
+
+
+def read_binary(file: BinaryIO) -> tuple[int, int, Iterator[tuple[int, int]]]:
+    """
+    Reads a binary prefix set
+
+    Header is validated upfront, records are decoded lazily without copying
+    the file content.
+
+    Parameters:
+    -----------
+    file: BinaryIO
+        File opened in binary mode
+
+    Returns
+    -------
+    tuple[int, int, Iterator[tuple[int, int]]]:
+        IP version, number of records and sorted iterable of
+        (network, prefixlen) tuples
+    """
+    buffer = _map(file)
+    if len(buffer) < HEADER_STRUCT.size:
+        raise ValueError("Input is not a binary prefix set")
+    magic, format_version, version, count = HEADER_STRUCT.unpack_from(buffer)
+    if magic != MAGIC or format_version != FORMAT_VERSION or version not in RECORD_STRUCTS:
+        raise ValueError("Input is not a binary prefix set")
+    if len(buffer) != HEADER_STRUCT.size + count * RECORD_STRUCTS[version].size:
+        raise ValueError("Binary prefix set is truncated")
+
+    return version, count, unpack_records(memoryview(buffer)[HEADER_STRUCT.size:], version)
+
+
+def write_binary(file: BinaryIO, records: Iterable[tuple[int, int]], version: int) -> int:
+    """
+    Writes a binary prefix set
+
+    Records are written in batches. When the file is not seekable (pipes),
+    they are held in memory until the number of records is known.
+
+    Parameters:
+    -----------
+    file: BinaryIO
+        File opened in binary mode
+    records: Iterable[tuple[int, int]]
+        Iterable of (network, prefixlen) tuples sorted by network and prefixlen
+    version: int
+        IP version of the records
+
+    Returns
+    -------
+    int: Number of records written
+    """
+    records = iter(records)
+    seekable = file.seekable()
+    if seekable:
+        start = file.tell()
+        file.write(HEADER_STRUCT.pack(MAGIC, FORMAT_VERSION, version, 0))
+    chunks = []
+    count = 0
+    while True:
+        batch = list(islice(records, _BATCH_RECORDS))
+        if not batch:
+            break
+        count += len(batch)
+        if seekable:
+            file.write(pack_records(batch, version))
+        else:
+            chunks.append(pack_records(batch, version))
+
+    header = HEADER_STRUCT.pack(MAGIC, FORMAT_VERSION, version, count)
+    if seekable:
+        end = file.tell()
+        file.seek(start)
+        file.write(header)
+        file.seek(end)
+    else:
+        file.write(header)
+        for chunk in chunks:
+            file.write(chunk)
+    return count
+
+
+def aggregate_binary(
+    file: BinaryIO,
+    max_length: int = 128,
+    truncate: int = False,
+    stats: Optional["Stats"] = None,
+) -> tuple[int, Iterator[tuple[int, int]]]:
+    """
+    Aggregates a binary prefix set.
+
+    Records are already sorted, so they are aggregated in a single pass
+    without being sorted again nor held in memory.
+
+    Parameters
+    ----------
+    file: BinaryIO
+        File opened in binary mode
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    stats: Optional[Stats]
+        Collects inputs, covered, chunks and aggregates counters, once all
+        the aggregates are consumed
+
+    Returns
+    -------
+    tuple[int, Iterator[tuple[int, int]]]:
+        IP version and sorted iterable of aggregates serialized as
+        (network, prefixlen) tuples
+    """
+    check_lengths(max_length, truncate)
+    version, count, records = read_binary(file)
+    width = MAX_PREFIXLEN[version]
+    if stats is not None:
+        stats.inputs += count
+    if max_length < width:
+        records = (record for record in records if record[1] <= max_length)
+    # Truncating sorted prefixes keeps them sorted
+    if truncate is not False and truncate < width:
+        netmask = ~((1 << (width - truncate)) - 1)
+        records = (
+            (network & netmask, truncate) if prefixlen > truncate else (network, prefixlen)
+            for network, prefixlen in records
+        )
+
+    def aggregate() -> Iterator[tuple[int, int]]:
+        aggregates = 0
+        for first, last in find_ranges(records, width, stats):
+            for record in range_to_prefixes(first, last, width):
+                aggregates += 1
+                yield record
+        if stats is not None:
+            stats.aggregates += aggregates
+
+    return version, aggregate()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides result cache for package aggregate-prefixes
+
+Aggregates are stored as binary records, keyed by a fingerprint of the
+input prefixes and of the arguments affecting the result. Recently used
+entries are kept in memory and, optionally, every entry is written to a
+directory as a binary prefix set per IP version, so that it survives across
+processes.
+"""
+
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Iterable
+from ipaddress import IPv4Network, IPv6Network
+from typing import Optional, Union
+
+from .binary import FORMAT_VERSION, HEADER_STRUCT, MAGIC, RECORD_STRUCTS, pack_records
+from .parser import parse_prefixes
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Bumped whenever the fingerprint or the stored format change
+_FINGERPRINT_VERSION = b"3"
+
+
+def fingerprint(
+    prefixes: Iterable[Union[str, IPv4Network, IPv6Network]],
+    max_length: int = 128,
+    truncate: int = False,
+    max_prefixes: Optional[int] = None,
+) -> str:
+    """
+    Fingerprints prefixes regardless of their order and notation
+
+    Prefixes are parsed and their (network, prefixlen) records are sorted
+    and hashed as binary records, so that the same prefixes listed in any
+    order, or spelled differently (e.g. host routes with and without netmask,
+    or IPv6 addresses with and without zero compression), share the same
+    fingerprint. ValueError is raised on invalid input.
+
+    Parameters:
+    -----------
+    prefixes: Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    max_prefixes: Optional[int]
+        Maximum number of aggregates
+
+    Returns
+    -------
+    str: Hexadecimal fingerprint
+    """
+    key = hashlib.blake2b(_FINGERPRINT_VERSION, digest_size=16)
+    for version, records in sorted(parse_prefixes(prefixes).items()):
+        records.sort()
+        key.update(f":{version}:{len(records)}:".encode())
+        key.update(pack_records(records, version))
+    key.update(f":{max_length}:{truncate}".encode())
+    if max_prefixes is not None:
+        key.update(f":{max_prefixes}".encode())
+    return key.hexdigest()
+
+
+def _nbytes(groups: list[tuple[int, bytes]]) -> int:
+    """Size of the records of an entry"""
+    return sum(len(buffer) for _, buffer in groups)
+
+
+def _unpack_groups(buffer: bytes) -> list[tuple[int, bytes]]:
+    """
+    Splits consecutive binary prefix sets
+
+    Parameters:
+    -----------
+    buffer: bytes
+        Binary prefix sets
+
+    Returns
+    -------
+    list[tuple[int, bytes]]: IP version and binary records of every set
+    """
+    groups = []
+    offset = 0
+    while offset < len(buffer):
+        if len(buffer) - offset < HEADER_STRUCT.size:
+            raise ValueError("Input is not a binary prefix set")
+        magic, format_version, version, count = HEADER_STRUCT.unpack_from(buffer, offset)
+        if magic != MAGIC or format_version != FORMAT_VERSION or version not in RECORD_STRUCTS:
+            raise ValueError("Input is not a binary prefix set")
+        offset += HEADER_STRUCT.size
+        end = offset + count * RECORD_STRUCTS[version].size
+        if end > len(buffer):
+            raise ValueError("Binary prefix set is truncated")
+        groups.append((version, buffer[offset:end]))
+        offset = end
+    return groups
+
+
+class AggregateCache:
+    """
+    Least recently used cache of aggregates.
+
+    Entries are evicted from memory once either max_entries or max_bytes is
+    exceeded. Entries stored in directory are never evicted.
+
+    Parameters
+    ----------
+    max_entries: int
+        Maximum number of entries kept in memory
+    max_bytes: int
+        Maximum size of the records kept in memory
+    directory: Optional[str]
+        Directory where entries are written to and read from
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        directory: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.apfx")
+
+    def _store(self, key: str, groups: list[tuple[int, bytes]]) -> None:
+        """
+        Stores an entry in memory, evicting least recently used ones
+        """
+        if key in self._entries:
+            self.nbytes -= _nbytes(self._entries.pop(key))
+        nbytes = _nbytes(groups)
+        if nbytes > self.max_bytes or self.max_entries < 1:
+            return
+        self._entries[key] = groups
+        self.nbytes += nbytes
+        while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= _nbytes(evicted)
+
+    def get(self, key: str) -> Optional[list[tuple[int, bytes]]]:
+        """
+        Looks an entry up, in memory first and then in directory
+
+        Parameters:
+        -----------
+        key: str
+            Fingerprint of the input
+
+        Returns
+        -------
+        Optional[list[tuple[int, bytes]]]:
+            IP version and binary records of the aggregates, for every IP
+            version. None on miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        if self.directory is not None:
+            try:
+                with open(self._path(key), "rb") as file:
+                    groups = _unpack_groups(file.read())
+            except (OSError, ValueError):
+                pass
+            else:
+                self._store(key, groups)
+                self.hits += 1
+                return groups
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, groups: Iterable[tuple[int, Iterable[tuple[int, int]]]]) -> None:
+        """
+        Stores aggregates
+
+        Parameters:
+        -----------
+        key: str
+            Fingerprint of the input
+        groups: Iterable[tuple[int, Iterable[tuple[int, int]]]]
+            IP version and sorted iterable of aggregates serialized as
+            (network, prefixlen) tuples, for every IP version
+        """
+        groups = [(version, pack_records(records, version)) for version, records in groups]
+        self._store(key, groups)
+
+        if self.directory is None:
+            return
+        # Write to a temporary file first, so that concurrent readers never
+        # see partial entries. Entries that can not be written are only kept
+        # in memory, like get() treats unreadable ones as misses
+        file = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix=".tmp", delete=False
+            ) as file:
+                for version, buffer in groups:
+                    count = len(buffer) // RECORD_STRUCTS[version].size
+                    file.write(HEADER_STRUCT.pack(MAGIC, FORMAT_VERSION, version, count))
+                    file.write(buffer)
+            os.replace(file.name, self._path(key))
+        except OSError:
+            if file is not None:
+                try:
+                    os.remove(file.name)
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        """
+        Empties the in-memory cache and resets counters
+        """
+        self._entries.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,780 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides full CLI interface for package aggregate-prefixes
+
+Module __main__ handles the most common invocations without loading it.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import sys
+from collections.abc import Iterable, Iterator
+from ipaddress import IPv4Network, IPv6Network
+from itertools import islice
+from typing import IO, TYPE_CHECKING, BinaryIO, Optional, Union
+
+from .__about__ import __version__ as VERSION
+from .aggregate_prefixes import aggregate_provenance, aggregate_records, diff_records
+from .binary import aggregate_binary, write_binary
+from .cache import AggregateCache
+from .compression import COMPRESSIONS, decompression_errors, open_input, open_output
+from .engine import MAX_PREFIXLEN
+from .formatting import format_ipv4, format_ipv6, format_networks, format_records, write_lines
+from .parser import parse_sorted, read_prefixes
+from .server import DEFAULT_REQUEST_LIMIT, serve
+from .setops import SET_OPERATIONS
+from .sources import aggregate_by_source, aggregate_sources, expand_sources
+from .stats import Stats
+from .stream import DEFAULT_CHUNK_SIZE, aggregate_stream
+
+if TYPE_CHECKING:
+    from .lookup import PrefixIndex
+    from .prefix import Prefix
+
+DEFAULT_BATCH_SIZE = 65536
+
+
+def print_stats(stats: Optional[Stats], stats_format: Optional[str]) -> None:
+    """
+    Prints processing statistics to STDERR
+
+    Arguments:
+    ----------
+    stats: Optional[Stats]
+        Statistics, nothing is printed if None
+    stats_format: Optional[str]
+        Either "text" or "json"
+    """
+    if stats is None:
+        return
+    if stats_format == "json":
+        print(json.dumps(stats.as_dict()), file=sys.stderr)
+    else:
+        print(stats, file=sys.stderr)
+
+
+def set_operation_main(operation: str, argv: list[str]) -> None:
+    """
+    Applies a set operation to two lists of IPv4 and IPv6 prefixes.
+
+    Arguments:
+    ----------
+    operation: str
+        Name of the operation, key of SET_OPERATIONS
+    argv: list[str]
+        Command line arguments following the operation name
+    """
+    parser = argparse.ArgumentParser(
+        prog=f"aggregate-prefixes {operation}",
+        description=SET_OPERATIONS[operation].__doc__.strip().splitlines()[0],
+    )
+    parser.add_argument(
+        "left",
+        help=(
+            "Text file of unsorted list of IPv4 or IPv6 prefixes, optionally compressed. "
+            "Use '-' for STDIN."
+        ),
+    )
+    parser.add_argument(
+        "right",
+        help=(
+            "Text file of unsorted list of IPv4 or IPv6 prefixes, optionally compressed. "
+            "Use '-' for STDIN."
+        ),
+    )
+    parser.add_argument(
+        "--strip-host-mask",
+        "-s",
+        dest="strip_host_mask",
+        help="Do not print netmask if prefix is a host route (/32 IPv4, /128 IPv6)",
+        action="store_true",
+        default=False,
+    )
+    args = parser.parse_args(argv)
+    left = _open(parser, args.left, argument="left")
+    right = _open(parser, args.right, argument="right")
+
+    try:
+        write_lines(
+            format_networks(
+                SET_OPERATIONS[operation](read_prefixes(left), read_prefixes(right)),
+                args.strip_host_mask,
+            ),
+            sys.stdout,
+        )
+    except (ValueError, TypeError) as error:
+        sys.exit(f"ERROR: {error}")
+    finally:
+        for path, file in ((args.left, left), (args.right, right)):
+            # STDIN is left open
+            if path != "-":
+                file.close()
+
+
+def serve_main(argv: list[str]) -> None:
+    """
+    Runs the aggregation service until interrupted.
+
+    Arguments:
+    ----------
+    argv: list[str]
+        Command line arguments following the subcommand name
+    """
+    parser = argparse.ArgumentParser(
+        prog="aggregate-prefixes serve",
+        description="Serves aggregation requests over a Unix socket or TCP",
+    )
+    listen = parser.add_mutually_exclusive_group(required=True)
+    listen.add_argument("--socket", metavar="PATH", help="Unix socket path")
+    listen.add_argument("--port", type=int, help="TCP port")
+    parser.add_argument("--host", help="Address TCP socket binds to", default="127.0.0.1")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        metavar="JOBS",
+        type=int,
+        help="Number of processes running large requests. Defaults to CPU count",
+        default=None,
+    )
+    parser.add_argument(
+        "--request-limit",
+        metavar="PREFIXES",
+        type=int,
+        help=(
+            "Maximum number of prefixes in a request, larger requests are refused. "
+            f"Default: {DEFAULT_REQUEST_LIMIT}"
+        ),
+        default=DEFAULT_REQUEST_LIMIT,
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        help="Log connections",
+        action="store_true",
+    )
+    args = parser.parse_args(argv)
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port, args.jobs, args.request_limit))
+    except OSError as error:
+        sys.exit(f"ERROR: {error}")
+    except KeyboardInterrupt:
+        pass
+
+
+def match_batch(
+    index: "PrefixIndex", batch: list[str]
+) -> Iterator[tuple[str, Optional["Prefix"]]]:
+    """
+    Looks up a batch of addresses, reporting malformed ones on STDERR
+
+    Arguments:
+    ----------
+    index: PrefixIndex
+        Set of prefixes
+    batch: list[str]
+        Addresses
+
+    Returns:
+    --------
+    Iterator[tuple[str, Optional[Prefix]]]:
+        Well formed addresses and the prefix covering them, if any
+    """
+    try:
+        yield from zip(batch, index.lookup_many(batch))
+    except ValueError:
+        # Addresses are looked up one by one to skip malformed ones
+        for address in batch:
+            try:
+                yield address, index.lookup(address)
+            except ValueError as error:
+                print(f"ERROR: {error}", file=sys.stderr)
+
+
+def match_main(argv: list[str]) -> None:
+    """
+    Prints addresses covered by a set of prefixes, batch by batch.
+
+    Malformed addresses are reported on STDERR and skipped.
+
+    Arguments:
+    ----------
+    argv: list[str]
+        Command line arguments following the subcommand name
+    """
+    parser = argparse.ArgumentParser(
+        prog="aggregate-prefixes match",
+        description=(
+            "Prints addresses covered by a set of IPv4 or IPv6 prefixes. "
+            "Malformed addresses are reported on STDERR and skipped"
+        ),
+    )
+    parser.add_argument(
+        "addresses",
+        nargs="*",
+        help="Text files of IPv4 or IPv6 addresses. No argument or '-' means STDIN.",
+        default=["-"],
+    )
+    parser.add_argument(
+        "--set",
+        dest="prefix_set",
+        metavar="FILE",
+        required=True,
+        help="Text file of IPv4 or IPv6 prefixes, typically aggregates",
+    )
+    parser.add_argument(
+        "--invert",
+        help="Print addresses that are not covered instead",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--with-prefix",
+        "-p",
+        help="Follow every address with the prefix covering it",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--batch-size",
+        metavar="ADDRESSES",
+        type=int,
+        help="Number of addresses looked up at once",
+        default=DEFAULT_BATCH_SIZE,
+    )
+    args = parser.parse_args(argv)
+
+    # NumPy is only worth loading for lookups
+    from .lookup import PrefixIndex  # pylint: disable=import-outside-toplevel
+
+    try:
+        index = PrefixIndex(read_prefixes(_read_lines(parser, [args.prefix_set], "--set")))
+        addresses = read_prefixes(_read_lines(parser, args.addresses, argument="addresses"))
+        while True:
+            batch = list(islice(addresses, args.batch_size))
+            if not batch:
+                break
+            matches = match_batch(index, batch)
+            if args.invert:
+                write_lines((address for address, match in matches if match is None), sys.stdout)
+            elif args.with_prefix:
+                write_lines(
+                    (f"{address} {match}" for address, match in matches if match is not None),
+                    sys.stdout,
+                )
+            else:
+                write_lines(
+                    (address for address, match in matches if match is not None), sys.stdout
+                )
+            sys.stdout.flush()
+    except (ValueError, TypeError, *decompression_errors()) as error:
+        sys.exit(f"ERROR: {error}")
+
+
+def group_networks(
+    aggregates: Iterable[Union[IPv4Network, IPv6Network]]
+) -> list[tuple[int, list[tuple[int, int]]]]:
+    """
+    Groups aggregates by IP version, as integer records
+
+    Arguments:
+    ----------
+    aggregates: Iterable[Union[IPv4Network, IPv6Network]]
+        Sorted aggregates, IPv4 first
+
+    Returns:
+    --------
+    list[tuple[int, list[tuple[int, int]]]]: (version, records) tuples
+    """
+    groups = []
+    for aggregate in aggregates:
+        if not groups or groups[-1][0] != aggregate.version:
+            groups.append((aggregate.version, []))
+        groups[-1][1].append((int(aggregate.network_address), aggregate.prefixlen))
+    return groups
+
+
+def write_groups_binary(
+    groups: list[tuple[int, Iterable[tuple[int, int]]]], compression: Optional[str]
+) -> None:
+    """
+    Writes aggregates to STDOUT as binary prefix set
+
+    STDOUT is left untouched if aggregates span both IP versions.
+
+    Arguments:
+    ----------
+    groups: list[tuple[int, Iterable[tuple[int, int]]]]
+        (version, records) tuples
+    compression: Optional[str]
+        Compression, None for plain output
+    """
+    if len(groups) > 1:
+        raise ValueError("Binary prefix sets hold a single IP version")
+    version, records = groups[0] if groups else (4, [])
+    file = open_output(sys.stdout.buffer, compression) if compression else sys.stdout.buffer
+    write_binary(file, records, version)
+    # Flush compressor, STDOUT is left open
+    if compression:
+        file.close()
+    sys.stdout.buffer.flush()
+
+
+def format_deltas(
+    previous: Iterable[str], current: Iterable[tuple[int, int, int]], strip: bool = False
+) -> Iterator[str]:
+    """
+    Formats aggregates added or removed since a previous run as +prefix and
+    -prefix lines
+
+    Arguments:
+    ----------
+    previous: Iterable[str]
+        Sorted aggregates of the previous run
+    current: Iterable[tuple[int, int, int]]
+        Sorted aggregates serialized as (version, network, prefixlen) tuples
+    strip: bool
+        Do not append netmask if prefix is a host route
+
+    Returns:
+    --------
+    Iterator[str]: Formatted deltas
+    """
+    format_address = {4: format_ipv4, 6: format_ipv6}
+    for sign, version, network, prefixlen in diff_records(parse_sorted(previous), current):
+        if strip and prefixlen == MAX_PREFIXLEN[version]:
+            yield sign + format_address[version](network)
+        else:
+            yield f"{sign}{format_address[version](network)}/{prefixlen}"
+
+
+def format_provenance(
+    inputs: list[tuple[int, int]],
+    aggregates: Iterable[tuple[int, int, int, int]],
+    version: int,
+    strip: bool = False,
+) -> Iterator[str]:
+    """
+    Formats aggregates and the input prefixes they cover as JSON lines
+
+    Arguments:
+    ----------
+    inputs: list[tuple[int, int]]
+        Sorted input serialized as (network, prefixlen) tuples
+    aggregates: Iterable[tuple[int, int, int, int]]
+        Aggregates serialized as (network, prefixlen, start, end) tuples
+    version: int
+        IP version of the prefixes
+    strip: bool
+        Do not append netmask if prefix is a host route
+
+    Returns:
+    --------
+    Iterator[str]: JSON objects with keys aggregate, start, end and inputs
+    """
+    for network, prefixlen, start, end in aggregates:
+        yield json.dumps(
+            {
+                "aggregate": next(format_records([(network, prefixlen)], version, strip)),
+                "start": start,
+                "end": end,
+                "inputs": list(format_records(inputs[start:end], version, strip)),
+            }
+        )
+
+
+def _open(
+    parser: argparse.ArgumentParser, path: str, binary: bool = False, argument: str = "prefixes"
+) -> IO:
+    """
+    Opens an input file, decompressing it if it is compressed. Exits like
+    argparse does if it can not be opened
+
+    Arguments:
+    ----------
+    parser: argparse.ArgumentParser
+        Command line parser
+    path: str
+        File path or "-" for STDIN
+    binary: bool
+        Open in binary mode
+    argument: str
+        Name of the argument path comes from, for error messages
+
+    Returns:
+    --------
+    IO: Open file
+    """
+    try:
+        return open_input(path, binary)
+    except OSError as error:
+        parser.error(f"argument {argument}: can't open '{path}': {error}")
+
+
+def _read_lines(
+    parser: argparse.ArgumentParser, paths: list[str], argument: str = "prefixes"
+) -> Iterator[str]:
+    """
+    Reads lines of input files one after the other, closing every file once
+    it is exhausted. Exits like argparse does if a file can not be opened
+
+    Arguments:
+    ----------
+    parser: argparse.ArgumentParser
+        Command line parser
+    paths: list[str]
+        File paths or "-" for STDIN
+    argument: str
+        Name of the argument paths come from, for error messages
+
+    Returns:
+    --------
+    Iterator[str]: Lines of text
+    """
+    for path in paths:
+        file = _open(parser, path, argument=argument)
+        try:
+            yield from file
+        finally:
+            # STDIN is left open
+            if path != "-":
+                file.close()
+
+
+def main() -> None:
+    """
+    Aggregates IPv4 or IPv6 prefixes from file or STDIN.
+
+    Reads a list of unsorted IPv4 or IPv6 prefixes from a file or STDIN.
+    Returns a sorted list of aggregates to STDOUT.
+    """
+
+    # Set operations, service and lookups are subcommands
+    if len(sys.argv) > 1 and sys.argv[1] in SET_OPERATIONS:
+        set_operation_main(sys.argv[1], sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "match":
+        match_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        prog="aggregate-prefixes",
+        description="Aggregates IPv4 and IPv6 prefixes from file or STDIN",
+        epilog=(
+            "Set operations: aggregate-prefixes {diff,intersect,union,symdiff} LEFT RIGHT. "
+            "Service: aggregate-prefixes serve {--socket PATH,--port PORT}. "
+            "Lookups: aggregate-prefixes match --set FILE [ADDRESSES ...]"
+        ),
+    )
+    parser.add_argument(
+        "prefixes",
+        nargs="*",
+        help=(
+            "Text files or glob patterns of unsorted lists of IPv4 or IPv6 prefixes. "
+            "No argument or '-' means STDIN."
+        ),
+        default=["-"],
+    )
+    parser.add_argument(
+        "--max-length",
+        "-m",
+        metavar="LENGTH",
+        type=int,
+        help="Discard longer prefixes prior to processing",
+        default=128,
+    )
+    parser.add_argument(
+        "--strip-host-mask",
+        "-s",
+        dest="strip_host_mask",
+        help="Do not print netmask if prefix is a host route (/32 IPv4, /128 IPv6)",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--truncate",
+        "-t",
+        metavar="MASK",
+        type=int,
+        help="Truncate IP/mask to network/mask",
+        default=False,
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        metavar="JOBS",
+        type=int,
+        help="Number of processes used to aggregate. Ignored in stream mode",
+        default=1,
+    )
+    parser.add_argument(
+        "--stream",
+        help="Sort input externally in bounded memory, using temporary files",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--chunk-size",
+        metavar="PREFIXES",
+        type=int,
+        help="Number of prefixes sorted in memory in stream mode",
+        default=DEFAULT_CHUNK_SIZE,
+    )
+    parser.add_argument(
+        "--max-prefixes",
+        metavar="PREFIXES",
+        type=int,
+        help=(
+            "Merge aggregates into supernets, adding the fewest addresses, until at most "
+            "PREFIXES are left for every IP version. Not available in stream mode nor with "
+            "binary input"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="Reuse aggregates of identical inputs stored in DIR. Only used with a single file",
+        default=None,
+    )
+    parser.add_argument(
+        "--group-by-source",
+        help="Aggregate every file on its own. Aggregates follow a '# FILE' comment line",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--provenance",
+        help=(
+            "Print aggregates as JSON lines, along with the input prefixes they cover and "
+            "their index range in sorted input"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--previous",
+        metavar="FILE",
+        help=(
+            "Sorted aggregates of a previous run. Print only added and removed aggregates, "
+            "as +PREFIX and -PREFIX lines"
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=["text", "bin"],
+        help="Input format: text (default) or sorted binary prefix set, memory-mapped",
+        default="text",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["text", "bin"],
+        help="Output format: text (default) or binary prefix set",
+        default="text",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=COMPRESSIONS,
+        help="Compress output. Compressed input is detected from magic bytes or extension",
+        default=None,
+    )
+    parser.add_argument(
+        "--stats",
+        help="Print processing statistics to STDERR",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stats-format",
+        choices=["text", "json"],
+        help="Format of --stats: text (default) or JSON",
+        default="text",
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        help="Display verbose information about the optimisations",
+        action="store_true",
+    )
+    parser.add_argument("--version", "-V", action="version", version="%(prog)s " + VERSION)
+    args = parser.parse_args()
+
+    # Activate verbose logging
+    if args.verbose:
+        logging.basicConfig()
+        logger = logging.getLogger("aggregate_prefixes")
+        logger.propagate = True
+        logger.setLevel(logging.DEBUG)
+
+    # Addresses added by --max-prefixes are always reported
+    stats = Stats() if args.stats or args.max_prefixes is not None else None
+
+    try:
+        paths = expand_sources(args.prefixes)
+    except ValueError as error:
+        parser.error(str(error))
+    if args.group_by_source and (
+        args.stream or args.input_format == "bin" or args.output_format == "bin"
+    ):
+        parser.error("--group-by-source requires text input and output, without --stream")
+    if args.provenance and (
+        args.stream
+        or args.group_by_source
+        or args.max_prefixes is not None
+        or args.input_format == "bin"
+        or args.output_format == "bin"
+    ):
+        parser.error(
+            "--provenance requires text input and output, without --stream, "
+            "--group-by-source or --max-prefixes"
+        )
+    if args.previous and (args.group_by_source or args.provenance or args.output_format == "bin"):
+        parser.error(
+            "--previous requires text output, without --group-by-source or --provenance"
+        )
+    if args.max_prefixes is not None and (args.stream or args.input_format == "bin"):
+        parser.error("--max-prefixes is not available with --stream or binary input")
+    if len(paths) > 1 and args.input_format == "bin":
+        parser.error("binary input is read from a single file")
+    previous_file = previous = None
+    if args.previous:
+        try:
+            previous_file = open_input(args.previous)
+            previous = read_prefixes(previous_file)
+        except OSError as error:
+            parser.error(f"argument --previous: can't open '{args.previous}': {error}")
+
+    # Output is optionally compressed. Binary output is opened once it is
+    # known to be valid, not to leave a partial file behind
+    output = sys.stdout
+    if args.compress and args.output_format == "text":
+        try:
+            output = io.TextIOWrapper(
+                open_output(sys.stdout.buffer, args.compress), encoding="utf-8"
+            )
+        except ValueError as error:
+            parser.error(str(error))
+
+    try:
+        if args.provenance:
+            # Inputs of every aggregate are sliced from sorted input
+            lines = _read_lines(parser, paths)
+            for version, inputs, aggregates in aggregate_provenance(
+                read_prefixes(lines), args.max_length, args.truncate, stats
+            ):
+                write_lines(
+                    format_provenance(inputs, aggregates, version, args.strip_host_mask),
+                    output,
+                )
+            groups = []
+        elif args.group_by_source:
+            # Files are aggregated concurrently, results are printed in order
+            for path, groups in aggregate_by_source(
+                paths, args.max_length, args.truncate, args.jobs, stats, args.max_prefixes
+            ):
+                output.write(f"# {path}\n")
+                for version, records in groups:
+                    write_lines(format_records(records, version, args.strip_host_mask), output)
+            groups = []
+        elif args.input_format == "bin":
+            # Binary prefix sets are sorted already
+            file = _open(parser, paths[0], binary=True)
+            groups = [aggregate_binary(file, args.max_length, args.truncate, stats)]
+        elif args.stream:
+            # Aggregates are printed as soon as they are found
+            lines = _read_lines(parser, paths)
+            aggregates = aggregate_stream(
+                lines, args.max_length, args.truncate, args.chunk_size, stats=stats
+            )
+            groups = []
+            if args.output_format == "bin":
+                # Binary prefix sets are written once complete
+                groups = group_networks(aggregates)
+            elif args.previous:
+                current = (
+                    (aggregate.version, int(aggregate.network_address), aggregate.prefixlen)
+                    for aggregate in aggregates
+                )
+                write_lines(format_deltas(previous, current, args.strip_host_mask), output)
+            else:
+                write_lines(format_networks(aggregates, args.strip_host_mask), output)
+        elif len(paths) > 1:
+            # Files are read and parsed concurrently
+            groups = aggregate_sources(
+                paths, args.max_length, args.truncate, args.jobs, stats, args.max_prefixes
+            )
+        else:
+            # Input is parsed as it is read, aggregates are formatted
+            # straight from integers
+            lines = _read_lines(parser, paths)
+            cache = AggregateCache(directory=args.cache_dir) if args.cache_dir else None
+            groups = aggregate_records(
+                read_prefixes(lines),
+                args.max_length,
+                args.truncate,
+                workers=args.jobs,
+                stats=stats,
+                cache=cache,
+                max_prefixes=args.max_prefixes,
+            )
+        if args.previous and not args.stream:
+            # Aggregates are compared with the previous ones as they are formatted
+            current = (
+                (version, network, prefixlen)
+                for version, records in groups
+                for network, prefixlen in records
+            )
+            write_lines(format_deltas(previous, current, args.strip_host_mask), output)
+            groups = []
+
+        if args.output_format == "bin":
+            write_groups_binary(list(groups), args.compress)
+        else:
+            for version, records in groups:
+                write_lines(format_records(records, version, args.strip_host_mask), output)
+        # Flush compressor, STDOUT is left open
+        if output is not sys.stdout:
+            output.close()
+    except (ValueError, TypeError, *decompression_errors()) as error:
+        sys.exit(f"ERROR: {error}")
+    finally:
+        if previous_file is not None and args.previous != "-":
+            previous_file.close()
+
+    if args.stats:
+        print_stats(stats, args.stats_format)
+    elif stats is not None and stats.added:
+        print(
+            f"Added {stats.added} addresses to fit {args.max_prefixes} prefixes per IP version",
+            file=sys.stderr,
+        )
+
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides thin client for the aggregation service of package aggregate-prefixes
+
+The client only depends on the socket module, so that scripts calling it
+do not pay for importing the aggregation machinery.
+"""
+
+import os
+import socket
+import sys
+from collections.abc import Iterable, Iterator
+from typing import Optional
+
+SOCKET_ENVIRONMENT = "AGGREGATE_PREFIXES_SOCKET"
+_SEND_LINES = 4096
+
+
+def aggregate_remote(
+    prefixes: Iterable[str],
+    path: Optional[str] = None,
+    host: str = "127.0.0.1",
+    port: Optional[int] = None,
+    max_length: int = 128,
+    truncate: int = False,
+    strip_host_mask: bool = False,
+) -> Iterator[str]:
+    """
+    Aggregates IPv4 or IPv6 prefixes with the aggregation service.
+
+    Parameters
+    ----------
+    prefixes : Iterable[str]
+        Unsorted IPv4 or IPv6 prefixes, or lines of text made of them
+    path: Optional[str]
+        Unix socket path. Takes precedence over host and port
+    host: str
+        Service address
+    port: Optional[int]
+        Service TCP port
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    strip_host_mask: bool
+        Do not return netmask if prefix is a host route
+
+    Returns
+    -------
+    Iterator[str]: Sorted iterable of aggregates serialized as strings
+    """
+    header = f"AGGREGATE max-length={max_length}"
+    if truncate is not False:
+        header += f" truncate={truncate}"
+    if strip_host_mask:
+        header += " strip-host-mask"
+
+    if path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+    elif port is not None:
+        connection = socket.create_connection((host, port))
+    else:
+        raise ValueError("Either a Unix socket path or a TCP port is required")
+
+    with connection:
+        connection.sendall(f"{header}\n".encode())
+        batch = []
+        for prefix in prefixes:
+            batch.append(prefix.rstrip("\n"))
+            if len(batch) >= _SEND_LINES:
+                connection.sendall(("\n".join(batch) + "\n").encode())
+                batch = []
+        batch.append(".")
+        connection.sendall(("\n".join(batch) + "\n").encode())
+
+        with connection.makefile("r", encoding="utf-8") as response:
+            for line in response:
+                line = line.rstrip("\n")
+                if line == ".":
+                    return
+                if line.startswith("ERROR: "):
+                    raise ValueError(line[len("ERROR: "):])
+                yield line
+        raise ConnectionError("Connection closed before the end of the response")
+
+
+def main() -> None:
+    """
+    Aggregates IPv4 or IPv6 prefixes from file or STDIN with the aggregation
+    service. Returns a sorted list of aggregates to STDOUT.
+    """
+    # Only the command line needs argparse
+    import argparse  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(
+        prog="aggregate-prefixes-client",
+        description="Aggregates IPv4 or IPv6 prefixes from file or STDIN with a running service",
+    )
+    parser.add_argument(
+        "prefixes",
+        type=argparse.FileType("r"),
+        nargs="?",
+        help="Text file of unsorted list of IPv4 or IPv6 prefixes. No argument means STDIN.",
+        default=sys.stdin,
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help=f"Unix socket of the service. Defaults to ${SOCKET_ENVIRONMENT}",
+        default=os.environ.get(SOCKET_ENVIRONMENT),
+    )
+    parser.add_argument("--host", help="Address of the service", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="TCP port of the service")
+    parser.add_argument(
+        "--max-length",
+        "-m",
+        metavar="LENGTH",
+        type=int,
+        help="Discard longer prefixes prior to processing",
+        default=128,
+    )
+    parser.add_argument(
+        "--strip-host-mask",
+        "-s",
+        dest="strip_host_mask",
+        help="Do not print netmask if prefix is a host route (/32 IPv4, /128 IPv6)",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--truncate",
+        "-t",
+        metavar="MASK",
+        type=int,
+        help="Truncate IP/mask to network/mask",
+        default=False,
+    )
+    args = parser.parse_args()
+
+    try:
+        for aggregate in aggregate_remote(
+            args.prefixes,
+            args.socket,
+            args.host,
+            args.port,
+            args.max_length,
+            args.truncate,
+            args.strip_host_mask,
+        ):
+            sys.stdout.write(f"{aggregate}\n")
+    except (OSError, ValueError) as error:
+        sys.exit(f"ERROR: {error}")
+
+
+if __name__ == "__main__":
+    main()
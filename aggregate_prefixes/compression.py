@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides compressed input and output for package aggregate-prefixes
+
+gzip, bzip2 and xz are handled by the standard library, zstd requires the
+optional zstandard package. Compressed input is recognized by its magic
+bytes, or by its extension, and decompressed while it is read. Large inputs
+are decompressed by a background thread, so that decompression overlaps
+with parsing: zlib, bz2 and lzma release the GIL while they work.
+
+Compression modules and threads are imported once compressed data is found,
+plain text input does not pay for them.
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import io
+import os
+import sys
+from types import ModuleType
+from typing import IO, BinaryIO, Optional
+
+MAGICS = {
+    "gz": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zst": b"\x28\xb5\x2f\xfd",
+}
+EXTENSIONS = {".gz": "gz", ".bz2": "bz2", ".xz": "xz", ".zst": "zst"}
+COMPRESSIONS = tuple(MAGICS)
+# Compressed inputs at least this large are decompressed in background
+BACKGROUND_SIZE = 4 * 1024 * 1024
+_CHUNK_SIZE = 1024 * 1024
+_QUEUE_DEPTH = 8
+
+
+def detect_compression(head: bytes, path: Optional[str] = None) -> Optional[str]:
+    """
+    Detects compression from magic bytes, then from file extension
+
+    Parameters:
+    -----------
+    head: bytes
+        First bytes of the file
+    path: Optional[str]
+        File path
+
+    Returns
+    -------
+    Optional[str]: Compression, key of MAGICS. None if not compressed
+    """
+    for compression, magic in MAGICS.items():
+        if head.startswith(magic):
+            return compression
+    if path is not None:
+        return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    return None
+
+
+def decompression_errors() -> tuple[type[Exception], ...]:
+    """
+    Errors raised by decompressors on corrupted or truncated input
+
+    Only errors of the decompressors imported so far are returned: the others
+    could not have been raised. Meant to be called in except clauses, which
+    are evaluated once an exception is raised.
+
+    Returns
+    -------
+    tuple[type[Exception], ...]: Exception classes
+    """
+    errors = (OSError, EOFError)
+    if "lzma" in sys.modules:
+        errors += (sys.modules["lzma"].LZMAError,)
+    if "zstandard" in sys.modules:
+        errors += (sys.modules["zstandard"].ZstdError,)
+    return errors
+
+
+def load_zstandard() -> Optional[ModuleType]:
+    """
+    Imports the optional zstandard package
+
+    Returns
+    -------
+    Optional[ModuleType]: zstandard module, None if it is not installed
+    """
+    try:
+        import zstandard
+    except ImportError:  # pragma: no cover
+        return None
+    return zstandard
+
+
+def _require_zstandard() -> ModuleType:
+    zstandard = load_zstandard()
+    if zstandard is None:
+        raise ValueError("zstd requires the zstandard package")
+    return zstandard
+
+
+def _close_with(wrapper: BinaryIO, file: BinaryIO) -> BinaryIO:
+    """
+    Closes file once wrapper is closed. Decompressors leave the files they
+    read from open
+    """
+    close = wrapper.close
+
+    def close_both() -> None:
+        try:
+            close()
+        finally:
+            file.close()
+
+    wrapper.close = close_both
+    return wrapper
+
+
+def _decompressor(file: BinaryIO, compression: str, closefd: bool = True) -> BinaryIO:
+    """
+    Wraps a file with a streaming decompressor
+
+    Parameters:
+    -----------
+    file: BinaryIO
+        Compressed file
+    compression: str
+        Compression, key of MAGICS
+    closefd: bool
+        Close file when the decompressed file is closed
+
+    Returns
+    -------
+    BinaryIO: Decompressed file
+    """
+    if compression == "zst":
+        zstandard = _require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(
+            file, read_across_frames=True, closefd=closefd
+        )
+    if compression == "gz":
+        import gzip
+
+        decompressed = gzip.GzipFile(fileobj=file, mode="rb")
+    elif compression == "bz2":
+        import bz2
+
+        decompressed = bz2.BZ2File(file, mode="rb")
+    else:
+        import lzma
+
+        decompressed = lzma.LZMAFile(file, mode="rb")
+    return _close_with(decompressed, file) if closefd else decompressed
+
+
+class BackgroundReader(io.RawIOBase):
+    """
+    Reads a file in a background thread, one chunk ahead of the consumer.
+
+    Parameters
+    ----------
+    file: BinaryIO
+        File opened in binary mode. Closed once exhausted
+    chunk_size: int
+        Size of the chunks read in background
+    depth: int
+        Maximum number of chunks read ahead
+    """
+
+    def __init__(self, file: BinaryIO, chunk_size: int = _CHUNK_SIZE, depth: int = _QUEUE_DEPTH):
+        import queue
+        import threading
+
+        super().__init__()
+        self._empty = queue.Empty
+        self._queue = queue.Queue(depth)
+        self._pending = memoryview(b"")
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(file, chunk_size), daemon=True)
+        self._thread.start()
+
+    def _run(self, file: BinaryIO, chunk_size: int) -> None:
+        try:
+            with file:
+                while not self._stop.is_set():
+                    chunk = file.read(chunk_size)
+                    self._queue.put(chunk)
+                    if not chunk:
+                        break
+        except Exception as error:  # pylint: disable=broad-except
+            # Errors are raised by the consumer
+            self._queue.put(error)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        if not self._pending:
+            if self._eof:
+                return 0
+            chunk = self._queue.get()
+            if isinstance(chunk, Exception):
+                self._eof = True
+                raise chunk
+            if not chunk:
+                self._eof = True
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self) -> None:
+        # Unblock the thread if the consumer stopped early
+        self._stop.set()
+        while not self._eof:
+            try:
+                self._queue.get_nowait()
+            except self._empty:
+                break
+        super().close()
+
+
+def open_input(path: str, binary: bool = False) -> IO:
+    """
+    Opens an input file, decompressing it if it is compressed
+
+    Parameters:
+    -----------
+    path: str
+        File path or "-" for STDIN
+    binary: bool
+        Open in binary mode
+
+    Returns
+    -------
+    IO: File opened in text or binary mode
+    """
+    if path == "-":
+        stdin = sys.stdin
+        if not hasattr(stdin, "buffer"):
+            # STDIN was replaced by a text stream
+            return stdin
+        file = stdin.buffer
+        size = None
+    else:
+        file = open(path, "rb")  # pylint: disable=consider-using-with
+        size = os.fstat(file.fileno()).st_size
+
+    head = file.peek(6)[:6] if hasattr(file, "peek") else b""
+    compression = detect_compression(head, None if path == "-" else path)
+    if compression is None:
+        if binary:
+            return file
+        if path == "-":
+            return stdin
+        return io.TextIOWrapper(file, encoding="utf-8")
+
+    # STDIN is left open
+    file = _decompressor(file, compression, closefd=path != "-")
+    # Decompressed binary input can not be memory-mapped: BufferedReader
+    # hides the file descriptor of the compressed file
+    if binary or size is None or size >= BACKGROUND_SIZE:
+        file = io.BufferedReader(BackgroundReader(file), _CHUNK_SIZE)
+    if binary:
+        return file
+    return io.TextIOWrapper(file, encoding="utf-8")
+
+
+def open_output(file: BinaryIO, compression: str) -> BinaryIO:
+    """
+    Wraps an output file with a streaming compressor
+
+    Closing the returned file flushes the compressor, but leaves file open.
+
+    Parameters:
+    -----------
+    file: BinaryIO
+        File opened in binary mode
+    compression: str
+        Compression, key of MAGICS
+
+    Returns
+    -------
+    BinaryIO: File compressing what is written to it
+    """
+    if compression == "gz":
+        import gzip
+
+        class GzipWriter(gzip.GzipFile):
+            """
+            GzipFile that does not claim to be seekable, as it can only seek
+            forward in write mode
+            """
+
+            def seekable(self) -> bool:
+                return False
+
+        return GzipWriter(fileobj=file, mode="wb")
+    if compression == "bz2":
+        import bz2
+
+        return bz2.BZ2File(file, mode="wb")
+    if compression == "xz":
+        import lzma
+
+        return lzma.LZMAFile(file, mode="wb")
+    zstandard = _require_zstandard()
+    return zstandard.ZstdCompressor().stream_writer(file, closefd=False)
@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides integer based aggregation engine for package aggregate-prefixes
+
+Prefixes are represented as (network, prefixlen) tuples, where network is the
+network address serialized as integer. Network objects are never built here.
+"""
+
+
+import operator
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import TYPE_CHECKING, Optional
+
+from .formatting import format_records
+
+if TYPE_CHECKING:
+    from .stats import Stats
+
+MAX_PREFIXLEN = {4: 32, 6: 128}
+
+
+def broadcast(network: int, prefixlen: int, width: int) -> int:
+    """
+    Computes broadcast address of a prefix
+
+    Parameters:
+    -----------
+    network: int
+        Network address serialized as integer
+    prefixlen: int
+        Prefix length
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    int: Broadcast address serialized as integer
+    """
+    return network | ((1 << (width - prefixlen)) - 1)
+
+
+def check_lengths(max_length: int, truncate: int) -> None:
+    """
+    Checks that max_length and truncate are valid prefix lengths
+
+    Parameters:
+    -----------
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask, False not to truncate
+
+    Raises
+    ------
+    ValueError: If either length is not within 0 and 128
+    """
+    width = max(MAX_PREFIXLEN.values())
+    if not 0 <= max_length <= width:
+        raise ValueError(f"Invalid maximum length: {max_length}")
+    if truncate is not False and not 0 <= truncate <= width:
+        raise ValueError(f"Invalid truncate length: {truncate}")
+
+
+def truncate_records(
+    records: list[tuple[int, int]], length: int, width: int
+) -> list[tuple[int, int]]:
+    """
+    Truncates prefixes longer than length to network/length
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        List of (network, prefixlen) tuples
+    length: int
+        Truncate prefixes to this length
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    list[tuple[int, int]]: List of (network, prefixlen) tuples
+    """
+    if length >= width:
+        return records
+    netmask = ~((1 << (width - length)) - 1)
+    return [
+        (network & netmask, length) if prefixlen > length else (network, prefixlen)
+        for network, prefixlen in records
+    ]
+
+
+def check_sorted(records: list[tuple[int, int]], version: int) -> None:
+    """
+    Checks that prefixes are sorted by network and prefixlen
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        List of (network, prefixlen) tuples
+    version: int
+        IP version of the records
+
+    Raises
+    ------
+    ValueError: If prefixes are not sorted
+    """
+    if all(map(operator.le, records, islice(records, 1, None))):
+        return
+    for previous, record in zip(records, islice(records, 1, None)):
+        if previous > record:
+            record, previous = format_records([record, previous], version)
+            raise ValueError(f"Prefixes are not sorted: {record} follows {previous}")
+
+
+def find_ranges(
+    records: Iterable[tuple[int, int]], width: int, stats: Optional["Stats"] = None
+) -> Iterator[tuple[int, int]]:
+    """
+    Split sorted prefixes into contiguous address ranges
+
+    Parameters:
+    -----------
+    records: Iterable[tuple[int, int]]
+        Iterable of (network, prefixlen) tuples sorted by network and prefixlen
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+    stats: Optional[Stats]
+        Updated with the number of covered prefixes and ranges, once all
+        the ranges are consumed
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Iterable of (first, last) addresses of contiguous ranges
+    """
+    iterator = iter(records)
+    try:
+        network, prefixlen = next(iterator)
+    except StopIteration:
+        return
+    first = network
+    last = network | ((1 << (width - prefixlen)) - 1)
+    covered = 0
+    ranges = 1
+
+    for network, prefixlen in iterator:
+        # Prefix is subnetwork of current range
+        if network <= last:
+            covered += 1
+            continue
+        # Prefix does not start right after current range, close it
+        if network != last + 1:
+            yield first, last
+            first = network
+            ranges += 1
+        last = network | ((1 << (width - prefixlen)) - 1)
+    yield first, last
+
+    if stats is not None:
+        stats.covered += covered
+        stats.chunks += ranges
+
+
+def merge_ranges(ranges: Iterable[tuple[int, int]]) -> Iterator[tuple[int, int]]:
+    """
+    Merges overlapping or adjacent address ranges
+
+    Parameters:
+    -----------
+    ranges: Iterable[tuple[int, int]]
+        Iterable of (first, last) addresses of ranges sorted by first address
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Iterable of disjoint, non adjacent (first, last) addresses of ranges
+    """
+    iterator = iter(ranges)
+    try:
+        first, last = next(iterator)
+    except StopIteration:
+        return
+
+    for range_first, range_last in iterator:
+        if range_first > last + 1:
+            yield first, last
+            first = range_first
+        if range_last > last:
+            last = range_last
+    yield first, last
+
+
+def range_to_prefixes(first: int, last: int, width: int) -> Iterator[tuple[int, int]]:
+    """
+    Splits address range into the smallest list of aligned prefixes
+
+    Parameters:
+    -----------
+    first: int
+        First address of the range serialized as integer
+    last: int
+        Last address of the range serialized as integer
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Iterable of (network, prefixlen) tuples
+    """
+    while first <= last:
+        # Largest block aligned to first address
+        bits = (first & -first).bit_length() - 1 if first else width
+        # Largest block that fits into the remaining range
+        bits = min(bits, (last - first + 1).bit_length() - 1)
+        yield first, width - bits
+        first += 1 << bits
+
+
+def aggregate_sorted(records: Iterable[tuple[int, int]], width: int) -> Iterator[tuple[int, int]]:
+    """
+    Aggregates sorted prefixes
+
+    Parameters:
+    -----------
+    records: Iterable[tuple[int, int]]
+        Iterable of (network, prefixlen) tuples sorted by network and prefixlen
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Sorted iterable of aggregates serialized as (network, prefixlen) tuples
+    """
+    for first, last in find_ranges(records, width):
+        yield from range_to_prefixes(first, last, width)
+
+
+def merge_buddies(records: Iterable[tuple[int, int]], width: int) -> Iterator[tuple[int, int]]:
+    """
+    Aggregates sorted prefixes by merging buddy blocks as they arrive
+
+    Prefixes that are not covered are pushed on a stack. Whenever the two
+    topmost prefixes have the same length and form an aligned pair, they are
+    popped and replaced by their parent, which may merge again. Every prefix
+    is pushed once and every merge pops one prefix for good, so the scan
+    takes O(n) steps after sorting. The stack is emptied at every gap and,
+    within a contiguous range, holds at most two prefixes per length.
+
+    Parameters:
+    -----------
+    records: Iterable[tuple[int, int]]
+        Iterable of (network, prefixlen) tuples sorted by network and prefixlen
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Sorted iterable of aggregates serialized as (network, prefixlen) tuples
+    """
+    stack = []
+    last = -1
+
+    for network, prefixlen in records:
+        # Prefix is subnetwork of the last aggregate
+        if network <= last:
+            continue
+        # Prefix does not start right after the last aggregate, nothing on
+        # the stack can merge anymore
+        if network != last + 1 and stack:
+            yield from stack
+            stack = []
+        size = 1 << (width - prefixlen)
+        last = network | (size - 1)
+        # Merge with the topmost prefix while it is the left buddy
+        while stack and prefixlen:
+            top_network, top_prefixlen = stack[-1]
+            if top_prefixlen != prefixlen or top_network & size:
+                break
+            stack.pop()
+            network = top_network
+            prefixlen -= 1
+            size <<= 1
+        stack.append((network, prefixlen))
+    yield from stack
+
+
+def aggregate_sorted_provenance(
+    records: list[tuple[int, int]], width: int
+) -> Iterator[tuple[int, int, int, int]]:
+    """
+    Aggregates sorted prefixes, keeping track of the prefixes covered by
+    every aggregate
+
+    Covered prefixes are contiguous in sorted order, so they are referenced
+    as index ranges. Ranges are found while scanning, the prefixes of a range
+    are split among its aggregates by bisection.
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        List of (network, prefixlen) tuples sorted by network and prefixlen
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    Iterator[tuple[int, int, int, int]]:
+        Sorted iterable of aggregates serialized as (network, prefixlen,
+        start, end) tuples, where records[start:end] are the covered prefixes
+    """
+    if not records:
+        return
+    start = 0
+    first, prefixlen = records[0]
+    last = first | ((1 << (width - prefixlen)) - 1)
+
+    for index in range(1, len(records)):
+        network, prefixlen = records[index]
+        # Prefix is subnetwork of current range
+        if network <= last:
+            continue
+        # Prefix does not start right after current range, close it
+        if network != last + 1:
+            yield from _split_provenance(records, first, last, start, index, width)
+            first = network
+            start = index
+        last = network | ((1 << (width - prefixlen)) - 1)
+    yield from _split_provenance(records, first, last, start, len(records), width)
+
+
+def _split_provenance(
+    records: list[tuple[int, int]], first: int, last: int, start: int, stop: int, width: int
+) -> Iterator[tuple[int, int, int, int]]:
+    """
+    Splits address range into aggregates and the prefixes they cover
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        List of (network, prefixlen) tuples sorted by network and prefixlen
+    first: int
+        First address of the range serialized as integer
+    last: int
+        Last address of the range serialized as integer
+    start: int
+        Index of the first prefix of the range
+    stop: int
+        Index following the last prefix of the range
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    Iterator[tuple[int, int, int, int]]:
+        Iterable of (network, prefixlen, start, end) tuples
+    """
+    for network, prefixlen in range_to_prefixes(first, last, width):
+        # Covered prefixes end at the first network beyond the aggregate
+        block_last = network | ((1 << (width - prefixlen)) - 1)
+        if block_last == last:
+            end = stop
+        else:
+            end = bisect_right(records, (block_last, width), start, stop)
+        yield network, prefixlen, start, end
+        start = end
+
+
+def fit_budget(
+    records: Iterable[tuple[int, int]], width: int, max_prefixes: int
+) -> tuple[list[tuple[int, int]], int]:
+    """
+    Merges aggregates until at most max_prefixes are left
+
+    Neighbouring aggregates are replaced by their smallest common supernet,
+    which also swallows other aggregates it covers. Pairs adding the fewest
+    addresses are merged first, picked from a priority queue over a linked
+    list of the aggregates, so that the whole process is O(n log n).
+
+    Parameters:
+    -----------
+    records: Iterable[tuple[int, int]]
+        Aggregates serialized as (network, prefixlen) tuples, sorted
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+    max_prefixes: int
+        Maximum number of aggregates returned
+
+    Returns
+    -------
+    tuple[list[tuple[int, int]], int]:
+        Sorted aggregates and number of addresses added to fit max_prefixes
+    """
+    records = list(records)
+    count = len(records)
+    if count <= max_prefixes:
+        return records, 0
+    import heapq  # pylint: disable=import-outside-toplevel
+
+    if max_prefixes < 1:
+        raise ValueError(f"Invalid maximum number of prefixes: {max_prefixes}")
+
+    firsts = [network for network, _ in records]
+    lasts = [broadcast(network, prefixlen, width) for network, prefixlen in records]
+    sizes = [last - first + 1 for first, last in zip(firsts, lasts)]
+    addresses = sum(sizes)
+    previous = list(range(-1, count - 1))
+    following = list(range(1, count + 1))
+    following[-1] = -1
+    alive = [True] * count
+    generations = [0] * count
+    heap = []
+
+    def push(left: int) -> None:
+        right = following[left]
+        if right < 0:
+            return
+        # Addresses added by the supernet, not counting other aggregates it
+        # may swallow, which only make the merge cheaper
+        hostbits = (firsts[left] ^ lasts[right]).bit_length()
+        cost = (1 << hostbits) - sizes[left] - sizes[right]
+        heapq.heappush(heap, (cost, left, right, generations[left], generations[right]))
+
+    for left in range(count - 1):
+        push(left)
+
+    while count > max_prefixes:
+        _, left, right, left_generation, right_generation = heapq.heappop(heap)
+        if (
+            not alive[left]
+            or not alive[right]
+            or following[left] != right
+            or generations[left] != left_generation
+            or generations[right] != right_generation
+        ):
+            continue
+
+        hostbits = (firsts[left] ^ lasts[right]).bit_length()
+        first = firsts[left] >> hostbits << hostbits
+        last = first | ((1 << hostbits) - 1)
+
+        # Swallow covered aggregates on both sides
+        node = right
+        while node >= 0 and firsts[node] <= last:
+            alive[node] = False
+            count -= 1
+            node = following[node]
+        following[left] = node
+        if node >= 0:
+            previous[node] = left
+        node = previous[left]
+        while node >= 0 and firsts[node] >= first:
+            alive[node] = False
+            count -= 1
+            node = previous[node]
+        previous[left] = node
+        if node >= 0:
+            following[node] = left
+
+        firsts[left] = first
+        lasts[left] = last
+        sizes[left] = last - first + 1
+        generations[left] += 1
+        if previous[left] >= 0:
+            push(previous[left])
+        push(left)
+
+    # Supernets may be aggregatable with each other
+    supernets = [
+        (firsts[node], width - sizes[node].bit_length() + 1)
+        for node in range(len(records))
+        if alive[node]
+    ]
+    aggregates = list(aggregate_sorted(supernets, width))
+    added = sum(sizes[node] for node in range(len(records)) if alive[node]) - addresses
+    return aggregates, added
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides output formatting functions for package aggregate-prefixes
+
+Prefixes are formatted straight from their (network, prefixlen) integer
+representation, with lookup tables for octets and prefix lengths, so that
+no address object is built along the way.
+"""
+
+
+import struct
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, TextIO, Union
+
+if TYPE_CHECKING:
+    from ipaddress import IPv4Network, IPv6Network
+
+_OCTETS = [str(octet) for octet in range(256)]
+# Filled on first IPv6 address, IPv4 only runs do not pay for it
+_HEXTETS = []
+_SUFFIXES = [f"/{prefixlen}" for prefixlen in range(129)]
+_UNPACK_HEXTETS = struct.Struct(">8H").unpack
+_ZERO_RUNS = [":" + "0:" * length for length in range(8, 1, -1)]
+_WRITE_LINES = 8192
+
+
+def format_ipv4(address: int) -> str:
+    """
+    Formats an IPv4 address as dotted quad
+
+    Arguments:
+    ----------
+    address: int
+        Address serialized as integer
+
+    Returns:
+    --------
+    str: Formatted address
+    """
+    octets = _OCTETS
+    return (
+        f"{octets[address >> 24]}.{octets[address >> 16 & 255]}."
+        f"{octets[address >> 8 & 255]}.{octets[address & 255]}"
+    )
+
+
+def format_ipv6(address: int) -> str:
+    """
+    Formats an IPv6 address as compressed hextets, like IPv6Address does
+
+    Arguments:
+    ----------
+    address: int
+        Address serialized as integer
+
+    Returns:
+    --------
+    str: Formatted address
+    """
+    if address >> 32 == 0xFFFF:
+        # IPv4-mapped addresses are rendered differently by Python versions
+        from ipaddress import IPv6Address  # pylint: disable=import-outside-toplevel
+
+        return str(IPv6Address(address))
+    if not _HEXTETS:
+        _HEXTETS.extend(f"{hextet:x}" for hextet in range(65536))
+    hextets = map(_HEXTETS.__getitem__, _UNPACK_HEXTETS(address.to_bytes(16, "big")))
+    text = f":{':'.join(hextets)}:"
+
+    # Replace the first longest run of two or more zero hextets with ::
+    if ":0:0:" in text:
+        for run in _ZERO_RUNS:
+            index = text.find(run)
+            if index >= 0:
+                return text[1:index] + "::" + text[index + len(run):-1]
+    return text[1:-1]
+
+
+def format_records(
+    records: Iterable[tuple[int, int]], version: int, strip: bool = False
+) -> Iterator[str]:
+    """
+    Formats prefixes serialized as (network, prefixlen) tuples
+
+    Arguments:
+    ----------
+    records: Iterable[tuple[int, int]]
+        Iterable of (network, prefixlen) tuples
+    version: int
+        IP version of the records
+    strip: bool
+        Do not append netmask if prefix is a host route
+
+    Returns:
+    --------
+    Iterator[str]: Formatted prefixes
+    """
+    format_address = format_ipv4 if version == 4 else format_ipv6
+    host_prefixlen = 32 if version == 4 else 128
+    suffixes = list(_SUFFIXES)
+    if strip:
+        suffixes[host_prefixlen] = ""
+    for network, prefixlen in records:
+        yield format_address(network) + suffixes[prefixlen]
+
+
+def format_networks(
+    prefixes: Iterable[Union["IPv4Network", "IPv6Network"]], strip: bool = False
+) -> Iterator[str]:
+    """
+    Formats prefixes serialized as either IPv4Network or IPv6Network
+
+    Arguments:
+    ----------
+    prefixes: Iterable[Union[IPv4Network, IPv6Network]]
+        Prefixes
+    strip: bool
+        Do not append netmask if prefix is a host route
+
+    Returns:
+    --------
+    Iterator[str]: Formatted prefixes
+    """
+    for prefix in prefixes:
+        if strip and prefix.prefixlen == prefix.max_prefixlen:
+            yield str(prefix.network_address)
+        else:
+            yield str(prefix)
+
+
+def write_lines(lines: Iterable[str], file: TextIO) -> None:
+    """
+    Writes lines to a file in batches, rather than one call per line
+
+    Arguments:
+    ----------
+    lines: Iterable[str]
+        Lines, without line terminator
+    file: TextIO
+        File opened in text mode
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= _WRITE_LINES:
+            batch.append("")
+            file.write("\n".join(batch))
+            batch = []
+    if batch:
+        batch.append("")
+        file.write("\n".join(batch))
+
+
+def strip_host_mask(prefix: Union["IPv4Network", "IPv6Network"]) -> str:
+    """
+    Prefix formatting function.
+    Removes netmask if prefix is a host route (/32 IPv4 or /128 IPv6)
+
+    Arguments:
+    ----------
+    prefix: Union[IPv4Network, IPv6Network]
+        Prefix to be formatted
+
+    Returns:
+    --------
+    str: Formatted prefix
+    """
+    if prefix.prefixlen == prefix.max_prefixlen:
+        return str(prefix.network_address)
+
+    return str(prefix)
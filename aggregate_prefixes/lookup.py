@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+"""
+Provides address lookups against aggregates for package aggregate-prefixes
+
+Aggregates never overlap, so an address is covered by at most one of them:
+the last one starting at or before the address, if it ends at or after it.
+Start and end addresses are kept in sorted arrays and searched by bisection,
+or by numpy.searchsorted for batches of IPv4 addresses when NumPy is
+installed.
+"""
+
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+from typing import Optional, Union
+
+from .engine import MAX_PREFIXLEN, aggregate_sorted
+from .parser import parse_prefix, parse_prefixes
+from .prefix import Prefix
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+Address = Union[str, IPv4Address, IPv6Address]
+
+_OCTETS = {str(octet): octet for octet in range(256)}
+# Array typecode of 32-bit unsigned integers: IPv4 arrays are shared with
+# NumPy as uint32 without copies. C int is 32 bits wide on common platforms
+_UINT32 = next(typecode for typecode in "IL" if array(typecode).itemsize == 4)
+
+
+def parse_address(address: Address) -> tuple[int, int]:
+    """
+    Parses an IPv4 or IPv6 address
+
+    Parameters:
+    -----------
+    address: Union[str, IPv4Address, IPv6Address]
+        Address serialized as either string, IPv4Address or IPv6Address
+
+    Returns
+    -------
+    tuple[int, int]: IP version and address serialized as integer
+    """
+    version, network, prefixlen = parse_prefix(address)
+    if prefixlen != MAX_PREFIXLEN[version]:
+        raise ValueError(f"{address} is not an IP address")
+    return version, network
+
+
+def _parse_ipv4_batch(addresses: list[Address]) -> Optional["numpy.ndarray"]:
+    """
+    Parses a batch of IPv4 addresses in dotted quad notation at once
+
+    Parameters:
+    -----------
+    addresses: list[Union[str, IPv4Address, IPv6Address]]
+        Addresses
+
+    Returns
+    -------
+    Optional[numpy.ndarray]:
+        uint32 array, None if any address is not a plain dotted quad
+    """
+    if not all(
+        isinstance(address, str) and address.count(".") == 3 and ":" not in address
+        for address in addresses
+    ):
+        return None
+    try:
+        octets = numpy.array(
+            list(map(_OCTETS.__getitem__, ".".join(addresses).split("."))), dtype=numpy.uint32
+        ).reshape(-1, 4)
+    except KeyError:
+        return None
+    return octets[:, 0] << 24 | octets[:, 1] << 16 | octets[:, 2] << 8 | octets[:, 3]
+
+
+class PrefixIndex:
+    """
+    Lookup index of IPv4 and IPv6 prefixes.
+
+    Prefixes are aggregated first, so that any prefix collection can be
+    indexed, aggregates of previous runs just cost a linear pass.
+
+    Parameters
+    ----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        IPv4 or IPv6 prefixes serialized as either string, IPv4Network or
+        IPv6Network
+    engine: str
+        Batch lookup backend: "numpy" searches IPv4 addresses with array
+        operations and falls back to "python" when NumPy is not installed
+    """
+
+    def __init__(
+        self,
+        prefixes: Iterable[Union[str, IPv4Network, IPv6Network]],
+        engine: str = "numpy",
+    ):
+        if engine not in ("python", "numpy"):
+            raise ValueError(f"Unknown engine: {engine}")
+        self.engine = engine if numpy is not None else "python"
+
+        parsed = parse_prefixes(prefixes)
+        self._starts = {}
+        self._ends = {}
+        self._prefixlens = {}
+        for version, width in MAX_PREFIXLEN.items():
+            records = parsed[version]
+            records.sort()
+            aggregates = list(aggregate_sorted(records, width))
+            # IPv6 addresses do not fit machine integers
+            starts = array(_UINT32) if version == 4 else []
+            ends = array(_UINT32) if version == 4 else []
+            for network, prefixlen in aggregates:
+                starts.append(network)
+                ends.append(network | ((1 << (width - prefixlen)) - 1))
+            self._starts[version] = starts
+            self._ends[version] = ends
+            self._prefixlens[version] = array("B", (prefixlen for _, prefixlen in aggregates))
+
+        if self.engine == "numpy":
+            self._numpy_starts = numpy.frombuffer(self._starts[4], dtype=numpy.uint32)
+            self._numpy_ends = numpy.frombuffer(self._ends[4], dtype=numpy.uint32)
+
+    def _find(self, version: int, address: int) -> Optional[Prefix]:
+        """
+        Finds the aggregate covering an address
+
+        Parameters:
+        -----------
+        version: int
+            IP version of the address
+        address: int
+            Address serialized as integer
+
+        Returns
+        -------
+        Optional[Prefix]: Aggregate, None if address is not covered
+        """
+        starts = self._starts[version]
+        slot = bisect_right(starts, address) - 1
+        if slot < 0 or address > self._ends[version][slot]:
+            return None
+        return Prefix(version, starts[slot], self._prefixlens[version][slot])
+
+    def lookup(self, address: Address) -> Optional[Prefix]:
+        """
+        Finds the aggregate covering an address
+
+        Parameters:
+        -----------
+        address: Union[str, IPv4Address, IPv6Address]
+            Address serialized as either string, IPv4Address or IPv6Address
+
+        Returns
+        -------
+        Optional[Prefix]: Aggregate, None if address is not covered
+        """
+        return self._find(*parse_address(address))
+
+    def lookup_many(self, addresses: Iterable[Address]) -> list[Optional[Prefix]]:
+        """
+        Finds the aggregates covering a batch of addresses
+
+        Parameters:
+        -----------
+        addresses: Iterable[Union[str, IPv4Address, IPv6Address]]
+            Addresses serialized as either string, IPv4Address or IPv6Address
+
+        Returns
+        -------
+        list[Optional[Prefix]]:
+            Aggregate of every address, in order. None if address is not
+            covered
+        """
+        addresses = list(addresses)
+        if self.engine == "python":
+            return [self._find(*parse_address(address)) for address in addresses]
+
+        # Batches of dotted quads are parsed at once, anything else address
+        # by address
+        results = [None] * len(addresses)
+        values = _parse_ipv4_batch(addresses)
+        if values is not None:
+            positions = numpy.arange(len(addresses))
+        else:
+            positions = []
+            values = []
+            for position, address in enumerate(addresses):
+                version, address = parse_address(address)
+                if version == 4:
+                    positions.append(position)
+                    values.append(address)
+                else:
+                    results[position] = self._find(version, address)
+            positions = numpy.array(positions, dtype=numpy.int64)
+            values = numpy.array(values, dtype=numpy.uint32)
+
+        # IPv4 addresses are searched at once
+        slots = numpy.searchsorted(self._numpy_starts, values, side="right") - 1
+        found = slots >= 0
+        found[found] = values[found] <= self._numpy_ends[slots[found]]
+        starts = self._starts[4]
+        prefixlens = self._prefixlens[4]
+        for position, slot in zip(positions[found].tolist(), slots[found].tolist()):
+            results[position] = Prefix(4, starts[slot], prefixlens[slot])
+        return results
+
+    def __contains__(self, address: Address) -> bool:
+        return self.lookup(address) is not None
+
+    def __len__(self) -> int:
+        return len(self._prefixlens[4]) + len(self._prefixlens[6])
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides NumPy vectorized aggregation engine for package aggregate-prefixes
+
+IPv4 networks are held as uint32 arrays, IPv6 networks as pairs of uint64
+arrays (high and low halves). Sort, removal of covered prefixes, detection of
+contiguous ranges and splitting of ranges in power-of-two blocks are all
+array operations. NumPy is optional: AVAILABLE tells if it can be imported.
+"""
+
+
+from collections.abc import Iterator
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+AVAILABLE = numpy is not None
+
+
+def _floor_log2(values: "numpy.ndarray") -> "numpy.ndarray":
+    """
+    Computes floor(log2(x)) of non-zero uint64 values, exactly
+
+    Exponents of the values converted to float64 are off by one at most, when
+    conversion rounds up to the next power of two.
+
+    Parameters:
+    -----------
+    values: numpy.ndarray
+        uint64 array
+
+    Returns
+    -------
+    numpy.ndarray: uint64 array
+    """
+    exponents = numpy.frexp(values.astype(numpy.float64))[1].astype(numpy.uint64)
+    exponents = numpy.minimum(exponents - numpy.uint64(1), numpy.uint64(63))
+    return exponents - (values < (numpy.uint64(1) << exponents))
+
+
+def _trailing_zeros(values: "numpy.ndarray", width: int) -> "numpy.ndarray":
+    """
+    Counts trailing zero bits of uint64 values. Zero counts as width
+
+    Parameters:
+    -----------
+    values: numpy.ndarray
+        uint64 array
+    width: int
+        Value returned for zeroes
+
+    Returns
+    -------
+    numpy.ndarray: uint64 array
+    """
+    zero = values == 0
+    lowest = values & (~values + numpy.uint64(1))
+    lowest[zero] = 1
+    result = _floor_log2(lowest)
+    result[zero] = width
+    return result
+
+
+def _low_mask(bits: "numpy.ndarray") -> "numpy.ndarray":
+    """
+    Builds masks made of the given number of low bits, from 0 up to 64
+
+    Parameters:
+    -----------
+    bits: numpy.ndarray
+        uint64 array
+
+    Returns
+    -------
+    numpy.ndarray: uint64 array
+    """
+    one = numpy.uint64(1)
+    mask = (one << numpy.minimum(bits, numpy.uint64(63))) - one
+    mask[bits >= 64] = numpy.uint64(0xFFFFFFFFFFFFFFFF)
+    return mask
+
+
+def _host_masks(bits: "numpy.ndarray") -> tuple["numpy.ndarray", "numpy.ndarray"]:
+    """
+    Builds 128 bits masks made of the given number of low bits, up to 128
+
+    Parameters:
+    -----------
+    bits: numpy.ndarray
+        uint64 array
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]: high and low halves of the masks
+    """
+    sixty_four = numpy.uint64(64)
+    high_bits = numpy.where(bits > sixty_four, bits - sixty_four, numpy.uint64(0))
+    return _low_mask(high_bits), _low_mask(numpy.minimum(bits, sixty_four))
+
+
+def _split_ranges_ipv4(
+    firsts: "numpy.ndarray", lasts: "numpy.ndarray"
+) -> tuple["numpy.ndarray", "numpy.ndarray"]:
+    """
+    Splits IPv4 address ranges in power-of-two blocks, all ranges at once
+
+    The highest bit where first and last address differ splits a range in
+    two: the left part ends on a boundary aligned to that bit, the right
+    part starts on it. Blocks of the left part are the set bits of its size,
+    smallest first, those of the right part are the set bits of its size,
+    largest first. Both parts make a single block when they are aligned
+    halves of it.
+
+    Parameters:
+    -----------
+    firsts: numpy.ndarray
+        uint64 array of first addresses
+    lasts: numpy.ndarray
+        uint64 array of last addresses
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]:
+        Sorted uint64 arrays of networks and prefix lengths
+    """
+    one = numpy.uint64(1)
+    # Ranges of one address split in an empty left part and a block
+    bits = _floor_log2(numpy.maximum(firsts ^ lasts, one))
+    splits = lasts >> bits << bits
+    lefts = splits - firsts
+    rights = lasts + one - splits
+    halves = one << bits
+    whole = (lefts == halves) & (rights == halves)
+    splits[whole] = firsts[whole]
+    rights[whole] = halves[whole] << one
+    lefts[whole] = 0
+
+    # One pass per block size found in any range
+    blocks_networks = []
+    blocks_lengths = []
+    left_bits = int(numpy.bitwise_or.reduce(lefts))
+    right_bits = int(numpy.bitwise_or.reduce(rights))
+    for bit in range(33):
+        size = numpy.uint64(1 << bit)
+        if left_bits >> bit & 1:
+            # Smaller blocks come first
+            rows = numpy.flatnonzero(lefts & size)
+            blocks_networks.append(firsts[rows] + (lefts[rows] & (size - one)))
+            blocks_lengths.append(numpy.full(len(rows), 32 - bit, numpy.uint8))
+        if right_bits >> bit & 1:
+            # Larger blocks come first
+            rows = numpy.flatnonzero(rights & size)
+            blocks_networks.append(splits[rows] + (rights[rows] & ~(size + size - one)))
+            blocks_lengths.append(numpy.full(len(rows), 32 - bit, numpy.uint8))
+
+    networks = numpy.concatenate(blocks_networks)
+    lengths = numpy.concatenate(blocks_lengths)
+    # Blocks do not overlap, so networks are unique
+    order = numpy.argsort(networks)
+    return networks[order], lengths[order]
+
+
+def _aggregate_ipv4(records: list[tuple[int, int]]) -> Iterator[tuple[int, int]]:
+    """
+    Aggregates IPv4 prefixes with array operations
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        Unsorted list of (network, prefixlen) tuples
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Sorted iterable of aggregates serialized as (network, prefixlen) tuples
+    """
+    networks = numpy.fromiter((record[0] for record in records), numpy.uint32, len(records))
+    lengths = numpy.fromiter((record[1] for record in records), numpy.uint8, len(records))
+
+    # Network and prefix length fit a single sort key, much faster to sort
+    # than two. 64 bits arithmetic leaves room for last + 1
+    keys = networks.astype(numpy.uint64) << numpy.uint64(8) | lengths
+    keys.sort()
+    firsts = keys >> numpy.uint64(8)
+    lasts = firsts | _low_mask(numpy.uint64(32) - (keys & numpy.uint64(0xFF)))
+
+    # A prefix starts a new range unless it is covered by, or adjacent to,
+    # the prefixes before it
+    reach = numpy.maximum.accumulate(lasts)
+    starts = numpy.flatnonzero(firsts[1:] > reach[:-1] + numpy.uint64(1)) + 1
+    range_firsts = firsts[numpy.concatenate(([0], starts))]
+    range_lasts = reach[numpy.concatenate((starts - 1, [len(firsts) - 1]))]
+
+    networks, lengths = _split_ranges_ipv4(range_firsts, range_lasts)
+    return zip(networks.tolist(), lengths.tolist())
+
+
+def _aggregate_ipv6(records: list[tuple[int, int]]) -> Iterator[tuple[int, int]]:
+    """
+    Aggregates IPv6 prefixes with array operations on 128 bits pairs
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        Unsorted list of (network, prefixlen) tuples
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Sorted iterable of aggregates serialized as (network, prefixlen) tuples
+    """
+    one = numpy.uint64(1)
+    all_ones = numpy.uint64(0xFFFFFFFFFFFFFFFF)
+    size = len(records)
+    highs = numpy.fromiter((record[0] >> 64 for record in records), numpy.uint64, size)
+    lows = numpy.fromiter(
+        (record[0] & 0xFFFFFFFFFFFFFFFF for record in records), numpy.uint64, size
+    )
+    lengths = numpy.fromiter((record[1] for record in records), numpy.uint64, size)
+
+    # Sort, then compute first and last address of every prefix
+    order = numpy.lexsort((lengths, lows, highs))
+    first_highs, first_lows, lengths = highs[order], lows[order], lengths[order]
+    high_masks, low_masks = _host_masks(numpy.uint64(128) - lengths)
+    last_highs = first_highs | high_masks
+    last_lows = first_lows | low_masks
+
+    # Running maximum of last addresses: rank 128 bits values, then
+    # accumulate ranks
+    ranks = numpy.empty(size, dtype=numpy.int64)
+    ranks[numpy.lexsort((last_lows, last_highs))] = numpy.arange(size)
+    by_rank = numpy.argsort(ranks)
+    reach = by_rank[numpy.maximum.accumulate(ranks)]
+    reach_highs, reach_lows = last_highs[reach], last_lows[reach]
+
+    # reach + 1, with carry. Wraps around only if reach is the last address,
+    # in which case nothing can start after it
+    next_lows = reach_lows + one
+    next_highs = reach_highs + (next_lows == 0)
+    beyond = (first_highs[1:] > next_highs[:-1]) | (
+        (first_highs[1:] == next_highs[:-1]) & (first_lows[1:] > next_lows[:-1])
+    )
+    covered_by_last = (reach_highs[:-1] == all_ones) & (reach_lows[:-1] == all_ones)
+    starts = numpy.flatnonzero(beyond & ~covered_by_last) + 1
+    range_starts = numpy.concatenate(([0], starts))
+    range_ends = numpy.concatenate((starts - 1, [size - 1]))
+    range_first_highs = first_highs[range_starts]
+    range_first_lows = first_lows[range_starts]
+    range_last_highs = reach_highs[range_ends]
+    range_last_lows = reach_lows[range_ends]
+
+    # Split ranges in power-of-two blocks, one block per range per round
+    range_ids = numpy.arange(len(range_first_highs))
+    blocks_ids = []
+    blocks_highs = []
+    blocks_lows = []
+    blocks_lengths = []
+    while len(range_first_highs):
+        # Size of the range: last - first + 1, with borrow and carry. Only
+        # the whole address space wraps around to zero
+        span_lows = range_last_lows - range_first_lows
+        span_highs = range_last_highs - range_first_highs - (range_last_lows < range_first_lows)
+        size_lows = span_lows + one
+        size_highs = span_highs + (size_lows == 0)
+        fit_bits = numpy.where(
+            size_highs > 0,
+            numpy.uint64(64) + _floor_log2(numpy.maximum(size_highs, one)),
+            _floor_log2(numpy.maximum(size_lows, one)),
+        )
+        fit_bits[(size_highs == 0) & (size_lows == 0)] = 128
+
+        align_bits = numpy.where(
+            range_first_lows > 0,
+            _trailing_zeros(range_first_lows, 64),
+            numpy.uint64(64) + _trailing_zeros(range_first_highs, 64),
+        )
+        bits = numpy.minimum(align_bits, fit_bits)
+
+        blocks_ids.append(range_ids)
+        blocks_highs.append(range_first_highs)
+        blocks_lows.append(range_first_lows)
+        blocks_lengths.append(numpy.uint64(128) - bits)
+
+        # Done when the block ends where the range does
+        high_masks, low_masks = _host_masks(bits)
+        end_highs = range_first_highs | high_masks
+        end_lows = range_first_lows | low_masks
+        remaining = (end_highs != range_last_highs) | (end_lows != range_last_lows)
+
+        # Move to the address after the block, with carry
+        next_lows = end_lows + one
+        next_highs = end_highs + (next_lows == 0)
+        range_first_highs = next_highs[remaining]
+        range_first_lows = next_lows[remaining]
+        range_last_highs = range_last_highs[remaining]
+        range_last_lows = range_last_lows[remaining]
+        range_ids = range_ids[remaining]
+
+    # Ranges are sorted and split from their start, so blocks are sorted by
+    # range first and round then
+    order = numpy.argsort(numpy.concatenate(blocks_ids), kind="stable")
+    highs = numpy.concatenate(blocks_highs)[order].astype(object)
+    lows = numpy.concatenate(blocks_lows)[order].astype(object)
+    lengths = numpy.concatenate(blocks_lengths)[order]
+    return zip((highs << 64 | lows).tolist(), lengths.tolist())
+
+
+def aggregate_records(records: list[tuple[int, int]], version: int) -> Iterator[tuple[int, int]]:
+    """
+    Aggregates prefixes with array operations
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        Unsorted list of (network, prefixlen) tuples
+    version: int
+        IP version of the records
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Sorted iterable of aggregates serialized as (network, prefixlen) tuples
+    """
+    if not records:
+        return iter(())
+    if version == 4:
+        return _aggregate_ipv4(records)
+    return _aggregate_ipv6(records)
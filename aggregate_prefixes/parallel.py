@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides multi-process aggregation for package aggregate-prefixes
+
+Input is split into one slice per worker. Every worker parses, sorts and
+reduces its slice to contiguous address ranges, one list per IP version.
+Ranges are then merged back in order, so that prefixes spanning several
+slices, like covering prefixes, are handled correctly.
+"""
+
+
+import heapq
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from ipaddress import IPv4Network, IPv6Network
+from typing import Optional, Union
+
+from .engine import (
+    MAX_PREFIXLEN,
+    check_sorted,
+    find_ranges,
+    merge_ranges,
+    range_to_prefixes,
+    truncate_records,
+)
+from .parser import parse_prefixes
+from .stats import Stats
+from .trie import PrefixTrie
+
+
+def _filter_parsed(
+    parsed: dict[int, list[tuple[int, int]]],
+    max_length: int,
+    truncate: int,
+    stats: Stats,
+) -> dict[int, list[tuple[int, int]]]:
+    """
+    Filters and truncates parsed prefixes
+
+    Parameters:
+    -----------
+    parsed: dict[int, list[tuple[int, int]]]
+        (network, prefixlen) tuples keyed by IP version
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    stats: Stats
+        Collects counters and timings
+
+    Returns
+    -------
+    dict[int, list[tuple[int, int]]]: (network, prefixlen) tuples keyed by IP version
+    """
+    filtered = {}
+    for version, records in parsed.items():
+        width = MAX_PREFIXLEN[version]
+        stats.inputs += len(records)
+        with stats.timer("filter"):
+            kept = [record for record in records if record[1] <= max_length]
+            stats.filtered += len(records) - len(kept)
+            records = kept
+            if truncate is not False:
+                if truncate < width:
+                    stats.truncated += sum(1 for _, prefixlen in records if prefixlen > truncate)
+                records = truncate_records(records, truncate, width)
+        filtered[version] = records
+    return filtered
+
+
+def _find_filtered_ranges(
+    filtered: dict[int, list[tuple[int, int]]],
+    stats: Stats,
+    presorted: bool = False,
+    engine: str = "python",
+) -> dict[int, list[tuple[int, int]]]:
+    """
+    Reduces filtered prefixes to contiguous address ranges
+
+    Parameters:
+    -----------
+    filtered: dict[int, list[tuple[int, int]]]
+        (network, prefixlen) tuples keyed by IP version. Sorted in place
+    stats: Stats
+        Collects counters and timings
+    presorted: bool
+        Prefixes are sorted already, sorting is skipped
+    engine: str
+        Aggregation backend. Ranges of the trie and numpy engines are found
+        in their aggregates
+
+    Returns
+    -------
+    dict[int, list[tuple[int, int]]]:
+        Sorted (first, last) addresses of ranges, keyed by IP version
+    """
+    ranges = {}
+    for version, records in filtered.items():
+        if engine == "trie":
+            with stats.timer("build"):
+                trie = PrefixTrie()
+                for network, prefixlen in records:
+                    trie.insert(version, network, prefixlen)
+                records = list(trie.records(version))
+        elif engine == "numpy":
+            from . import numpy_engine  # pylint: disable=import-outside-toplevel
+
+            with stats.timer("aggregate"):
+                records = list(numpy_engine.aggregate_records(records, version))
+        elif not presorted:
+            with stats.timer("sort"):
+                records.sort()
+        with stats.timer("chunk"):
+            ranges[version] = list(find_ranges(records, MAX_PREFIXLEN[version], stats))
+    return ranges
+
+
+def find_parsed_ranges(
+    parsed: dict[int, list[tuple[int, int]]],
+    max_length: int,
+    truncate: int,
+    stats: Stats,
+) -> dict[int, list[tuple[int, int]]]:
+    """
+    Reduces parsed prefixes to contiguous address ranges
+
+    Parameters:
+    -----------
+    parsed: dict[int, list[tuple[int, int]]]
+        (network, prefixlen) tuples keyed by IP version
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    stats: Stats
+        Collects counters and timings
+
+    Returns
+    -------
+    dict[int, list[tuple[int, int]]]:
+        Sorted (first, last) addresses of ranges, keyed by IP version
+    """
+    return _find_filtered_ranges(_filter_parsed(parsed, max_length, truncate, stats), stats)
+
+
+def _find_slice_ranges(
+    prefixes: list[Union[str, IPv4Network, IPv6Network]],
+    max_length: int,
+    truncate: int,
+    assume_sorted: bool = False,
+    validate_sorted: bool = False,
+    engine: str = "python",
+) -> tuple[dict[int, list[tuple[int, int]]], Stats, dict[int, list[tuple[int, int]]]]:
+    """
+    Reduces a slice of the input to contiguous address ranges
+
+    Parameters:
+    -----------
+    prefixes: list[Union[str, IPv4Network, IPv6Network]]
+        Unsorted list of IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    assume_sorted: bool
+        Prefixes are sorted already, sorting is skipped
+    validate_sorted: bool
+        Like assume_sorted, but order of the slice is checked
+    engine: str
+        Aggregation backend
+
+    Returns
+    -------
+    tuple[dict[int, list[tuple[int, int]]], Stats, dict[int, list[tuple[int, int]]]]:
+        Sorted (first, last) addresses of ranges, keyed by IP version, stats
+        of the slice and, when validate_sorted is set, its first and last
+        prefixes keyed by IP version
+    """
+    stats = Stats()
+    with stats.timer("parse"):
+        parsed = parse_prefixes(prefixes)
+    filtered = _filter_parsed(parsed, max_length, truncate, stats)
+    del parsed
+
+    # Order across slices is checked once their first and last prefixes
+    # are known
+    bounds = {}
+    if validate_sorted:
+        with stats.timer("sort"):
+            for version, records in filtered.items():
+                if records:
+                    check_sorted(records, version)
+                    bounds[version] = [records[0], records[-1]]
+    ranges = _find_filtered_ranges(filtered, stats, assume_sorted or validate_sorted, engine)
+    return ranges, stats, bounds
+
+
+def stitch_ranges(
+    results: Iterable[tuple[dict[int, list[tuple[int, int]]], Stats]],
+    stats: Optional[Stats] = None,
+) -> list[tuple[int, Iterable[tuple[int, int]]]]:
+    """
+    Merges sorted ranges of several slices and splits them into aggregates
+
+    Parameters:
+    -----------
+    results: Iterable[tuple[dict[int, list[tuple[int, int]]], Stats]]
+        Ranges keyed by IP version and stats, of every slice
+    stats: Optional[Stats]
+        Collects counters and timings, but aggregates
+
+    Returns
+    -------
+    list[tuple[int, Iterable[tuple[int, int]]]]:
+        IP version and sorted iterable of aggregates serialized as
+        (network, prefixlen) tuples, for every IP version found in input.
+        IPv4 comes first
+    """
+    results = list(results)
+    ranges = {
+        version: [result[version] for result, _ in results if result.get(version)]
+        for version in MAX_PREFIXLEN
+    }
+    if stats is not None:
+        for _, slice_stats in results:
+            # Chunks are counted once ranges are stitched together
+            slice_stats.chunks = 0
+            stats.merge(slice_stats)
+
+    # Every IP version is stitched on its own
+    groups = []
+    for version, version_ranges in ranges.items():
+        if not version_ranges:
+            continue
+        merged = merge_ranges(heapq.merge(*version_ranges))
+        if stats is not None:
+            with stats.timer("chunk"):
+                merged = list(merged)
+            stats.chunks += len(merged)
+        groups.append((version, _split_ranges(merged, MAX_PREFIXLEN[version])))
+    return groups
+
+
+def _split_ranges(ranges: Iterable[tuple[int, int]], width: int) -> Iterator[tuple[int, int]]:
+    """
+    Splits address ranges into aggregates
+
+    Parameters:
+    -----------
+    ranges: Iterable[tuple[int, int]]
+        Iterable of (first, last) addresses of ranges
+    width: int
+        Address width in bits (32 for IPv4, 128 for IPv6)
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]:
+        Iterable of (network, prefixlen) tuples
+    """
+    for first, last in ranges:
+        yield from range_to_prefixes(first, last, width)
+
+
+def aggregate_parallel_records(
+    prefixes: Iterable[Union[str, IPv4Network, IPv6Network]],
+    max_length: int = 128,
+    truncate: int = False,
+    workers: int = 2,
+    stats: Optional[Stats] = None,
+    assume_sorted: bool = False,
+    validate_sorted: bool = False,
+    engine: str = "python",
+) -> list[tuple[int, Iterable[tuple[int, int]]]]:
+    """
+    Aggregates IPv4 or IPv6 prefixes into integers with a pool of processes.
+
+    Parameters
+    ----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    workers: int
+        Number of processes
+    stats: Optional[Stats]
+        Collects counters and timings, but aggregates. Timings of workers
+        are summed up
+    assume_sorted: bool
+        Prefixes are sorted by network and prefixlen already, workers skip
+        sorting their slice
+    validate_sorted: bool
+        Like assume_sorted, but order is checked and ValueError is raised if
+        prefixes are not sorted
+    engine: str
+        Aggregation backend of workers: "python", "trie" or "numpy"
+
+    Returns
+    -------
+    list[tuple[int, Iterable[tuple[int, int]]]]:
+        IP version and sorted iterable of aggregates serialized as
+        (network, prefixlen) tuples
+    """
+    if engine not in ("python", "trie", "numpy"):
+        raise ValueError(f"Unknown engine: {engine}")
+    if engine == "numpy":
+        from . import numpy_engine  # pylint: disable=import-outside-toplevel
+
+        if not numpy_engine.AVAILABLE:
+            engine = "python"
+
+    prefixes = list(prefixes)
+    size = -(-len(prefixes) // workers) or 1
+    slices = [prefixes[start:start + size] for start in range(0, len(prefixes), size)]
+    del prefixes
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(
+            executor.map(
+                _find_slice_ranges,
+                slices,
+                [max_length] * len(slices),
+                [truncate] * len(slices),
+                [assume_sorted] * len(slices),
+                [validate_sorted] * len(slices),
+                [engine] * len(slices),
+            )
+        )
+
+    # Slices are sorted, so are their boundaries
+    if validate_sorted:
+        for version in MAX_PREFIXLEN:
+            check_sorted(
+                [record for _, _, bounds in results for record in bounds.get(version, [])],
+                version,
+            )
+
+    return stitch_ranges([(ranges, slice_stats) for ranges, slice_stats, _ in results], stats)
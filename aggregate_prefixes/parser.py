@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides fast text parser for package aggregate-prefixes
+
+Prefixes are parsed straight into (network, prefixlen) integer tuples. Common
+notations (dotted-quad/CIDR, IPv6/CIDR with :: compression and bare hosts) are
+handled here, anything else is delegated to ipaddress.ip_network so that
+exotic notations and error messages stay the same.
+"""
+
+
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Optional, Union
+
+# ipaddress is only needed by uncommon notations
+if TYPE_CHECKING:
+    from ipaddress import IPv4Network, IPv6Network
+
+_OCTETS = {str(octet): octet for octet in range(256)}
+_PREFIXLENS = {str(prefixlen): prefixlen for prefixlen in range(129)}
+_HEXDIGITS = "0123456789abcdefABCDEF"
+_NETMASKS = {
+    4: [(2**32 - 1) ^ ((1 << (32 - prefixlen)) - 1) for prefixlen in range(33)],
+    6: [(2**128 - 1) ^ ((1 << (128 - prefixlen)) - 1) for prefixlen in range(129)],
+}
+
+
+def _parse_ipv6_address(address: str) -> Optional[int]:
+    """
+    Parses IPv6 address made of hextets, with or without :: compression
+
+    Parameters:
+    -----------
+    address: str
+        IPv6 address
+
+    Returns
+    -------
+    Optional[int]: Address serialized as integer, None if notation is unknown
+    """
+    if "::" in address:
+        head, _, tail = address.partition("::")
+        head = head.split(":") if head else []
+        tail = tail.split(":") if tail else []
+        if len(head) + len(tail) > 7:
+            return None
+        groups = head + ["0"] * (8 - len(head) - len(tail)) + tail
+    else:
+        groups = address.split(":")
+        if len(groups) != 8:
+            return None
+
+    value = 0
+    for group in groups:
+        if not group or len(group) > 4 or group.strip(_HEXDIGITS):
+            return None
+        value = value << 16 | int(group, 16)
+    return value
+
+
+def _fallback(prefix: Union[str, "IPv4Network", "IPv6Network"]) -> tuple[int, int, int]:
+    """
+    Parses prefix with ipaddress.ip_network
+
+    Parameters:
+    -----------
+    prefix: Union[str, IPv4Network, IPv6Network]
+        Prefix serialized as either string, IPv4Network or IPv6Network
+
+    Returns
+    -------
+    tuple[int, int, int]: (version, network, prefixlen) tuple
+    """
+    from ipaddress import ip_network  # pylint: disable=import-outside-toplevel
+
+    network = ip_network(prefix, False)
+    return network.version, int(network.network_address), network.prefixlen
+
+
+def parse_prefix(
+    prefix: Union[str, "IPv4Network", "IPv6Network"], strict: bool = True
+) -> Optional[tuple[int, int, int]]:
+    """
+    Parses a single prefix
+
+    Host bits are always discarded, like ip_network(prefix, False) does.
+
+    Parameters:
+    -----------
+    prefix: Union[str, IPv4Network, IPv6Network]
+        Prefix serialized as either string, IPv4Network or IPv6Network
+    strict: bool
+        Raise ValueError on invalid input. When False, return None instead
+
+    Returns
+    -------
+    Optional[tuple[int, int, int]]: (version, network, prefixlen) tuple
+    """
+    if isinstance(prefix, str):
+        address, slash, length = prefix.partition("/")
+        if ":" in address:
+            version = 6
+            network = _parse_ipv6_address(address)
+        else:
+            version = 4
+            octets = address.split(".")
+            if len(octets) == 4:
+                try:
+                    first, second, third, fourth = map(_OCTETS.__getitem__, octets)
+                    network = first << 24 | second << 16 | third << 8 | fourth
+                except KeyError:
+                    network = None
+            else:
+                network = None
+        prefixlen = _PREFIXLENS.get(length) if slash else (32 if version == 4 else 128)
+        if (
+            network is not None
+            and prefixlen is not None
+            and prefixlen <= (32 if version == 4 else 128)
+        ):
+            return version, network & _NETMASKS[version][prefixlen], prefixlen
+
+    try:
+        return _fallback(prefix)
+    except ValueError:
+        if strict:
+            raise
+        return None
+
+
+def parse_prefixes(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]], strict: bool = True
+) -> dict[int, list[tuple[int, int]]]:
+    """
+    Parses many prefixes in a single call
+
+    Parameters:
+    -----------
+    prefixes: Iterable[Union[str, IPv4Network, IPv6Network]]
+        Iterable of prefixes serialized as either string, IPv4Network or
+        IPv6Network
+    strict: bool
+        Raise ValueError on invalid input. When False, skip it instead
+
+    Returns
+    -------
+    dict[int, list[tuple[int, int]]]:
+        (network, prefixlen) tuples in input order, keyed by IP version
+    """
+    ipv4 = []
+    ipv6 = []
+    append_ipv4 = ipv4.append
+    octets_getitem = _OCTETS.__getitem__
+    prefixlens_get = _PREFIXLENS.get
+    netmasks = _NETMASKS[4]
+
+    for prefix in prefixes:
+        # Inline fast path for the most common notation: IPv4/CIDR
+        if isinstance(prefix, str) and ":" not in prefix:
+            address, slash, length = prefix.partition("/")
+            prefixlen = prefixlens_get(length, 33) if slash else 32
+            octets = address.split(".")
+            if prefixlen <= 32 and len(octets) == 4:
+                try:
+                    first, second, third, fourth = map(octets_getitem, octets)
+                except KeyError:
+                    pass
+                else:
+                    network = first << 24 | second << 16 | third << 8 | fourth
+                    append_ipv4((network & netmasks[prefixlen], prefixlen))
+                    continue
+
+        record = parse_prefix(prefix, strict)
+        if record is None:
+            continue
+        version, network, prefixlen = record
+        if version == 4:
+            append_ipv4((network, prefixlen))
+        else:
+            ipv6.append((network, prefixlen))
+
+    return {4: ipv4, 6: ipv6}
+
+
+def parse_sorted(
+    prefixes: Iterable[Union[str, "IPv4Network", "IPv6Network"]], validate_sorted: bool = True
+) -> Iterator[tuple[int, int, int]]:
+    """
+    Parses sorted prefixes as they are needed
+
+    Parameters:
+    -----------
+    prefixes: Iterable[Union[str, IPv4Network, IPv6Network]]
+        Iterable of prefixes sorted by network and prefixlen, IPv4 first,
+        serialized as either string, IPv4Network or IPv6Network
+    validate_sorted: bool
+        Raise ValueError if prefixes are not sorted
+
+    Returns
+    -------
+    Iterator[tuple[int, int, int]]: (version, network, prefixlen) tuples
+    """
+    previous = None
+    previous_prefix = None
+    for prefix in prefixes:
+        # IPv4 sorts before IPv6
+        record = parse_prefix(prefix)
+        if validate_sorted and previous is not None and previous > record:
+            raise ValueError(f"Prefixes are not sorted: {prefix} follows {previous_prefix}")
+        previous = record
+        previous_prefix = prefix
+        yield record
+
+
+def parse_buffer(buffer: str, strict: bool = True) -> dict[int, list[tuple[int, int]]]:
+    """
+    Parses a text buffer made of prefixes in a single call
+
+    Tokenized like read_prefixes does: prefixes are separated by whitespace,
+    text following # up to the end of the line is a comment.
+
+    Parameters:
+    -----------
+    buffer: str
+        Text made of prefixes
+    strict: bool
+        Raise ValueError on invalid input. When False, skip it instead
+
+    Returns
+    -------
+    dict[int, list[tuple[int, int]]]:
+        (network, prefixlen) tuples in input order, keyed by IP version
+    """
+    if "#" in buffer:
+        # Lines end where files read line by line split them
+        return parse_prefixes(read_prefixes(buffer.split("\n")), strict)
+    # Newlines are whitespace too, so lines need not be split first
+    return parse_prefixes(buffer.split(), strict)
+
+
+def read_prefixes(file: Iterable[str]) -> Iterator[str]:
+    """
+    Reads prefixes from text as they are needed, skipping empty lines and
+    comments
+
+    Prefixes are separated by whitespace, text following # up to the end of
+    the line is a comment.
+
+    Arguments:
+    ----------
+    file: Iterable[str]
+        Lines of text
+
+    Returns:
+    --------
+    Iterator[str]: Prefixes
+    """
+    for line in file:
+        prefixes = line.partition("#")[0].split()
+        if len(prefixes) == 1:
+            yield prefixes[0]
+        elif prefixes:
+            yield from prefixes
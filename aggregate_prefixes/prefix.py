@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides compact prefix types for package aggregate-prefixes
+
+Prefix is a tuple of IP version, network address serialized as integer and
+prefix length: it takes a fraction of the memory of IPv4Network and
+IPv6Network and sorts IPv4 before IPv6, then like aggregates are sorted.
+PrefixArray holds many of them in flat arrays, 5 bytes per IPv4 prefix and
+17 bytes per IPv6 prefix.
+"""
+
+
+from array import array
+from collections.abc import Iterable, Iterator
+from ipaddress import IPv4Network, IPv6Network
+from typing import NamedTuple, Union
+
+from .engine import MAX_PREFIXLEN
+from .formatting import format_ipv4, format_ipv6
+from .parser import parse_prefix
+
+_LOW_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+class Prefix(NamedTuple):
+    """
+    IPv4 or IPv6 prefix.
+
+    Attributes
+    ----------
+    version: int
+        IP version
+    network: int
+        Network address serialized as integer
+    prefixlen: int
+        Prefix length
+    """
+
+    version: int
+    network: int
+    prefixlen: int
+
+    @classmethod
+    def parse(cls, prefix: Union[str, IPv4Network, IPv6Network]) -> "Prefix":
+        """
+        Parses a prefix
+
+        Parameters:
+        -----------
+        prefix: Union[str, IPv4Network, IPv6Network]
+            IPv4 or IPv6 prefix serialized as either string, IPv4Network or
+            IPv6Network
+
+        Returns
+        -------
+        Prefix: Prefix
+        """
+        return cls(*parse_prefix(prefix))
+
+    @property
+    def max_prefixlen(self) -> int:
+        """Length of the addresses: 32 for IPv4, 128 for IPv6"""
+        return MAX_PREFIXLEN[self.version]
+
+    @property
+    def broadcast(self) -> int:
+        """Last address of the prefix serialized as integer"""
+        return self.network | ((1 << (MAX_PREFIXLEN[self.version] - self.prefixlen)) - 1)
+
+    @property
+    def num_addresses(self) -> int:
+        """Number of addresses of the prefix"""
+        return 1 << (MAX_PREFIXLEN[self.version] - self.prefixlen)
+
+    def to_network(self) -> Union[IPv4Network, IPv6Network]:
+        """
+        Converts prefix to network object
+
+        Returns
+        -------
+        Union[IPv4Network, IPv6Network]: Prefix serialized as either
+            IPv4Network or IPv6Network
+        """
+        network_class = IPv4Network if self.version == 4 else IPv6Network
+        return network_class((self.network, self.prefixlen))
+
+    def __str__(self) -> str:
+        if self.version == 4:
+            return f"{format_ipv4(self.network)}/{self.prefixlen}"
+        return f"{format_ipv6(self.network)}/{self.prefixlen}"
+
+    def __repr__(self) -> str:
+        return f"Prefix('{self}')"
+
+
+class PrefixArray:
+    """
+    Compact sequence of IPv4 and IPv6 prefixes.
+
+    Prefixes are stored in flat arrays. IPv4 prefixes are kept ahead of IPv6
+    prefixes, in order of insertion otherwise.
+
+    Parameters
+    ----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network, Prefix]]
+        Initial IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network, IPv6Network or Prefix
+    """
+
+    def __init__(
+        self, prefixes: Iterable[Union[str, IPv4Network, IPv6Network, Prefix]] = ()
+    ):
+        self._ipv4 = array("I")
+        self._ipv4_prefixlens = array("B")
+        self._ipv6_high = array("Q")
+        self._ipv6_low = array("Q")
+        self._ipv6_prefixlens = array("B")
+        for prefix in prefixes:
+            self.append(prefix)
+
+    def append(self, prefix: Union[str, IPv4Network, IPv6Network, Prefix]) -> None:
+        """
+        Appends a prefix
+
+        Parameters:
+        -----------
+        prefix: Union[str, IPv4Network, IPv6Network, Prefix]
+            IPv4 or IPv6 prefix serialized as either string, IPv4Network,
+            IPv6Network or Prefix
+        """
+        if not isinstance(prefix, Prefix):
+            prefix = parse_prefix(prefix)
+        version, network, prefixlen = prefix
+        self.extend_records(version, [(network, prefixlen)])
+
+    def extend_records(self, version: int, records: Iterable[tuple[int, int]]) -> None:
+        """
+        Appends prefixes serialized as (network, prefixlen) tuples
+
+        Parameters:
+        -----------
+        version: int
+            IP version of the records
+        records: Iterable[tuple[int, int]]
+            Iterable of (network, prefixlen) tuples
+        """
+        if version == 4:
+            networks, prefixlens = self._ipv4, self._ipv4_prefixlens
+            for network, prefixlen in records:
+                networks.append(network)
+                prefixlens.append(prefixlen)
+        else:
+            high, low, prefixlens = self._ipv6_high, self._ipv6_low, self._ipv6_prefixlens
+            for network, prefixlen in records:
+                high.append(network >> 64)
+                low.append(network & _LOW_MASK)
+                prefixlens.append(prefixlen)
+
+    def records(self, version: int) -> Iterator[tuple[int, int]]:
+        """
+        Iterates over prefixes of an IP version
+
+        Parameters:
+        -----------
+        version: int
+            IP version
+
+        Returns
+        -------
+        Iterator[tuple[int, int]]: Iterable of (network, prefixlen) tuples
+        """
+        if version == 4:
+            return zip(self._ipv4, self._ipv4_prefixlens)
+        return (
+            (high << 64 | low, prefixlen)
+            for high, low, prefixlen in zip(
+                self._ipv6_high, self._ipv6_low, self._ipv6_prefixlens
+            )
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the arrays holding the prefixes, in bytes"""
+        return sum(
+            len(values) * values.itemsize
+            for values in (
+                self._ipv4,
+                self._ipv4_prefixlens,
+                self._ipv6_high,
+                self._ipv6_low,
+                self._ipv6_prefixlens,
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self._ipv4) + len(self._ipv6_low)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Prefix, "PrefixArray"]:
+        if isinstance(index, slice):
+            return PrefixArray(self[position] for position in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PrefixArray index out of range")
+        if index < len(self._ipv4):
+            return Prefix(4, self._ipv4[index], self._ipv4_prefixlens[index])
+        index -= len(self._ipv4)
+        return Prefix(
+            6,
+            self._ipv6_high[index] << 64 | self._ipv6_low[index],
+            self._ipv6_prefixlens[index],
+        )
+
+    def __iter__(self) -> Iterator[Prefix]:
+        for version in MAX_PREFIXLEN:
+            for network, prefixlen in self.records(version):
+                yield Prefix(version, network, prefixlen)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PrefixArray):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            list(self.records(version)) == list(other.records(version))
+            for version in MAX_PREFIXLEN
+        )
+
+    def __repr__(self) -> str:
+        return f"PrefixArray([{', '.join(repr(str(prefix)) for prefix in self)}])"
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides long-running aggregation service for package aggregate-prefixes
+
+The service speaks a line based protocol over a Unix socket or TCP. Every
+request is a header line, prefixes (one or more per line, # starts a
+comment) and a line made of a single dot:
+
+    AGGREGATE [max-length=LENGTH] [truncate=MASK] [strip-host-mask]
+    192.0.2.0/25
+    192.0.2.128/25
+    .
+
+Every response is made of aggregates, one per line, or of a single line
+starting with "ERROR: ", followed by a line made of a single dot. Requests
+can be pipelined: they are answered in order. Large requests run in a
+process pool, so that the event loop keeps serving other connections.
+"""
+
+
+import asyncio
+import logging
+import os
+import socket
+import stat
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Optional
+
+from .aggregate_prefixes import aggregate_records
+from .engine import check_lengths
+from .formatting import format_records
+
+LOGGER = logging.getLogger(__name__)
+TERMINATOR = b".\n"
+# Hard ceiling on the prefixes of a single request, which are held in memory
+# as strings until the request is complete: roughly 100 MB at the default
+DEFAULT_REQUEST_LIMIT = 1000000
+DEFAULT_INLINE_LIMIT = 10000
+_LINE_LIMIT = 65536
+_WRITE_LINES = 4096
+
+
+def parse_header(header: str) -> dict:
+    """
+    Parses a request header
+
+    Parameters:
+    -----------
+    header: str
+        Header line
+
+    Returns
+    -------
+    dict: Keyword arguments for aggregate_request
+    """
+    command, *options = header.split()
+    if command != "AGGREGATE":
+        raise ValueError(f"Unknown command: {command}")
+    arguments = {"max_length": 128, "truncate": False, "strip_host_mask": False}
+    for option in options:
+        name, _, value = option.partition("=")
+        try:
+            if name == "max-length":
+                arguments["max_length"] = int(value)
+            elif name == "truncate":
+                arguments["truncate"] = int(value)
+            elif name == "strip-host-mask" and not value:
+                arguments["strip_host_mask"] = True
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid option: {option}") from None
+    check_lengths(arguments["max_length"], arguments["truncate"])
+    return arguments
+
+
+def aggregate_request(
+    prefixes: list[str], max_length: int, truncate: int, strip: bool
+) -> list[str]:
+    """
+    Aggregates the prefixes of a request
+
+    Parameters:
+    -----------
+    prefixes: list[str]
+        Unsorted list of IPv4 or IPv6 prefixes
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    strip: bool
+        Do not print netmask if prefix is a host route
+
+    Returns
+    -------
+    list[str]: Response lines
+    """
+    try:
+        return [
+            line
+            for version, records in aggregate_records(prefixes, max_length, truncate)
+            for line in format_records(records, version, strip)
+        ]
+    except (ValueError, TypeError) as error:
+        return [f"ERROR: {error}"]
+
+
+async def _read_request(
+    reader: asyncio.StreamReader, request_limit: int
+) -> Optional[tuple[Optional[dict], list[str], Optional[str]]]:
+    """
+    Reads a request, keeping at most request_limit prefixes in memory
+
+    Parameters:
+    -----------
+    reader: asyncio.StreamReader
+        Connection reader
+    request_limit: int
+        Maximum number of prefixes in a request
+
+    Returns
+    -------
+    Optional[tuple[Optional[dict], list[str], Optional[str]]]:
+        Arguments, prefixes and error. None if the connection is closed
+    """
+    header = b""
+    while not header.strip():
+        header = await reader.readline()
+        if not header:
+            return None
+
+    arguments = None
+    error = None
+    try:
+        arguments = parse_header(header.decode())
+    except (UnicodeDecodeError, ValueError) as exception:
+        error = str(exception)
+
+    prefixes = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            return None
+        if line.rstrip(b"\r\n") == b".":
+            break
+        if error:
+            # Drain the rest of the request
+            continue
+        try:
+            prefixes += line.decode().partition("#")[0].split()
+        except UnicodeDecodeError as exception:
+            error = str(exception)
+        if len(prefixes) > request_limit:
+            error = f"Request exceeds {request_limit} prefixes"
+            prefixes = []
+    return arguments, prefixes, error
+
+
+async def _handle_connection(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    executor: Executor,
+    request_limit: int,
+    inline_limit: int,
+) -> None:
+    """
+    Serves pipelined requests of a connection, in order
+
+    Parameters:
+    -----------
+    reader: asyncio.StreamReader
+        Connection reader
+    writer: asyncio.StreamWriter
+        Connection writer
+    executor: Executor
+        Runs requests larger than inline_limit
+    request_limit: int
+        Maximum number of prefixes in a request
+    inline_limit: int
+        Requests up to this number of prefixes run in the event loop
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            request = await _read_request(reader, request_limit)
+            if request is None:
+                break
+            arguments, prefixes, error = request
+            if error:
+                lines = [f"ERROR: {error}"]
+            else:
+                function = partial(
+                    aggregate_request,
+                    prefixes,
+                    arguments["max_length"],
+                    arguments["truncate"],
+                    arguments["strip_host_mask"],
+                )
+                # A failing request must not take the connection, and the
+                # requests pipelined behind it, down
+                try:
+                    if len(prefixes) > inline_limit:
+                        lines = await loop.run_in_executor(executor, function)
+                    else:
+                        lines = function()
+                except Exception as exception:  # pylint: disable=broad-except
+                    LOGGER.exception("Request failed")
+                    lines = [f"ERROR: {exception}"]
+            del prefixes
+
+            # Stream response back, letting the client consume it
+            for start in range(0, len(lines), _WRITE_LINES):
+                batch = lines[start:start + _WRITE_LINES]
+                writer.write("".join(f"{line}\n" for line in batch).encode())
+                await writer.drain()
+            writer.write(TERMINATOR)
+            await writer.drain()
+    except (ConnectionError, ValueError) as error:
+        # ValueError is raised by readline on lines longer than the limit
+        LOGGER.debug("Connection dropped: %s", error)
+    finally:
+        writer.close()
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Removes the socket left behind by a previous server
+
+    A socket is stale when connecting to it is refused: a socket that
+    accepts connections belongs to a running server and is left alone.
+
+    Parameters:
+    -----------
+    path: str
+        Unix socket path
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"Refusing to replace {path}: not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.remove(path)
+            return
+    raise FileExistsError(f"Refusing to replace {path}: a server is listening on it")
+
+
+def _owns_socket(path: str, identity: tuple[int, int]) -> bool:
+    """
+    Tells whether path is still the socket this server created
+
+    Parameters:
+    -----------
+    path: str
+        Unix socket path
+    identity: tuple[int, int]
+        Device and inode of the socket when it was created
+
+    Returns
+    -------
+    bool: True if path was not replaced nor removed
+    """
+    try:
+        status = os.lstat(path)
+    except FileNotFoundError:
+        return False
+    return stat.S_ISSOCK(status.st_mode) and (status.st_dev, status.st_ino) == identity
+
+
+async def serve(
+    path: Optional[str] = None,
+    host: str = "127.0.0.1",
+    port: Optional[int] = None,
+    workers: Optional[int] = None,
+    request_limit: int = DEFAULT_REQUEST_LIMIT,
+    inline_limit: int = DEFAULT_INLINE_LIMIT,
+    started: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Serves aggregation requests until cancelled.
+
+    Parameters
+    ----------
+    path: Optional[str]
+        Unix socket path. Takes precedence over host and port
+    host: str
+        Address TCP socket binds to
+    port: Optional[int]
+        TCP port
+    workers: Optional[int]
+        Number of processes running large requests. Defaults to CPU count
+    request_limit: int
+        Maximum number of prefixes in a request
+    inline_limit: int
+        Requests up to this number of prefixes run in the event loop
+    started: Optional[asyncio.Event]
+        Set once the socket is listening
+
+    A stale socket at path is replaced, while sockets other servers listen on
+    and any other file are not: FileExistsError is raised instead. The socket
+    is removed on shutdown, unless something else took its place.
+    """
+    if path is None and port is None:
+        raise ValueError("Either a Unix socket path or a TCP port is required")
+    if path is not None:
+        _remove_stale_socket(path)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        handler = partial(
+            _handle_connection,
+            executor=executor,
+            request_limit=request_limit,
+            inline_limit=inline_limit,
+        )
+        if path is not None:
+            server = await asyncio.start_unix_server(handler, path, limit=_LINE_LIMIT)
+            status = os.lstat(path)
+            identity = (status.st_dev, status.st_ino)
+        else:
+            server = await asyncio.start_server(handler, host, port, limit=_LINE_LIMIT)
+        LOGGER.info("Listening on %s", path or f"{host}:{port}")
+        if started is not None:
+            started.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if path is not None and _owns_socket(path, identity):
+                os.remove(path)
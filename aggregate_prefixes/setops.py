@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides set operations for package aggregate-prefixes
+
+Prefix collections are reduced to sorted lists of disjoint address ranges,
+one per IP version, and combined by sweeping the lists in a single pass.
+Results are split back into the smallest list of prefixes. IPv4 and IPv6
+are handled independently and IPv4 results come first.
+"""
+
+
+import heapq
+from collections.abc import Callable, Iterable, Iterator
+from ipaddress import IPv4Network, IPv6Network
+from typing import Union
+
+from .engine import MAX_PREFIXLEN, find_ranges, merge_ranges, range_to_prefixes
+from .parser import parse_prefixes
+
+Ranges = list[tuple[int, int]]
+
+
+def _ranges(prefixes: Iterable[Union[str, IPv4Network, IPv6Network]]) -> dict[int, Ranges]:
+    """
+    Reduces prefixes to disjoint address ranges
+
+    Parameters:
+    -----------
+    prefixes: Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+
+    Returns
+    -------
+    dict[int, Ranges]: Sorted (first, last) addresses of ranges, keyed by IP version
+    """
+    ranges = {}
+    for version, records in parse_prefixes(prefixes).items():
+        records.sort()
+        ranges[version] = list(find_ranges(records, MAX_PREFIXLEN[version]))
+    return ranges
+
+
+def intersect_ranges(left: Ranges, right: Ranges) -> Iterator[tuple[int, int]]:
+    """
+    Intersects two sorted lists of disjoint ranges
+
+    Parameters:
+    -----------
+    left: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges
+    right: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]: Sorted (first, last) addresses of ranges
+    """
+    left_index = right_index = 0
+    while left_index < len(left) and right_index < len(right):
+        left_first, left_last = left[left_index]
+        right_first, right_last = right[right_index]
+        first = max(left_first, right_first)
+        last = min(left_last, right_last)
+        if first <= last:
+            yield first, last
+        # Move past the range that ends first
+        if left_last < right_last:
+            left_index += 1
+        else:
+            right_index += 1
+
+
+def subtract_ranges(left: Ranges, right: Ranges) -> Iterator[tuple[int, int]]:
+    """
+    Subtracts a sorted list of disjoint ranges from another one
+
+    Parameters:
+    -----------
+    left: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges
+    right: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges to subtract
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]: Sorted (first, last) addresses of ranges
+    """
+    right_index = 0
+    for first, last in left:
+        # Skip ranges ending before the current one
+        while right_index < len(right) and right[right_index][1] < first:
+            right_index += 1
+        index = right_index
+        while index < len(right) and right[index][0] <= last:
+            hole_first, hole_last = right[index]
+            if hole_first > first:
+                yield first, hole_first - 1
+            first = hole_last + 1
+            if hole_last >= last:
+                break
+            index += 1
+        if first <= last:
+            yield first, last
+
+
+def union_ranges(left: Ranges, right: Ranges) -> Iterator[tuple[int, int]]:
+    """
+    Joins two sorted lists of disjoint ranges
+
+    Parameters:
+    -----------
+    left: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges
+    right: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]: Sorted (first, last) addresses of ranges
+    """
+    return merge_ranges(heapq.merge(left, right))
+
+
+def symmetric_difference_ranges(left: Ranges, right: Ranges) -> Iterator[tuple[int, int]]:
+    """
+    Computes ranges that belong to either of two sorted lists, but not both
+
+    Parameters:
+    -----------
+    left: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges
+    right: Ranges
+        Sorted list of disjoint (first, last) addresses of ranges
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]: Sorted (first, last) addresses of ranges
+    """
+    return merge_ranges(heapq.merge(subtract_ranges(left, right), subtract_ranges(right, left)))
+
+
+def _combine(
+    operation: Callable[[Ranges, Ranges], Iterator[tuple[int, int]]],
+    left: Iterable[Union[str, IPv4Network, IPv6Network]],
+    right: Iterable[Union[str, IPv4Network, IPv6Network]],
+) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    """
+    Applies a range operation to two prefix collections, version by version
+
+    Parameters:
+    -----------
+    operation: Callable[[Ranges, Ranges], Iterator[tuple[int, int]]]
+        Range operation
+    left: Iterable[Union[str, IPv4Network, IPv6Network]]
+        IPv4 or IPv6 prefixes serialized as either string, IPv4Network or
+        IPv6Network
+    right: Iterable[Union[str, IPv4Network, IPv6Network]]
+        IPv4 or IPv6 prefixes serialized as either string, IPv4Network or
+        IPv6Network
+
+    Returns
+    -------
+    Iterator[Union[IPv4Network, IPv6Network]]:
+        Sorted iterable of IPv4 aggregates followed by IPv6 ones, serialized
+        as either IPv4Network or IPv6Network
+    """
+    left = _ranges(left)
+    right = _ranges(right)
+    for version, network_class in ((4, IPv4Network), (6, IPv6Network)):
+        width = MAX_PREFIXLEN[version]
+        for first, last in operation(left.get(version, []), right.get(version, [])):
+            for record in range_to_prefixes(first, last, width):
+                yield network_class(record)
+
+
+def difference(
+    left: Iterable[Union[str, IPv4Network, IPv6Network]],
+    right: Iterable[Union[str, IPv4Network, IPv6Network]],
+) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    """
+    Computes the address space covered by left prefixes and not by right ones.
+
+    Parameters
+    ----------
+    left : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    right : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes to exclude
+
+    Returns
+    -------
+    Iterator[Union[IPv4Network, IPv6Network]]:
+        Sorted iterable of IPv4 aggregates followed by IPv6 ones, serialized
+        as either IPv4Network or IPv6Network
+    """
+    return _combine(subtract_ranges, left, right)
+
+
+def intersection(
+    left: Iterable[Union[str, IPv4Network, IPv6Network]],
+    right: Iterable[Union[str, IPv4Network, IPv6Network]],
+) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    """
+    Computes the address space covered by both left and right prefixes.
+
+    Parameters
+    ----------
+    left : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    right : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+
+    Returns
+    -------
+    Iterator[Union[IPv4Network, IPv6Network]]:
+        Sorted iterable of IPv4 aggregates followed by IPv6 ones, serialized
+        as either IPv4Network or IPv6Network
+    """
+    return _combine(intersect_ranges, left, right)
+
+
+def union(
+    left: Iterable[Union[str, IPv4Network, IPv6Network]],
+    right: Iterable[Union[str, IPv4Network, IPv6Network]],
+) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    """
+    Computes the address space covered by either left or right prefixes.
+
+    Parameters
+    ----------
+    left : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    right : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+
+    Returns
+    -------
+    Iterator[Union[IPv4Network, IPv6Network]]:
+        Sorted iterable of IPv4 aggregates followed by IPv6 ones, serialized
+        as either IPv4Network or IPv6Network
+    """
+    return _combine(union_ranges, left, right)
+
+
+def symmetric_difference(
+    left: Iterable[Union[str, IPv4Network, IPv6Network]],
+    right: Iterable[Union[str, IPv4Network, IPv6Network]],
+) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    """
+    Computes the address space covered by either left or right prefixes, but
+    not by both.
+
+    Parameters
+    ----------
+    left : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    right : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Unsorted IPv4 or IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+
+    Returns
+    -------
+    Iterator[Union[IPv4Network, IPv6Network]]:
+        Sorted iterable of IPv4 aggregates followed by IPv6 ones, serialized
+        as either IPv4Network or IPv6Network
+    """
+    return _combine(symmetric_difference_ranges, left, right)
+
+
+SET_OPERATIONS = {
+    "diff": difference,
+    "intersect": intersection,
+    "union": union,
+    "symdiff": symmetric_difference,
+}
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides multi-file input for package aggregate-prefixes
+
+Sources are files, glob patterns or "-" for STDIN. Files are read by a pool
+of threads, as reading releases the GIL, and parsed by a pool of processes
+when more than one worker is requested. Every source is reduced to sorted
+address ranges on its own, ranges are then either stitched together into a
+single set of aggregates or turned into aggregates of every source.
+"""
+
+
+import glob
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from .compression import open_input
+from .engine import MAX_PREFIXLEN, check_lengths, fit_budget
+from .parallel import find_parsed_ranges, stitch_ranges
+from .parser import parse_buffer
+from .stats import Stats
+
+DEFAULT_READERS = 8
+
+
+def expand_sources(patterns: Iterable[str]) -> list[str]:
+    """
+    Expands glob patterns into file paths
+
+    Parameters:
+    -----------
+    patterns: Iterable[str]
+        File paths, glob patterns or "-" for STDIN
+
+    Returns
+    -------
+    list[str]: File paths, in order of patterns. Matches are sorted
+    """
+    paths = []
+    for pattern in patterns:
+        if pattern != "-" and glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise ValueError(f"No files match {pattern}")
+            paths += matches
+        else:
+            paths.append(pattern)
+    return paths
+
+
+def read_source(path: str) -> str:
+    """
+    Reads a source
+
+    Parameters:
+    -----------
+    path: str
+        File path or "-" for STDIN
+
+    Returns
+    -------
+    str: Content of the source, decompressed. ValueError is raised if it can
+    not be read
+    """
+    if path == "-":
+        return open_input(path).read()
+    try:
+        with open_input(path) as file:
+            return file.read()
+    except OSError as error:
+        raise ValueError(f"can't open '{path}': {error.strerror or error}") from None
+
+
+def _find_text_ranges(
+    text: str, max_length: int, truncate: int
+) -> tuple[dict[int, list[tuple[int, int]]], Stats]:
+    """
+    Reduces the content of a source to contiguous address ranges
+
+    Parameters:
+    -----------
+    text: str
+        Content of the source
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+
+    Returns
+    -------
+    tuple[dict[int, list[tuple[int, int]]], Stats]:
+        Sorted (first, last) addresses of ranges, keyed by IP version, and
+        stats of the source
+    """
+    stats = Stats()
+    with stats.timer("parse"):
+        parsed = parse_buffer(text)
+    return find_parsed_ranges(parsed, max_length, truncate, stats), stats
+
+
+def _find_source_ranges(
+    path: str, max_length: int, truncate: int
+) -> tuple[dict[int, list[tuple[int, int]]], Stats]:
+    """
+    Reads a file and reduces it to contiguous address ranges. Runs in
+    worker processes, so that file content is never pickled
+    """
+    text = read_source(path)
+    try:
+        return _find_text_ranges(text, max_length, truncate)
+    except (ValueError, TypeError) as error:
+        raise type(error)(f"{path}: {error}") from None
+
+
+def _submit_ahead(
+    paths: list[str], submit: Callable[[str], Future], window: int
+) -> Iterator[tuple[str, Future]]:
+    """
+    Submits a task per source, keeping at most window tasks ahead of the
+    one being consumed, so that results do not pile up in memory
+
+    Parameters:
+    -----------
+    paths: list[str]
+        File paths or "-" for STDIN
+    submit: Callable[[str], Future]
+        Submits the task of a source
+    window: int
+        Number of tasks running ahead
+
+    Returns
+    -------
+    Iterator[tuple[str, Future]]: Sources and their tasks, in order
+    """
+    pending = deque()
+    for path in paths:
+        pending.append((path, submit(path)))
+        if len(pending) > window:
+            yield pending.popleft()
+    yield from pending
+
+
+def _ranges_by_source(
+    paths: list[str], max_length: int, truncate: int, workers: int
+) -> Iterator[tuple[dict[int, list[tuple[int, int]]], Stats]]:
+    """
+    Reduces every source to contiguous address ranges, in order of sources
+
+    Parameters:
+    -----------
+    paths: list[str]
+        File paths or "-" for STDIN
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    workers: int
+        Number of processes. One parses in the current process, while
+        threads read files ahead
+
+    Returns
+    -------
+    Iterator[tuple[dict[int, list[tuple[int, int]]], Stats]]:
+        Ranges keyed by IP version and stats, of every source
+    """
+    executor: Executor
+    if workers > 1:
+        # STDIN can only be read by the current process
+        texts = {path: read_source(path) for path in paths if path == "-"}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            def submit(path: str) -> Future:
+                if path in texts:
+                    return executor.submit(_find_text_ranges, texts[path], max_length, truncate)
+                return executor.submit(_find_source_ranges, path, max_length, truncate)
+
+            for path, future in _submit_ahead(paths, submit, workers):
+                try:
+                    yield future.result()
+                except (ValueError, TypeError) as error:
+                    if path in texts:
+                        raise type(error)(f"{path}: {error}") from None
+                    raise
+        return
+
+    readers = min(DEFAULT_READERS, len(paths) or 1)
+    with ThreadPoolExecutor(max_workers=readers) as executor:
+        def submit(path: str) -> Future:
+            return executor.submit(read_source, path)
+
+        for path, future in _submit_ahead(paths, submit, readers):
+            # Read errors name the file already
+            text = future.result()
+            try:
+                yield _find_text_ranges(text, max_length, truncate)
+            except (ValueError, TypeError) as error:
+                raise type(error)(f"{path}: {error}") from None
+
+
+def _fit(
+    groups: list[tuple[int, Iterable[tuple[int, int]]]],
+    max_prefixes: Optional[int],
+    stats: Optional[Stats],
+) -> list[tuple[int, list[tuple[int, int]]]]:
+    """
+    Materializes aggregates, merging them to fit max_prefixes if given
+    """
+    fitted = []
+    for version, records in groups:
+        if max_prefixes is None:
+            records = list(records)
+        else:
+            records, added = fit_budget(records, MAX_PREFIXLEN[version], max_prefixes)
+            if stats is not None:
+                stats.added += added
+        if stats is not None:
+            stats.aggregates += len(records)
+        fitted.append((version, records))
+    return fitted
+
+
+def aggregate_sources(
+    paths: list[str],
+    max_length: int = 128,
+    truncate: int = False,
+    workers: int = 1,
+    stats: Optional[Stats] = None,
+    max_prefixes: Optional[int] = None,
+) -> list[tuple[int, list[tuple[int, int]]]]:
+    """
+    Aggregates IPv4 or IPv6 prefixes of several files together.
+
+    Parameters
+    ----------
+    paths: list[str]
+        File paths or "-" for STDIN. Prefixes are separated by whitespace,
+        text following # is a comment
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    workers: int
+        Number of processes parsing files
+    stats: Optional[Stats]
+        Collects counters and timings. Timings of workers are summed up
+    max_prefixes: Optional[int]
+        Maximum number of aggregates of every IP version
+
+    Returns
+    -------
+    list[tuple[int, list[tuple[int, int]]]]:
+        IP version and sorted aggregates serialized as (network, prefixlen)
+        tuples
+    """
+    check_lengths(max_length, truncate)
+    groups = stitch_ranges(_ranges_by_source(paths, max_length, truncate, workers), stats)
+    return _fit(groups, max_prefixes, stats)
+
+
+def aggregate_by_source(
+    paths: list[str],
+    max_length: int = 128,
+    truncate: int = False,
+    workers: int = 1,
+    stats: Optional[Stats] = None,
+    max_prefixes: Optional[int] = None,
+) -> Iterator[tuple[str, list[tuple[int, list[tuple[int, int]]]]]]:
+    """
+    Aggregates IPv4 or IPv6 prefixes of every file on its own.
+
+    Parameters
+    ----------
+    paths: list[str]
+        File paths or "-" for STDIN. Prefixes are separated by whitespace,
+        text following # is a comment
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    workers: int
+        Number of processes parsing files
+    stats: Optional[Stats]
+        Collects counters and timings of all the files
+    max_prefixes: Optional[int]
+        Maximum number of aggregates of every file and IP version
+
+    Returns
+    -------
+    Iterator[tuple[str, list[tuple[int, list[tuple[int, int]]]]]]:
+        File path, IP version and sorted aggregates serialized as
+        (network, prefixlen) tuples, in order of paths
+    """
+    check_lengths(max_length, truncate)
+    for path, result in zip(paths, _ranges_by_source(paths, max_length, truncate, workers)):
+        yield path, _fit(stitch_ranges([result], stats), max_prefixes, stats)
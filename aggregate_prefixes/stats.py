@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides processing statistics for package aggregate-prefixes
+"""
+
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class Stats:
+    """
+    Counters and per-stage timings of an aggregation.
+
+    Covered prefixes and chunks are counted by engines that scan sorted
+    prefixes (python and stream), the other engines leave them to zero.
+
+    Attributes
+    ----------
+    inputs: int
+        Number of prefixes read
+    filtered: int
+        Number of prefixes discarded because longer than max_length
+    truncated: int
+        Number of prefixes truncated
+    covered: int
+        Number of prefixes skipped because covered by other prefixes
+    chunks: int
+        Number of contiguous chunks of aggregatable prefixes
+    aggregates: int
+        Number of aggregates emitted
+    added: int
+        Number of addresses added to fit max_prefixes
+    timings: dict[str, float]
+        Seconds spent in every stage
+    """
+
+    inputs: int = 0
+    filtered: int = 0
+    truncated: int = 0
+    covered: int = 0
+    chunks: int = 0
+    aggregates: int = 0
+    added: int = 0
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """
+        Adds the time spent in the with block to stage timing
+
+        Parameters:
+        -----------
+        stage: str
+            Name of the stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def merge(self, other: "Stats") -> None:
+        """
+        Adds counters and timings of another Stats object
+
+        Parameters:
+        -----------
+        other: Stats
+            Stats to be added
+        """
+        self.inputs += other.inputs
+        self.filtered += other.filtered
+        self.truncated += other.truncated
+        self.covered += other.covered
+        self.chunks += other.chunks
+        self.aggregates += other.aggregates
+        self.added += other.added
+        for stage, elapsed in other.timings.items():
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+
+    def as_dict(self) -> dict:
+        """
+        Serializes stats as dictionary
+
+        Returns
+        -------
+        dict: Counters and timings
+        """
+        return asdict(self)
+
+    def __str__(self) -> str:
+        lines = [
+            f"Inputs: {self.inputs}",
+            f"Filtered by max length: {self.filtered}",
+            f"Truncated: {self.truncated}",
+            f"Covered: {self.covered}",
+            f"Chunks: {self.chunks}",
+            f"Aggregates: {self.aggregates}",
+            f"Addresses added: {self.added}",
+        ]
+        lines += [f"Time {stage}: {elapsed:.6f}s" for stage, elapsed in self.timings.items()]
+        return "\n".join(lines)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Provides bounded memory aggregation for package aggregate-prefixes
+
+Input is parsed in chunks. Every chunk is sorted in memory and spilled to a
+temporary file made of fixed-width binary records. Spill files are then
+k-way merged into a single sorted stream that is aggregated on the fly. At
+most fan_in spill files are merged at once: as soon as fan_in of them are
+alike in size, they are merged into a single, larger, intermediate run.
+"""
+
+
+import heapq
+import logging
+import tempfile
+from collections.abc import Iterable, Iterator
+from ipaddress import IPv4Network, IPv6Network
+from itertools import islice
+from typing import IO, Optional, Union
+
+from .binary import RECORD_STRUCTS, pack_records, unpack_records
+from .engine import (
+    MAX_PREFIXLEN,
+    check_lengths,
+    find_ranges,
+    range_to_prefixes,
+    truncate_records,
+)
+from .parser import parse_prefixes, read_prefixes
+from .stats import Stats
+
+DEFAULT_CHUNK_SIZE = 1000000
+DEFAULT_FAN_IN = 64
+LOGGER = logging.getLogger(__name__)
+_READ_RECORDS = 65536
+
+
+def _spill(records: list[tuple[int, int]], version: int, directory: Optional[str]) -> IO[bytes]:
+    """
+    Sorts records and writes them to an anonymous temporary file
+
+    Parameters:
+    -----------
+    records: list[tuple[int, int]]
+        List of (network, prefixlen) tuples. Sorted in place
+    version: int
+        IP version of the records
+    directory: Optional[str]
+        Directory where the temporary file is created
+
+    Returns
+    -------
+    IO[bytes]: Temporary file rewound to the beginning
+    """
+    records.sort()
+    spill_file = tempfile.TemporaryFile(dir=directory)  # pylint: disable=consider-using-with
+    spill_file.write(pack_records(records, version))
+    spill_file.seek(0)
+    return spill_file
+
+
+def _read_spill(spill_file: IO[bytes], version: int) -> Iterator[tuple[int, int]]:
+    """
+    Reads records back from a spill file, one block at a time
+
+    Parameters:
+    -----------
+    spill_file: IO[bytes]
+        Spill file
+    version: int
+        IP version of the records
+
+    Returns
+    -------
+    Iterator[tuple[int, int]]: Sorted iterable of (network, prefixlen) tuples
+    """
+    block_size = RECORD_STRUCTS[version].size * _READ_RECORDS
+    try:
+        while True:
+            block = spill_file.read(block_size)
+            if not block:
+                break
+            yield from unpack_records(block, version)
+    finally:
+        spill_file.close()
+
+
+def _merge_spills(
+    spill_files: list[IO[bytes]], version: int, directory: Optional[str]
+) -> IO[bytes]:
+    """
+    Merges spill files into a single one, closing them
+
+    Parameters:
+    -----------
+    spill_files: list[IO[bytes]]
+        Spill files
+    version: int
+        IP version of the records
+    directory: Optional[str]
+        Directory where the temporary file is created
+
+    Returns
+    -------
+    IO[bytes]: Temporary file rewound to the beginning
+    """
+    records = heapq.merge(*(_read_spill(spill_file, version) for spill_file in spill_files))
+    spill_file = tempfile.TemporaryFile(dir=directory)  # pylint: disable=consider-using-with
+    while True:
+        batch = list(islice(records, _READ_RECORDS))
+        if not batch:
+            break
+        spill_file.write(pack_records(batch, version))
+    spill_file.seek(0)
+    return spill_file
+
+
+def aggregate_stream(
+    lines: Iterable[str],
+    max_length: int = 128,
+    truncate: int = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    directory: Optional[str] = None,
+    stats: Optional[Stats] = None,
+    fan_in: int = DEFAULT_FAN_IN,
+) -> Iterator[Union[IPv4Network, IPv6Network]]:
+    """
+    Aggregates IPv4 and IPv6 prefixes in bounded memory.
+
+    At most chunk_size prefixes are held in memory while input is read.
+    Prefixes are separated by whitespace, text following # is a comment.
+    Every IP version is spilled and merged on its own.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        Lines of text made of unsorted IPv4 and IPv6 prefixes
+    max_length: int
+        Discard longer prefixes prior to processing
+    truncate: int
+        Truncate IP/mask to network/mask
+    chunk_size: int
+        Number of prefixes sorted in memory before spilling to disk. Comments
+        and blank lines do not count
+    directory: Optional[str]
+        Directory where spill files are created. Defaults to system's temp
+    stats: Optional[Stats]
+        Collects counters and timings. Merging and aggregation are not timed
+        as they are interleaved with the consumer
+    fan_in: int
+        Maximum number of spill files merged at once, and open at once per
+        IP version and level of intermediate runs
+
+    Returns
+    -------
+    Iterator[Union[IPv4Network, IPv6Network]]:
+        Sorted iterable of IPv4 and IPv6 aggregated prefixes serialized as
+        either IPv4Network or IPv6Network. IPv4 comes first
+    """
+    check_lengths(max_length, truncate)
+    if chunk_size < 1:
+        raise ValueError(f"Invalid chunk size: {chunk_size}")
+    if fan_in < 2:
+        raise ValueError(f"Invalid fan-in: {fan_in}")
+    if stats is None:
+        stats = Stats()
+    chunks = {4: [], 6: []}
+    # (level, spill file) tuples. Runs of level N + 1 merge fan_in runs of
+    # level N, levels never increase along the list
+    spill_files = {4: [], 6: []}
+    versions = set()
+
+    def flush() -> None:
+        with stats.timer("sort"):
+            for version, records in chunks.items():
+                if records:
+                    runs = spill_files[version]
+                    runs.append((0, _spill(records, version, directory)))
+                    chunks[version] = []
+                    while len(runs) >= fan_in and runs[-fan_in][0] == runs[-1][0]:
+                        level = runs[-1][0]
+                        merged = _merge_spills(
+                            [spill_file for _, spill_file in runs[-fan_in:]], version, directory
+                        )
+                        del runs[-fan_in:]
+                        runs.append((level + 1, merged))
+
+    prefixes = read_prefixes(lines)
+    while True:
+        # Parse as many prefixes as fit in memory at once
+        batch = list(islice(prefixes, chunk_size - len(chunks[4]) - len(chunks[6])))
+        if not batch:
+            break
+        with stats.timer("parse"):
+            parsed = parse_prefixes(batch)
+        del batch
+        for version, records in parsed.items():
+            stats.inputs += len(records)
+            with stats.timer("filter"):
+                kept = [record for record in records if record[1] <= max_length]
+                stats.filtered += len(records) - len(kept)
+                records = kept
+                if not records:
+                    continue
+                versions.add(version)
+                if truncate is not False:
+                    width = MAX_PREFIXLEN[version]
+                    if truncate < width:
+                        stats.truncated += sum(
+                            1 for _, prefixlen in records if prefixlen > truncate
+                        )
+                    records = truncate_records(records, truncate, width)
+            chunks[version] += records
+
+        if len(chunks[4]) + len(chunks[6]) >= chunk_size:
+            flush()
+
+    if any(spill_files.values()):
+        flush()
+
+    # IP versions are merged and aggregated one after the other
+    for version in sorted(versions):
+        network_class = IPv4Network if version == 4 else IPv6Network
+
+        # Merge sorted chunks. Smallest runs are merged first, just enough of
+        # them to merge what is left at once
+        runs = [spill_file for _, spill_file in spill_files[version]]
+        while len(runs) > fan_in:
+            count = min(fan_in, len(runs) - fan_in + 1)
+            merged = _merge_spills(runs[-count:], version, directory)
+            del runs[-count:]
+            runs.append(merged)
+        if runs:
+            records = heapq.merge(*(_read_spill(spill_file, version) for spill_file in runs))
+        else:
+            records = chunks[version]
+            with stats.timer("sort"):
+                records.sort()
+
+        width = MAX_PREFIXLEN[version]
+        for first_address, last_address in find_ranges(records, width, stats):
+            for record in range_to_prefixes(first_address, last_address, width):
+                stats.aggregates += 1
+                yield network_class(record)
+    LOGGER.debug("Aggregation stats:\n%s", stats)
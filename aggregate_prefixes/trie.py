@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+
+# MIT License
+
+# Copyright (c) 2022, Marco Marzetti <marco@lamehost.it>
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Provides path-compressed binary trie for package aggregate-prefixes
+
+Nodes live in flat arrays indexed by node number rather than in one Python
+object per node. Every node stores the prefix it stands for, so that chains
+of single-child nodes are skipped: apart from the roots, a node either has
+two children or none (PATRICIA trie). A node flagged as full is entirely
+covered by the prefix set, so it never has children: covered children are
+dropped when a covering prefix is added and sibling pairs are collapsed into
+their parent as soon as both are full and one bit longer than it. Full nodes
+are therefore exactly the aggregates. Every IP version has a root of its
+own.
+"""
+
+
+from array import array
+from collections.abc import Iterable, Iterator
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+from typing import Optional, Union
+
+from .engine import MAX_PREFIXLEN
+from .parser import parse_prefix, parse_prefixes
+
+# Root node of every IP version
+_ROOTS = {4: 0, 6: 1}
+
+
+class PrefixTrie:
+    """
+    Path-compressed binary trie of IPv4 and IPv6 prefixes, aggregated as they
+    are added.
+
+    Parameters
+    ----------
+    prefixes : Iterable[Union[str, IPv4Network, IPv6Network]]
+        Initial IPv4 and IPv6 prefixes serialized as either string,
+        IPv4Network or IPv6Network
+    """
+
+    def __init__(self, prefixes: Iterable[Union[str, IPv4Network, IPv6Network]] = ()):
+        # Nodes 0 and 1 are the roots, standing for ::/0 and 0.0.0.0/0.
+        # Child 0 means no child, as roots are nobody's children. IPv6
+        # networks do not fit arrays, so they are kept in a list
+        self._network = [0, 0]
+        self._prefixlen = array("B", [0, 0])
+        self._zero = array("I", [0, 0])
+        self._one = array("I", [0, 0])
+        self._full = bytearray(2)
+        self._free: list[int] = []
+
+        for version, records in parse_prefixes(prefixes).items():
+            for network, prefixlen in records:
+                self.insert(version, network, prefixlen)
+
+    def _new_node(self, network: int, prefixlen: int, full: int) -> int:
+        """
+        Allocates a childless node, recycling released ones first
+
+        Parameters:
+        -----------
+        network: int
+            Network address serialized as integer
+        prefixlen: int
+            Prefix length
+        full: int
+            1 if the node is entirely covered, 0 otherwise
+
+        Returns
+        -------
+        int: Node number
+        """
+        if self._free:
+            node = self._free.pop()
+            self._network[node] = network
+            self._prefixlen[node] = prefixlen
+            self._full[node] = full
+            return node
+        self._network.append(network)
+        self._prefixlen.append(prefixlen)
+        self._zero.append(0)
+        self._one.append(0)
+        self._full.append(full)
+        return len(self._full) - 1
+
+    def _release_children(self, node: int) -> None:
+        """
+        Releases all the descendants of a node
+
+        Parameters:
+        -----------
+        node: int
+            Node number
+        """
+        zero, one, full, free = self._zero, self._one, self._full, self._free
+        stack = [zero[node], one[node]]
+        zero[node] = one[node] = 0
+        while stack:
+            child = stack.pop()
+            if child:
+                stack.append(zero[child])
+                stack.append(one[child])
+                zero[child] = one[child] = full[child] = 0
+                free.append(child)
+
+    def _collapse(self, path: list[int]) -> None:
+        """
+        Collapses full siblings into their parent, bottom up
+
+        Parameters:
+        -----------
+        path: list[int]
+            Nodes from the root down to the one whose children changed
+        """
+        zero, one, full, prefixlens = self._zero, self._one, self._full, self._prefixlen
+        while path:
+            node = path.pop()
+            left, right = zero[node], one[node]
+            if not (left and right and full[left] and full[right]):
+                break
+            # Children at the end of compressed paths do not cover their parent
+            depth = prefixlens[node] + 1
+            if prefixlens[left] != depth or prefixlens[right] != depth:
+                break
+            full[node] = 1
+            self._release_children(node)
+
+    def insert(self, version: int, network: int, prefixlen: int) -> None:
+        """
+        Adds a prefix serialized as integers
+
+        Parameters:
+        -----------
+        version: int
+            IP version of the prefix
+        network: int
+            Network address serialized as integer
+        prefixlen: int
+            Prefix length
+        """
+        width = MAX_PREFIXLEN[version]
+        networks, prefixlens = self._network, self._prefixlen
+        zero, one, full = self._zero, self._one, self._full
+
+        node = _ROOTS[version]
+        path = []
+        # node always covers the prefix
+        while True:
+            if full[node]:
+                return
+            depth = prefixlens[node]
+            if depth == prefixlen:
+                full[node] = 1
+                self._release_children(node)
+                break
+            path.append(node)
+            children = one if (network >> (width - 1 - depth)) & 1 else zero
+            child = children[node]
+            if not child:
+                children[node] = self._new_node(network, prefixlen, 1)
+                break
+
+            # Length of the prefix child and the new prefix share
+            child_prefixlen = prefixlens[child]
+            common = min(
+                child_prefixlen,
+                prefixlen,
+                width - (networks[child] ^ network).bit_length(),
+            )
+            if common == child_prefixlen:
+                node = child
+            elif common == prefixlen:
+                # The new prefix covers child
+                self._release_children(child)
+                full[child] = 1
+                networks[child] = network
+                prefixlens[child] = prefixlen
+                break
+            else:
+                # Branch off where the prefixes diverge
+                hostbits = width - common
+                branch = self._new_node(network >> hostbits << hostbits, common, 0)
+                leaf = self._new_node(network, prefixlen, 1)
+                if (network >> (hostbits - 1)) & 1:
+                    zero[branch], one[branch] = child, leaf
+                else:
+                    zero[branch], one[branch] = leaf, child
+                children[node] = branch
+                path.append(branch)
+                break
+
+        self._collapse(path)
+
+    def add(self, prefix: Union[str, IPv4Network, IPv6Network]) -> None:
+        """
+        Adds a prefix
+
+        Parameters:
+        -----------
+        prefix: Union[str, IPv4Network, IPv6Network]
+            Prefix serialized as either string, IPv4Network or IPv6Network
+        """
+        self.insert(*parse_prefix(prefix))
+
+    def records(self, version: int) -> Iterator[tuple[int, int]]:
+        """
+        Returns the aggregates of an IP version serialized as integers
+
+        Parameters:
+        -----------
+        version: int
+            IP version of the aggregates
+
+        Returns
+        -------
+        Iterator[tuple[int, int]]:
+            Sorted iterable of aggregates serialized as (network, prefixlen)
+            tuples
+        """
+        networks, prefixlens = self._network, self._prefixlen
+        zero, one, full = self._zero, self._one, self._full
+
+        stack = [_ROOTS[version]]
+        while stack:
+            node = stack.pop()
+            if full[node]:
+                yield networks[node], prefixlens[node]
+                continue
+            # Push ones first, so that zeroes are walked first
+            if one[node]:
+                stack.append(one[node])
+            if zero[node]:
+                stack.append(zero[node])
+
+    def aggregates(self) -> Iterator[Union[IPv4Network, IPv6Network]]:
+        """
+        Returns the aggregates
+
+        Returns
+        -------
+        Iterator[Union[IPv4Network, IPv6Network]]:
+            Sorted iterable of IPv4 and IPv6 aggregated prefixes serialized as
+            either IPv4Network or IPv6Network. IPv4 comes first
+        """
+        for version in _ROOTS:
+            network_class = IPv4Network if version == 4 else IPv6Network
+            for record in self.records(version):
+                yield network_class(record)
+
+    def _find(self, version: int, network: int, prefixlen: int) -> Optional[tuple[int, int]]:
+        """
+        Finds the aggregate covering a prefix serialized as integers
+
+        Parameters:
+        -----------
+        version: int
+            IP version of the prefix
+        network: int
+            Network address serialized as integer
+        prefixlen: int
+            Prefix length
+
+        Returns
+        -------
+        Optional[tuple[int, int]]:
+            Aggregate serialized as (network, prefixlen) tuple, None if the
+            prefix is not entirely covered
+        """
+        width = MAX_PREFIXLEN[version]
+        networks, prefixlens = self._network, self._prefixlen
+        zero, one, full = self._zero, self._one, self._full
+
+        node = _ROOTS[version]
+        while True:
+            depth = prefixlens[node]
+            # Compressed paths may skip past or away from the prefix
+            if depth > prefixlen or (networks[node] ^ network) >> (width - depth):
+                return None
+            if full[node]:
+                return networks[node], depth
+            if depth == prefixlen:
+                return None
+            node = (one if (network >> (width - 1 - depth)) & 1 else zero)[node]
+            if not node:
+                return None
+
+    def covers(self, prefix: Union[str, IPv4Network, IPv6Network]) -> bool:
+        """
+        Checks if a prefix is entirely covered by the aggregates
+
+        Parameters:
+        -----------
+        prefix: Union[str, IPv4Network, IPv6Network]
+            Prefix serialized as either string, IPv4Network or IPv6Network
+
+        Returns
+        -------
+        bool: True if the prefix is covered
+        """
+        return self._find(*parse_prefix(prefix)) is not None
+
+    def lookup(
+        self, address: Union[str, IPv4Address, IPv6Address]
+    ) -> Optional[Union[IPv4Network, IPv6Network]]:
+        """
+        Finds the aggregate an address belongs to
+
+        Parameters:
+        -----------
+        address: Union[str, IPv4Address, IPv6Address]
+            Address serialized as either string, IPv4Address or IPv6Address.
+            ValueError is raised on prefixes other than host routes
+
+        Returns
+        -------
+        Optional[Union[IPv4Network, IPv6Network]]:
+            Aggregate serialized as either IPv4Network or IPv6Network, None if
+            the address is not covered
+        """
+        if not isinstance(address, str):
+            address = str(address)
+        version, network, prefixlen = parse_prefix(address)
+        if prefixlen != MAX_PREFIXLEN[version]:
+            raise ValueError(f"{address} is not an IP address")
+        record = self._find(version, network, prefixlen)
+        if record is None:
+            return None
+        return (IPv4Network if version == 4 else IPv6Network)(record)
+
+    def __contains__(self, prefix: Union[str, IPv4Network, IPv6Network]) -> bool:
+        return self.covers(prefix)
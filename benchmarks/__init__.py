@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for package aggregate-prefixes
+"""
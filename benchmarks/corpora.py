@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Deterministic prefix corpora for benchmarks
+
+Every generator takes the number of prefixes and a seed and always returns
+the same list of prefixes serialized as strings.
+"""
+
+import random
+from ipaddress import IPv4Address, IPv6Address
+
+# Rough prefix length distribution of an IPv4 full table
+FULL_TABLE_LENGTHS = {24: 60, 23: 9, 22: 12, 21: 5, 20: 5, 19: 3, 18: 2, 17: 1, 16: 2, 12: 1}
+
+
+def full_table(size: int, seed: int = 0) -> list[str]:
+    """IPv4 unicast prefixes with a full-table-like length distribution"""
+    rng = random.Random(seed)
+    lengths = rng.choices(
+        list(FULL_TABLE_LENGTHS), weights=list(FULL_TABLE_LENGTHS.values()), k=size
+    )
+    prefixes = []
+    for prefixlen in lengths:
+        network = rng.randint(0x01000000, 0xDFFFFFFF) & ~((1 << (32 - prefixlen)) - 1)
+        prefixes.append(f"{IPv4Address(network)}/{prefixlen}")
+    return prefixes
+
+
+def dense_hosts(size: int, seed: int = 0) -> list[str]:
+    """Mostly contiguous IPv4 /32 host routes with a few holes, shuffled"""
+    rng = random.Random(seed)
+    prefixes = []
+    address = 0x0A000000
+    while len(prefixes) < size:
+        if rng.random() < 0.95:
+            prefixes.append(f"{IPv4Address(address)}/32")
+        address += 1
+    rng.shuffle(prefixes)
+    return prefixes
+
+
+def sparse_ipv6(size: int, seed: int = 0) -> list[str]:
+    """IPv6 /48s scattered over 2000::/3"""
+    rng = random.Random(seed)
+    return [
+        f"{IPv6Address((0x2000 | rng.getrandbits(13)) << 112 | rng.getrandbits(32) << 80)}/48"
+        for _ in range(size)
+    ]
+
+
+def nested(size: int, seed: int = 0) -> list[str]:
+    """IPv4 prefixes nested within each other, from /8 down to /32"""
+    rng = random.Random(seed)
+    prefixes = []
+    while len(prefixes) < size:
+        address = rng.getrandbits(32)
+        for prefixlen in range(rng.randint(8, 16), 33, rng.randint(1, 4)):
+            network = address & ~((1 << (32 - prefixlen)) - 1)
+            prefixes.append(f"{IPv4Address(network)}/{prefixlen}")
+    rng.shuffle(prefixes)
+    return prefixes[:size]
+
+
+def staircase(size: int, seed: int = 0) -> list[str]:
+    """Contiguous IPv6 /128s starting at an odd address, worst case of shrinking loops"""
+    rng = random.Random(seed)
+    start = 0x20010DB8 << 96 | 1
+    prefixes = [f"{IPv6Address(start + offset)}/128" for offset in range(size)]
+    rng.shuffle(prefixes)
+    return prefixes
+
+
+CORPORA = {
+    "full-table": full_table,
+    "dense-hosts": dense_hosts,
+    "sparse-ipv6": sparse_ipv6,
+    "nested": nested,
+    "staircase": staircase,
+}
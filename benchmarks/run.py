@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runs benchmarks for package aggregate-prefixes
+
+Engines are benchmarked through the public aggregate_prefixes function, stage
+timings come from its Stats. The legacy engine runs a frozen copy of the
+original network object based algorithm instead, kept in benchmarks.legacy.
+Every corpus/engine pair runs in a fresh interpreter, so that peak RSS is
+measured in isolation. Run from the repository root:
+
+    python -m benchmarks.run --size 100000
+"""
+
+import argparse
+import json
+import subprocess  # nosec B404
+import sys
+import time
+from collections.abc import Callable
+from ipaddress import ip_network
+
+from aggregate_prefixes import Stats, aggregate_prefixes
+from aggregate_prefixes.numpy_engine import AVAILABLE as NUMPY_AVAILABLE
+
+from .corpora import CORPORA
+from .legacy import aggregate_aggregatable, find_aggregatables
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+def peak_rss() -> int:
+    """Peak resident set size of the current process in bytes, 0 if unknown"""
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def timed(stages: dict[str, float], name: str, function: Callable):
+    """Calls function, storing its wall time in stages"""
+    start = time.perf_counter()
+    result = function()
+    stages[name] = time.perf_counter() - start
+    return result
+
+
+def package_engine(engine: str) -> Callable[[list[str], dict[str, float]], int]:
+    """aggregate_prefixes with one of its engines"""
+    def run(prefixes: list[str], stages: dict[str, float]) -> int:
+        stats = Stats()
+        aggregates = list(aggregate_prefixes(prefixes, engine=engine, stats=stats))
+        stages.update(stats.timings)
+        return len(aggregates)
+
+    return run
+
+
+def legacy_engine(prefixes: list[str], stages: dict[str, float]) -> int:
+    """Original network object based algorithm"""
+    networks = timed(stages, "parse", lambda: [ip_network(prefix, False) for prefix in prefixes])
+    timed(stages, "sort", lambda: networks.sort(key=lambda p: (p.network_address, p.prefixlen)))
+    aggregatables = timed(stages, "chunk", lambda: list(find_aggregatables(networks)))
+    aggregates = timed(
+        stages,
+        "aggregate",
+        lambda: [
+            aggregate
+            for aggregatable in aggregatables
+            for aggregate in aggregate_aggregatable(aggregatable)
+        ],
+    )
+    return len(aggregates)
+
+
+ENGINES = {
+    "python": package_engine("python"),
+    "trie": package_engine("trie"),
+    "numpy": package_engine("numpy"),
+    "legacy": legacy_engine,
+}
+
+
+def run_case(corpus: str, engine: str, size: int, seed: int) -> dict:
+    """Runs a single corpus/engine pair in the current process"""
+    prefixes = CORPORA[corpus](size, seed)
+    stages = {}
+    start = time.perf_counter()
+    count = ENGINES[engine](prefixes, stages)
+    total = time.perf_counter() - start
+    return {
+        "corpus": corpus,
+        "engine": engine,
+        "size": size,
+        "aggregates": count,
+        "stages": stages,
+        "total": total,
+        "throughput": size / total if total else 0,
+        "peak_rss": peak_rss(),
+    }
+
+
+def main() -> None:
+    """Runs benchmarks and prints a report"""
+    parser = argparse.ArgumentParser(description="Benchmarks for package aggregate-prefixes")
+    parser.add_argument("--corpus", choices=CORPORA, action="append", help="Default: all")
+    parser.add_argument("--engine", choices=ENGINES, action="append", help="Default: all")
+    parser.add_argument("--size", type=int, default=100000, help="Prefixes per corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for corpus generators")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    corpora = args.corpus or list(CORPORA)
+    engines = args.engine or [
+        engine for engine in ENGINES if engine != "numpy" or NUMPY_AVAILABLE
+    ]
+
+    if args.single:
+        print(json.dumps(run_case(corpora[0], engines[0], args.size, args.seed)))
+        return
+
+    if not args.json:
+        print(
+            f"{'corpus':<12} {'engine':<7} {'aggregates':>10} {'prefixes/s':>12} "
+            f"{'peak RSS MB':>11}  stages (s)"
+        )
+    for corpus in corpora:
+        for engine in engines:
+            command = [
+                sys.executable, "-m", "benchmarks.run", "--single",
+                "--corpus", corpus, "--engine", engine,
+                "--size", str(args.size), "--seed", str(args.seed),
+            ]
+            output = subprocess.run(  # nosec B603
+                command, check=True, capture_output=True, text=True
+            ).stdout
+            if args.json:
+                print(output.strip())
+                continue
+            result = json.loads(output)
+            stages = " ".join(f"{name}={elapsed:.3f}" for name, elapsed in result["stages"].items())
+            print(
+                f"{corpus:<12} {engine:<7} {result['aggregates']:>10} "
+                f"{result['throughput']:>12.0f} {result['peak_rss'] / 2**20:>11.1f}  {stages}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measures startup time of package aggregate-prefixes
+
+Short invocations are dominated by interpreter startup and imports. Every
+case runs in a fresh interpreter and the median wall time is reported, along
+with the slowest imports of the CLI entry point as measured by
+python -X importtime. Modules listed in FAST_PATH_EXCLUDED must not be
+imported by common invocations and importing the package must fit in the
+--budget: --check exits with an error otherwise.
+Run from the repository root:
+
+    python -m benchmarks.startup --runs 20
+"""
+
+import argparse
+import json
+import statistics
+import subprocess  # nosec B404
+import sys
+import time
+
+INPUT = b"192.0.2.0/25\n192.0.2.128/25\n198.51.100.0/24\n"
+
+CASES = {
+    "interpreter": ["-c", "pass"],
+    "import": ["-c", "import aggregate_prefixes"],
+    "cli": ["-m", "aggregate_prefixes", "-m", "24"],
+    "cli-full": ["-m", "aggregate_prefixes", "--stats"],
+}
+
+FAST_PATH_EXCLUDED = (
+    "aggregate_prefixes.binary",
+    "aggregate_prefixes.setops",
+    "aggregate_prefixes.stats",
+    "aggregate_prefixes.trie",
+    "argparse",
+    "asyncio",
+    "bz2",
+    "concurrent.futures",
+    "dataclasses",
+    "gzip",
+    "ipaddress",
+    "json",
+    "logging",
+    "lzma",
+    "mmap",
+    "multiprocessing",
+    "numpy",
+    "tempfile",
+    "threading",
+)
+
+# Milliseconds the CLI may spend importing the package, including the
+# standard library modules it pulls in
+BUDGET = 45.0
+
+
+def wall_time(arguments: list[str], runs: int) -> float:
+    """Median wall time of a command in seconds"""
+    elapsed = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(  # nosec B603
+            [sys.executable, *arguments], input=INPUT, check=True, capture_output=True
+        )
+        elapsed.append(time.perf_counter() - start)
+    return statistics.median(elapsed)
+
+
+def import_times() -> tuple[dict[str, int], int, list[str]]:
+    """
+    Cumulative import time of every module imported by the CLI, in
+    microseconds, total import time of the package and excluded modules it
+    imported
+    """
+    code = (
+        "import sys; sys.argv = ['aggregate-prefixes', '-m', '24']; "
+        "from aggregate_prefixes.__main__ import main; main(); "
+        f"print(' '.join(name for name in {FAST_PATH_EXCLUDED!r} if name in sys.modules))"
+    )
+    output = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", code],
+        input=INPUT,
+        check=True,
+        capture_output=True,
+    )
+    times = {}
+    package = 0
+    for line in output.stderr.decode().splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+        # Top level imports are not indented, nested ones are already counted
+        if name.startswith(" aggregate_prefixes"):
+            package += int(cumulative)
+    # Excluded modules are printed last, after aggregates
+    excluded = output.stdout.decode().splitlines()[-1].split()
+    return times, package, excluded
+
+
+def main() -> None:
+    """Runs startup benchmarks and prints a report"""
+    parser = argparse.ArgumentParser(description="Startup benchmarks for aggregate-prefixes")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per case")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to report")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=BUDGET,
+        help=f"Milliseconds the CLI may spend importing the package (default: {BUDGET:g})",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Fail if the CLI imports excluded modules or exceeds the budget",
+    )
+    args = parser.parse_args()
+
+    results = {case: wall_time(arguments, args.runs) for case, arguments in CASES.items()}
+    times, package, excluded = import_times()
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "wall": results,
+                    "imports": dict(slowest),
+                    "package": package,
+                    "excluded": excluded,
+                }
+            )
+        )
+    else:
+        for case, elapsed in results.items():
+            print(f"{case:<12} {elapsed * 1000:>8.1f} ms")
+        print("\nslowest imports (cumulative)")
+        for name, elapsed in slowest:
+            print(f"{name:<40} {elapsed / 1000:>8.1f} ms")
+        print(f"\npackage import time: {package / 1000:.1f} ms (budget: {args.budget:g} ms)")
+        print(f"excluded modules imported by the CLI: {', '.join(excluded) or 'none'}")
+
+    if args.check and excluded:
+        sys.exit(f"ERROR: CLI imports {', '.join(excluded)}")
+    if args.check and package / 1000 > args.budget:
+        sys.exit(f"ERROR: CLI spends {package / 1000:.1f} ms importing the package")
+
+
+if __name__ == "__main__":
+    main()
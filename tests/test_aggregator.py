@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for incremental aggregation
+"""
+
+import random
+import unittest
+
+from aggregate_prefixes import Aggregator, aggregate_prefixes
+
+
+class TestAggregator(unittest.TestCase):
+    """
+    Provide tests for incremental aggregation
+    """
+    def test_00__add_remove(self):
+        """Test if aggregates follow additions and removals"""
+        aggregator = Aggregator(["192.0.2.0/25"])
+        aggregator.add("192.0.2.128/25")
+        self.assertEqual(list(map(str, aggregator.aggregates())), ["192.0.2.0/24"])
+        aggregator.remove("192.0.2.0/25")
+        self.assertEqual(list(map(str, aggregator.aggregates())), ["192.0.2.128/25"])
+        with self.assertRaises(KeyError):
+            aggregator.remove("192.0.2.0/25")
+
+    def test_01__duplicates(self):
+        """Test if duplicates must be removed as many times as they were added"""
+        aggregator = Aggregator(["2001:db8::/32", "2001:db8::/32"])
+        aggregator.remove("2001:db8::/32")
+        self.assertEqual(list(map(str, aggregator.aggregates())), ["2001:db8::/32"])
+        aggregator.remove("2001:db8::/32")
+        self.assertEqual(list(aggregator.aggregates()), [])
+
+    def test_02__compare_with_aggregate_prefixes(self):
+        """Test if random updates match aggregate_prefixes"""
+        rng = random.Random(0)
+        aggregator = Aggregator(max_length=31)
+        current = []
+        for _ in range(2000):
+            if current and rng.random() < 0.4:
+                aggregator.remove(current.pop(rng.randrange(len(current))))
+            else:
+                prefix = f"192.0.2.{rng.randint(0, 255)}/{rng.randint(26, 32)}"
+                aggregator.add(prefix)
+                current.append(prefix)
+            if rng.random() < 0.1:
+                self.assertEqual(
+                    list(aggregator.aggregates()),
+                    list(aggregate_prefixes(current, 31))
+                )
+
+    def test_03__mix_v4_v6(self):
+        """Test if IPv4 and IPv6 are aggregated independently, IPv4 first"""
+        aggregator = Aggregator(["2001:db8::/33", "192.0.2.0/25"])
+        aggregator.add("2001:db8:8000::/33")
+        aggregator.add("192.0.2.128/25")
+        self.assertEqual(
+            list(map(str, aggregator.aggregates())), ["192.0.2.0/24", "2001:db8::/32"]
+        )
+        aggregator.remove("192.0.2.0/25")
+        self.assertEqual(
+            list(map(str, aggregator.aggregates())), ["192.0.2.128/25", "2001:db8::/32"]
+        )
+        with self.assertRaises(KeyError):
+            aggregator.remove("::/0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the binary prefix-set format
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from aggregate_prefixes.__main__ import main as cli_main
+from aggregate_prefixes.binary import aggregate_binary, read_binary, write_binary
+
+
+class TestBinary(unittest.TestCase):
+    """
+    Provide tests for the binary prefix-set format
+    """
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_00__round_trip(self):
+        """Test if records survive a round trip, through mmap and plain reads"""
+        records = [(0x20010DB8 << 96, 32), (0x20010DB9 << 96, 48), (2**128 - 1, 128)]
+        with open(self.path, "wb") as file:
+            self.assertEqual(write_binary(file, records, 6), 3)
+        with open(self.path, "rb") as file:
+            version, count, decoded = read_binary(file)
+            self.assertEqual((version, count, list(decoded)), (6, 3, records))
+
+        buffer = io.BytesIO()
+        write_binary(buffer, [(1, 32)], 4)
+        buffer.seek(0)
+        self.assertEqual(list(read_binary(buffer)[2]), [(1, 32)])
+
+    def test_01__invalid(self):
+        """Test if invalid or truncated input raises ValueError"""
+        with self.assertRaises(ValueError):
+            read_binary(io.BytesIO(b"192.0.2.0/24\n"))
+        buffer = io.BytesIO()
+        write_binary(buffer, [(1, 32), (2, 32)], 4)
+        with self.assertRaises(ValueError):
+            read_binary(io.BytesIO(buffer.getvalue()[:-1]))
+
+    def test_02__aggregate(self):
+        """Test if sorted records are aggregated, filtered and truncated"""
+        records = [(0xC0000200, 25), (0xC0000280, 26), (0xC00002C0, 26), (0xC6336401, 32)]
+        buffer = io.BytesIO()
+        write_binary(buffer, records, 4)
+        buffer.seek(0)
+        self.assertEqual(
+            list(aggregate_binary(buffer)[1]), [(0xC0000200, 24), (0xC6336401, 32)]
+        )
+        buffer.seek(0)
+        self.assertEqual(list(aggregate_binary(buffer, max_length=25)[1]), [(0xC0000200, 25)])
+        buffer.seek(0)
+        self.assertEqual(
+            list(aggregate_binary(buffer, truncate=16)[1]), [(0xC0000000, 16), (0xC6330000, 16)]
+        )
+
+    def test_03__cli(self):
+        """Test if CLI converts text to binary and back"""
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with patch.object(sys, 'stdin', io.StringIO("192.0.2.0/25\n192.0.2.128/25\n")), \
+                patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'argv', ["prog.py", "--output-format", "bin", "-"]):
+            cli_main()
+        with open(self.path, "wb") as file:
+            file.write(stdout.buffer.getvalue())
+
+        stdout = io.StringIO()
+        with patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'argv', ["prog.py", "--input-format", "bin", self.path]):
+            cli_main()
+        self.assertEqual(stdout.getvalue(), "192.0.2.0/24\n")
+
+    def test_04__cli_mixed_versions(self):
+        """Test if CLI refuses to write both IP versions as binary, without writing anything"""
+        for argv in ([], ["--stream"], ["--compress", "gz"]):
+            stdout = io.TextIOWrapper(io.BytesIO())
+            with patch.object(sys, 'stdin', io.StringIO("192.0.2.0/24\n2001:db8::/32\n")), \
+                    patch.object(sys, 'stdout', stdout), \
+                    patch.object(sys, 'argv', ["prog.py", "--output-format", "bin", *argv, "-"]):
+                with self.assertRaisesRegex(SystemExit, "single IP version"):
+                    cli_main()
+            self.assertEqual(stdout.buffer.getvalue(), b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the result cache
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from ipaddress import ip_network
+from unittest.mock import patch
+
+from aggregate_prefixes import AggregateCache, aggregate_prefixes
+from aggregate_prefixes.__main__ import main as cli_main
+from aggregate_prefixes.cache import fingerprint
+
+
+class TestCache(unittest.TestCase):
+    """
+    Provide tests for the result cache
+    """
+    def test_00__fingerprint(self):
+        """Test if fingerprint ignores order but not arguments"""
+        prefixes = [f"10.{i}.0.0/16" for i in range(64)]
+        shuffled = random.Random(0).sample(prefixes, len(prefixes))
+        self.assertEqual(fingerprint(prefixes), fingerprint(shuffled))
+        self.assertNotEqual(fingerprint(prefixes), fingerprint(prefixes, max_length=24))
+        self.assertNotEqual(fingerprint(prefixes), fingerprint(prefixes, truncate=8))
+        self.assertNotEqual(fingerprint(prefixes), fingerprint(prefixes[1:]))
+        self.assertNotEqual(fingerprint(prefixes), fingerprint(prefixes + prefixes[:1]))
+
+    def test_01__hit(self):
+        """Test if hits return the same aggregates as misses"""
+        cache = AggregateCache()
+        prefixes = ["2001:db8::/33", "2001:db8:8000::/33", "2001:db8::1/128"]
+        first = list(aggregate_prefixes(prefixes, cache=cache))
+        second = list(aggregate_prefixes(prefixes[::-1], cache=cache))
+        self.assertEqual(first, second)
+        self.assertEqual(list(map(str, second)), ["2001:db8::/32"])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        list(aggregate_prefixes(prefixes, truncate=16, cache=cache))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_02__eviction(self):
+        """Test if least recently used entries are evicted"""
+        cache = AggregateCache(max_entries=2)
+        for prefix in ("192.0.2.0/24", "198.51.100.0/24", "192.0.2.0/24", "203.0.113.0/24"):
+            list(aggregate_prefixes([prefix], cache=cache))
+        self.assertEqual(len(cache), 2)
+        list(aggregate_prefixes(["192.0.2.0/24"], cache=cache))
+        list(aggregate_prefixes(["198.51.100.0/24"], cache=cache))
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+        cache = AggregateCache(max_bytes=10)
+        list(aggregate_prefixes(["192.0.2.0/24", "203.0.113.0/24"], cache=cache))
+        self.assertEqual((len(cache), cache.nbytes), (1, 10))
+        list(aggregate_prefixes(["192.0.2.0/24"], cache=cache))
+        self.assertEqual((len(cache), cache.nbytes), (1, 5))
+
+    def test_03__directory(self):
+        """Test if entries stored in directory are shared across caches"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        prefixes = ["192.0.2.0/25", "192.0.2.128/25"]
+        list(aggregate_prefixes(prefixes, cache=AggregateCache(directory=directory)))
+        cache = AggregateCache(max_entries=0, directory=directory)
+        self.assertEqual(
+            list(map(str, aggregate_prefixes(prefixes, cache=cache))), ["192.0.2.0/24"]
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, "w") as file:
+            file.write("\n".join(prefixes))
+        self.addCleanup(os.remove, path)
+        stdout = StringIO()
+        with patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'argv', ["prog.py", "--cache-dir", directory, path]):
+            cli_main()
+        self.assertEqual(stdout.getvalue(), "192.0.2.0/24\n")
+
+    def test_04__mix_v4_v6(self):
+        """Test if entries hold aggregates of both IP versions"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        prefixes = ["2001:db8::/33", "192.0.2.0/25", "2001:db8:8000::/33", "192.0.2.128/25"]
+        expected = ["192.0.2.0/24", "2001:db8::/32"]
+        list(aggregate_prefixes(prefixes, cache=AggregateCache(directory=directory)))
+        cache = AggregateCache(directory=directory)
+        self.assertEqual(list(map(str, aggregate_prefixes(prefixes, cache=cache))), expected)
+        self.assertEqual(list(map(str, aggregate_prefixes(prefixes, cache=cache))), expected)
+        self.assertEqual((cache.hits, cache.misses, cache.nbytes), (2, 0, 22))
+
+    def test_05__sorted_flags(self):
+        """Test if order dependent results are neither stored nor returned"""
+        cache = AggregateCache()
+        prefixes = ["192.0.2.128/25", "192.0.2.0/25"]
+        list(aggregate_prefixes(prefixes, assume_sorted=True, cache=cache))
+        self.assertEqual(
+            list(map(str, aggregate_prefixes(prefixes, cache=cache))), ["192.0.2.0/24"]
+        )
+        self.assertEqual((len(cache), cache.hits, cache.misses), (1, 0, 1))
+        with self.assertRaises(ValueError):
+            list(aggregate_prefixes(prefixes, validate_sorted=True, cache=cache))
+
+    def test_06__fingerprint_notation(self):
+        """Test if fingerprint ignores notation and does not cancel duplicates out"""
+        self.assertEqual(
+            fingerprint(["192.0.2.1", "2001:0db8:0000::/32"]),
+            fingerprint(["2001:db8::/32", "192.0.2.1/32"]),
+        )
+        self.assertEqual(
+            fingerprint(["192.0.2.0/24"]), fingerprint([ip_network("192.0.2.0/24")])
+        )
+        # Digests of duplicates used to add up to the digests of other sets
+        for duplicates in (["192.0.2.0/24"] * 2**16, ["192.0.2.0/24", "192.0.2.0/24"]):
+            self.assertNotEqual(fingerprint(duplicates), fingerprint(["198.51.100.0/24"]))
+        self.assertNotEqual(
+            fingerprint(["192.0.2.0/24", "192.0.2.0/24", "198.51.100.0/24"]),
+            fingerprint(["192.0.2.0/24", "198.51.100.0/24", "198.51.100.0/24"]),
+        )
+        with self.assertRaises(ValueError):
+            fingerprint(["192.0.2.0/33"])
+
+    def test_07__unwritable_directory(self):
+        """Test if entries that can not be written are kept in memory"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = AggregateCache(directory=os.path.join(directory, "cache"))
+        prefixes = ["192.0.2.0/25", "192.0.2.128/25"]
+        with patch("os.replace", side_effect=PermissionError("denied")):
+            list(aggregate_prefixes(prefixes, cache=cache))
+        self.assertEqual(os.listdir(cache.directory), [])
+        self.assertEqual(
+            list(map(str, aggregate_prefixes(prefixes, cache=cache))), ["192.0.2.0/24"]
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache = AggregateCache(directory=os.path.join(directory, "file"))
+        with open(cache.directory, "w", encoding="utf-8"):
+            pass
+        list(aggregate_prefixes(["192.0.2.0/24"], cache=cache))
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the CLI entry point
+"""
+
+import os
+import subprocess  # nosec B404
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from aggregate_prefixes.__main__ import main as cli_main
+from aggregate_prefixes.__main__ import parse_fast_args
+from aggregate_prefixes.cli import main as full_main
+
+
+class TestCLI(unittest.TestCase):
+    """
+    Provide tests for the CLI entry point
+    """
+    def test_00__parse_fast_args(self):
+        """Test if only common invocations skip the full parser"""
+        self.assertEqual(
+            parse_fast_args(["-m", "24", "--truncate=16", "-s", "prefixes.txt"]),
+            {"path": "prefixes.txt", "max_length": 24, "truncate": 16, "strip_host_mask": True},
+        )
+        self.assertEqual(parse_fast_args([])["path"], "-")
+        for argv in (
+            ["--stats"],
+            ["-m"],
+            ["-m", "foo"],
+            ["a.txt", "b.txt"],
+            ["*.txt"],
+            ["diff", "a.txt", "b.txt"],
+            ["serve", "--port", "8000"],
+            ["--version"],
+            ["-sm", "24"],
+        ):
+            self.assertIsNone(parse_fast_args(argv), argv)
+
+    def test_01__same_output(self):
+        """Test if common invocations print the same as the full parser"""
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, "w") as file:
+            file.write("192.0.2.1/32\n192.0.2.0/32 # comment\n10.0.0.0/25\n10.0.0.128/25\n")
+        self.addCleanup(os.remove, path)
+        for argv in ([path], ["-s", path], ["-m", "31", path], ["-t", "24", path]):
+            outputs = []
+            for main in (cli_main, full_main):
+                stdout = StringIO()
+                with patch.object(sys, "stdout", stdout), \
+                        patch.object(sys, "argv", ["prog.py"] + argv):
+                    main()
+                outputs.append(stdout.getvalue())
+            self.assertEqual(outputs[0], outputs[1], argv)
+
+    def test_02__errors(self):
+        """Test if errors are reported like the full parser does"""
+        with patch.object(sys, "argv", ["prog.py", "/nonexistent"]), \
+                patch.object(sys, "stderr", StringIO()) as stderr, \
+                self.assertRaises(SystemExit):
+            cli_main()
+        self.assertIn("can't open '/nonexistent'", stderr.getvalue())
+        with patch.object(sys, "argv", ["prog.py"]), \
+                patch.object(sys, "stdin", StringIO("foo\n")), \
+                self.assertRaises(SystemExit) as context:
+            cli_main()
+        self.assertTrue(str(context.exception.code).startswith("ERROR: "))
+
+    def test_03__lazy_imports(self):
+        """Test if common invocations do not import heavy modules"""
+        code = (
+            "import sys; sys.argv = ['prog.py']; "
+            "from aggregate_prefixes.__main__ import main; main(); "
+            "print(sorted({'argparse', 'asyncio', 'concurrent.futures', 'numpy'} "
+            "& set(sys.modules)))"
+        )
+        output = subprocess.run(  # nosec B603
+            [sys.executable, "-c", code],
+            input="192.0.2.0/25\n192.0.2.128/25\n",
+            check=True,
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        self.assertEqual(output.stdout, "192.0.2.0/24\n[]\n")
+
+    def test_04__stats_file(self):
+        """Test if --stats leaves the following file argument alone"""
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, "w") as file:
+            file.write("192.0.2.0/25\n192.0.2.128/25\n")
+        self.addCleanup(os.remove, path)
+        for argv, marker in (
+            (["--stats", path], "Inputs: 2"),
+            (["--stats", "--stats-format", "json", path], '"inputs": 2'),
+        ):
+            with patch.object(sys, "argv", ["prog.py"] + argv), \
+                    patch.object(sys, "stdout", StringIO()) as stdout, \
+                    patch.object(sys, "stderr", StringIO()) as stderr:
+                cli_main()
+            self.assertEqual(stdout.getvalue(), "192.0.2.0/24\n", argv)
+            self.assertIn(marker, stderr.getvalue(), argv)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for compressed input and output
+"""
+
+import bz2
+import gc
+import gzip
+import io
+import lzma
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import warnings
+from unittest.mock import patch
+
+from aggregate_prefixes import compression
+from aggregate_prefixes.__main__ import main as cli_main
+from aggregate_prefixes.compression import detect_compression, open_input, open_output
+
+COMPRESSORS = {"gz": gzip.compress, "bz2": bz2.compress, "xz": lzma.compress}
+if compression.load_zstandard() is not None:
+    COMPRESSORS["zst"] = compression.load_zstandard().ZstdCompressor().compress
+
+
+class TestCompression(unittest.TestCase):
+    """
+    Provide tests for compressed input and output
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.text = "".join(f"10.{i >> 8 & 255}.{i & 255}.0/24\n" for i in range(20000))
+
+    def write(self, name, content):
+        """Writes a file in the temporary directory and returns its path"""
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def test_00__detect_compression(self):
+        """Test if compression is detected from magic bytes, then extension"""
+        for name, compress in COMPRESSORS.items():
+            self.assertEqual(detect_compression(compress(b"192.0.2.0/24")), name)
+        self.assertEqual(detect_compression(b"192.0.2.0/24", "dump.txt.zst"), "zst")
+        self.assertEqual(detect_compression(b"\x1f\x8b", "dump.txt"), "gz")
+        self.assertIsNone(detect_compression(b"192.0.2.0/24", "dump.txt"))
+
+    def test_01__open_input(self):
+        """Test if input is decompressed, in background or not"""
+        for name, compress in COMPRESSORS.items():
+            path = self.write(f"dump.{name}", compress(self.text.encode()))
+            for background_size in (0, 2**40):
+                with patch.object(compression, "BACKGROUND_SIZE", background_size):
+                    with open_input(path) as file:
+                        self.assertEqual(file.read(), self.text)
+        with open_input(self.write("dump.txt", self.text.encode())) as file:
+            self.assertEqual(file.read(), self.text)
+
+    def test_02__truncated_input(self):
+        """Test if decompression errors are raised by the reader"""
+        path = self.write("dump.gz", gzip.compress(self.text.encode())[:-100])
+        with patch.object(compression, "BACKGROUND_SIZE", 0):
+            with self.assertRaises(EOFError):
+                with open_input(path) as file:
+                    file.read()
+
+    def test_03__open_output(self):
+        """Test if output is compressed and underlying file left open"""
+        for name in COMPRESSORS:
+            buffer = io.BytesIO()
+            with open_output(buffer, name) as file:
+                file.write(self.text.encode())
+            self.assertFalse(buffer.closed)
+            path = self.write(f"output.{name}", buffer.getvalue())
+            with open_input(path) as file:
+                self.assertEqual(file.read(), self.text)
+
+    def test_04__cli(self):
+        """Test if CLI reads compressed files and compresses output"""
+        paths = [
+            self.write("a.gz", gzip.compress(b"192.0.2.0/25\n")),
+            self.write("b.xz", lzma.compress(b"192.0.2.128/25\n")),
+        ]
+        for argv in (paths, ["--stream"] + paths, paths[:1]):
+            stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+            with patch.object(sys, "stdout", stdout), \
+                    patch.object(sys, "argv", ["prog.py", "--compress", "bz2"] + argv):
+                cli_main()
+            expected = "192.0.2.0/24\n" if len(argv) > 1 else "192.0.2.0/25\n"
+            self.assertEqual(bz2.decompress(stdout.buffer.getvalue()).decode(), expected)
+
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+        with patch.object(sys, "stdout", stdout), patch.object(
+            sys, "argv", ["prog.py", "--output-format", "bin", "--compress", "gz"] + paths
+        ):
+            cli_main()
+        path = self.write("aggregates.bin.gz", stdout.buffer.getvalue())
+        stdout = io.StringIO()
+        with patch.object(sys, "stdout", stdout), \
+                patch.object(sys, "argv", ["prog.py", "--input-format", "bin", path]):
+            cli_main()
+        self.assertEqual(stdout.getvalue(), "192.0.2.0/24\n")
+
+    def test_05__closed(self):
+        """Test if compressed files are closed together with their decompressor"""
+        paths = []
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            for name, compress in COMPRESSORS.items():
+                path = self.write(f"dump.{name}", compress(b"192.0.2.0/24\n"))
+                paths.append(path)
+                for background_size in (0, 2**40):
+                    with patch.object(compression, "BACKGROUND_SIZE", background_size):
+                        with open_input(path) as file:
+                            file.read()
+                        with open_input(path, binary=True) as file:
+                            file.read()
+            with patch.object(sys, "stdout", io.StringIO()) as stdout, \
+                    patch.object(sys, "argv", ["prog.py", "union"] + paths[:2]):
+                cli_main()
+            self.assertEqual(stdout.getvalue(), "192.0.2.0/24\n")
+            gc.collect()
+        self.assertEqual([str(warning.message) for warning in caught], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the integer based aggregation engine
+"""
+
+import ipaddress
+import random
+import unittest
+
+from aggregate_prefixes.aggregate_prefixes import aggregate_aggregatable, find_aggregatables
+from aggregate_prefixes.engine import (
+    aggregate_sorted,
+    aggregate_sorted_provenance,
+    find_ranges,
+    fit_budget,
+    merge_buddies,
+    range_to_prefixes,
+)
+
+
+def legacy_aggregate(prefixes):
+    """Aggregates prefixes with the network object based functions"""
+    prefixes = sorted(prefixes, key=lambda p: (p.network_address, p.prefixlen))
+    aggregates = []
+    for aggregatable in find_aggregatables(prefixes):
+        aggregates += aggregate_aggregatable(aggregatable)
+    return aggregates
+
+
+def shrinking_aggregate(aggregatable):
+    """Aggregates a chunk trying every shorter length for every prefix"""
+    aggregatable_end = aggregatable[-1].broadcast_address
+    aggregate = aggregatable[0]
+    aggregate_end = False
+    for prefix in aggregatable:
+        if aggregate_end and aggregate_end >= prefix.broadcast_address:
+            continue
+        for tentative_len in range(prefix.prefixlen, -1, -1):
+            tentative = ipaddress.ip_network(f"{prefix.network_address}/{tentative_len}", False)
+            if (
+                prefix.network_address != tentative.network_address
+                or tentative.broadcast_address > aggregatable_end
+            ):
+                break
+            aggregate = tentative
+            aggregate_end = aggregate.broadcast_address
+        yield aggregate
+
+
+def random_records(rng, width, bits):
+    """Sorted random prefixes within the first 2 ** bits addresses of a block"""
+    records = []
+    for _ in range(rng.randint(1, 80)):
+        prefixlen = rng.randint(width - bits, width)
+        network = rng.getrandbits(bits)
+        network &= ~((1 << (width - prefixlen)) - 1)
+        records.append((network, prefixlen))
+    return sorted(records)
+
+
+class TestEngine(unittest.TestCase):
+    """
+    Provide tests for the integer based aggregation engine
+    """
+    def test_00__range_to_prefixes(self):
+        """Test if ranges are split into aligned prefixes"""
+        self.assertEqual(
+            list(range_to_prefixes(5, 199, 8)),
+            [(5, 8), (6, 7), (8, 5), (16, 4), (32, 3), (64, 2), (128, 2), (192, 5)]
+        )
+        self.assertEqual(list(range_to_prefixes(0, 2**32 - 1, 32)), [(0, 0)])
+
+    def test_01__find_ranges(self):
+        """Test if covered and contiguous prefixes are merged in ranges"""
+        records = [(0, 25), (0, 26), (128, 26), (192, 26), (512, 24)]
+        self.assertEqual(list(find_ranges(records, 32)), [(0, 255), (512, 767)])
+        self.assertEqual(list(find_ranges([], 32)), [])
+
+    def test_02__compare_with_legacy(self):
+        """Test if engine matches the network object based functions"""
+        rng = random.Random(0)
+        for width, network_class in ((32, ipaddress.IPv4Network), (128, ipaddress.IPv6Network)):
+            for _ in range(50):
+                prefixes = []
+                for _ in range(rng.randint(1, 60)):
+                    prefixlen = rng.randint(width - 10, width)
+                    network = rng.getrandbits(10) << (width - 10)
+                    network &= ~((1 << (width - prefixlen)) - 1)
+                    prefixes.append(network_class((network, prefixlen)))
+                records = sorted((int(p.network_address), p.prefixlen) for p in prefixes)
+                self.assertEqual(
+                    [network_class(record) for record in aggregate_sorted(records, width)],
+                    legacy_aggregate(prefixes)
+                )
+
+    def test_03__fit_budget(self):
+        """Test if aggregates are merged into supernets adding the fewest addresses"""
+        # 10.0.0.0/24 and 10.0.2.0/24 cost 512 addresses, 10.0.2.0/24 and
+        # 10.0.3.0/25 cost 128
+        records = [(0x0A000000, 24), (0x0A000200, 24), (0x0A000300, 25)]
+        self.assertEqual(fit_budget(records, 32, 3), (records, 0))
+        self.assertEqual(fit_budget(records, 32, 2), ([(0x0A000000, 24), (0x0A000200, 23)], 128))
+        self.assertEqual(fit_budget(records, 32, 1), ([(0x0A000000, 22)], 384))
+        with self.assertRaises(ValueError):
+            fit_budget(records, 32, 0)
+
+        rng = random.Random(0)
+        for _ in range(50):
+            records = sorted({(rng.getrandbits(12) << 12, rng.randint(20, 24)) for _ in range(40)})
+            records = [(network >> (32 - prefixlen) << (32 - prefixlen), prefixlen)
+                       for network, prefixlen in records]
+            aggregates = list(aggregate_sorted(sorted(records), 32))
+            max_prefixes = rng.randint(1, len(aggregates))
+            supernets, added = fit_budget(aggregates, 32, max_prefixes)
+            self.assertLessEqual(len(supernets), max_prefixes)
+            self.assertEqual(supernets, list(aggregate_sorted(supernets, 32)))
+            # Supernets cover every aggregate and exactly the added addresses
+            self.assertEqual(
+                list(aggregate_sorted(sorted(supernets + aggregates), 32)), supernets
+            )
+            self.assertEqual(
+                sum(2 ** (32 - prefixlen) for _, prefixlen in supernets)
+                - sum(2 ** (32 - prefixlen) for _, prefixlen in aggregates),
+                added
+            )
+
+    def test_04__provenance(self):
+        """Test if every aggregate references the inputs it covers"""
+        rng = random.Random(0)
+        for _ in range(100):
+            records = sorted(
+                (network >> (32 - prefixlen) << (32 - prefixlen), prefixlen)
+                for network, prefixlen in (
+                    (rng.getrandbits(10) << 22 >> 12, rng.randint(16, 32)) for _ in range(50)
+                )
+            )
+            aggregates = list(aggregate_sorted_provenance(records, 32))
+            self.assertEqual(
+                [(network, prefixlen) for network, prefixlen, _, _ in aggregates],
+                list(aggregate_sorted(records, 32))
+            )
+            # Index ranges partition sorted input, in order
+            self.assertEqual(
+                [start for _, _, start, _ in aggregates],
+                [0] + [end for _, _, _, end in aggregates][:-1]
+            )
+            self.assertEqual(aggregates[-1][3], len(records))
+            for network, prefixlen, start, end in aggregates:
+                aggregate = ipaddress.ip_network((network, prefixlen))
+                self.assertLess(start, end)
+                for record in records[start:end]:
+                    self.assertTrue(ipaddress.ip_network(record).subnet_of(aggregate))
+        self.assertEqual(list(aggregate_sorted_provenance([], 32)), [])
+
+    def test_05__merge_buddies(self):
+        """Test if buddy merging matches range splitting and the shrinking loop"""
+        rng = random.Random(0)
+        for width, network_class in ((32, ipaddress.IPv4Network), (128, ipaddress.IPv6Network)):
+            for _ in range(200):
+                records = random_records(rng, width, rng.choice((6, 10)))
+                self.assertEqual(
+                    list(merge_buddies(records, width)), list(aggregate_sorted(records, width))
+                )
+                prefixes = [network_class(record) for record in records]
+                for aggregatable in find_aggregatables(prefixes):
+                    self.assertEqual(
+                        list(aggregate_aggregatable(aggregatable)),
+                        list(shrinking_aggregate(aggregatable))
+                    )
+        # Staircases of host routes starting at odd addresses
+        for width in (32, 128):
+            for start in (1, 3, 2**20 - 1):
+                records = [(start + i, width) for i in range(5000)]
+                self.assertEqual(
+                    list(merge_buddies(records, width)), list(aggregate_sorted(records, width))
+                )
+        self.assertEqual(list(merge_buddies([(0, 1), (2**31, 1)], 32)), [(0, 0)])
+        self.assertEqual(list(merge_buddies([], 32)), [])
+        self.assertEqual(list(aggregate_aggregatable([])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
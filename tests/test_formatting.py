@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for output formatting functions
+"""
+
+import ipaddress
+import random
+import unittest
+from io import StringIO
+
+from aggregate_prefixes.__main__ import strip_host_mask
+from aggregate_prefixes.formatting import (
+    format_ipv4,
+    format_ipv6,
+    format_networks,
+    format_records,
+    write_lines,
+)
+
+
+class TestFormatting(unittest.TestCase):
+    """
+    Provide tests for output formatting functions
+    """
+    def test_00__compare_with_ipaddress(self):
+        """Test if addresses are formatted like ipaddress does"""
+        rng = random.Random(0)
+        for _ in range(5000):
+            address = rng.getrandbits(32)
+            self.assertEqual(format_ipv4(address), str(ipaddress.IPv4Address(address)))
+        addresses = [0, 1, 2**128 - 1, 1 << 112, 0xFFFF << 32 | 0xC0000201]
+        for _ in range(5000):
+            address = rng.getrandbits(128)
+            for shift in range(0, 128, 16):
+                if rng.random() < 0.5:
+                    address &= ~(0xFFFF << shift)
+            addresses.append(address)
+        for address in addresses:
+            self.assertEqual(format_ipv6(address), str(ipaddress.IPv6Address(address)))
+
+    def test_01__strip_host_mask(self):
+        """Test if netmask of host routes is stripped on demand"""
+        records = [(0xC0000200, 24), (0xC0000301, 32)]
+        self.assertEqual(list(format_records(records, 4)), ["192.0.2.0/24", "192.0.3.1/32"])
+        self.assertEqual(list(format_records(records, 4, True)), ["192.0.2.0/24", "192.0.3.1"])
+        self.assertEqual(list(format_records([(1, 128)], 6, True)), ["::1"])
+        networks = [ipaddress.ip_network("2001:db8::/32"), ipaddress.ip_network("::1/128")]
+        self.assertEqual(list(format_networks(networks, True)), ["2001:db8::/32", "::1"])
+        self.assertEqual(list(map(strip_host_mask, networks)), ["2001:db8::/32", "::1"])
+
+    def test_02__write_lines(self):
+        """Test if lines are written in batches"""
+        file = StringIO()
+        write_lines(map(str, range(20000)), file)
+        self.assertEqual(file.getvalue(), "".join(f"{line}\n" for line in range(20000)))
+        file = StringIO()
+        write_lines([], file)
+        self.assertEqual(file.getvalue(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for address lookups
+"""
+
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from aggregate_prefixes import Prefix, PrefixIndex
+from aggregate_prefixes.__main__ import main as cli_main
+from aggregate_prefixes.lookup import numpy
+
+
+class TestLookup(unittest.TestCase):
+    """
+    Provide tests for address lookups
+    """
+    def test_00__lookup(self):
+        """Test if addresses are matched against covering aggregates"""
+        index = PrefixIndex(["192.0.2.0/25", "192.0.2.128/25", "10.0.0.0/8", "2001:db8::/32"])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.lookup("192.0.2.255"), Prefix.parse("192.0.2.0/24"))
+        self.assertEqual(index.lookup(ipaddress.ip_address("10.1.2.3")), Prefix.parse("10.0.0.0/8"))
+        self.assertEqual(index.lookup("2001:db8:ffff::1"), Prefix.parse("2001:db8::/32"))
+        self.assertIsNone(index.lookup("192.0.3.0"))
+        self.assertIsNone(index.lookup("9.255.255.255"))
+        self.assertNotIn("::1", index)
+        self.assertIn("10.0.0.0", index)
+        with self.assertRaises(ValueError):
+            index.lookup("192.0.2.0/24")
+        with self.assertRaises(ValueError):
+            PrefixIndex([], engine="gpu")
+
+    def test_01__compare_with_ipaddress(self):
+        """Test if batch lookups match membership tests of network objects"""
+        rng = random.Random(0)
+        prefixes = [
+            f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.0/{rng.randint(20, 24)}"
+            for _ in range(100)
+        ] + ["2001:db8::/48"]
+        networks = [ipaddress.ip_network(prefix, False) for prefix in prefixes]
+        addresses = [
+            f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}"
+            for _ in range(1000)
+        ]
+        expected = [
+            any(ipaddress.ip_address(address) in network for network in networks)
+            for address in addresses
+        ]
+        engines = ["python", "numpy"] if numpy is not None else ["python"]
+        for engine in engines:
+            index = PrefixIndex(prefixes, engine=engine)
+            # Dotted quads only, then mixed with IPv6
+            for batch in (addresses, addresses + ["2001:db8::1", "2001:db8:1::"]):
+                matches = index.lookup_many(batch)
+                self.assertEqual([match is not None for match in matches[:1000]], expected)
+                self.assertEqual(
+                    matches[1000:], [Prefix.parse("2001:db8::/48"), None][:len(batch) - 1000]
+                )
+                for address, match in zip(batch, matches):
+                    if match is not None:
+                        self.assertIn(ipaddress.ip_address(address), match.to_network())
+            self.assertEqual(index.lookup_many([]), [])
+
+    def test_02__cli(self):
+        """Test if match subcommand prints covered addresses"""
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, "w") as file:
+            file.write("192.0.2.0/24\n2001:db8::/32\n")
+        self.addCleanup(os.remove, path)
+        for arguments, expected in (
+            ([], "192.0.2.7\n2001:db8::5\n"),
+            (["--with-prefix"], "192.0.2.7 192.0.2.0/24\n2001:db8::5 2001:db8::/32\n"),
+            (["--invert", "--batch-size", "1"], "10.0.0.1\n"),
+        ):
+            stdout = StringIO()
+            with patch.object(sys, "stdout", stdout), \
+                    patch.object(sys, "stdin", StringIO("192.0.2.7\n10.0.0.1\n2001:db8::5\n")), \
+                    patch.object(sys, "argv", ["prog.py", "match", "--set", path] + arguments):
+                cli_main()
+            self.assertEqual(stdout.getvalue(), expected)
+
+        # Malformed addresses are reported and skipped
+        stdout = StringIO()
+        stderr = StringIO()
+        with patch.object(sys, "stdout", stdout), patch.object(sys, "stderr", stderr), \
+                patch.object(sys, "stdin", StringIO("192.0.2.7\nbogus\n192.0.2.8\n")), \
+                patch.object(sys, "argv", ["prog.py", "match", "--set", path]):
+            cli_main()
+        self.assertEqual(stdout.getvalue(), "192.0.2.7\n192.0.2.8\n")
+        self.assertIn("'bogus' does not appear to be", stderr.getvalue())
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_03__uint32_arrays(self):
+        """Test if IPv4 arrays are read by NumPy as they are"""
+        index = PrefixIndex(["0.0.0.0/32", "10.0.0.0/8", "255.255.255.0/24"])
+        # pylint: disable=protected-access
+        self.assertEqual(index._starts[4].itemsize, 4)
+        self.assertEqual(index._numpy_starts.tolist(), [0, 0x0A000000, 0xFFFFFF00])
+        self.assertEqual(index._numpy_ends.tolist(), [0, 0x0AFFFFFF, 0xFFFFFFFF])
+        self.assertEqual(
+            index.lookup_many(["255.255.255.255", "0.0.0.1"]),
+            [Prefix.parse("255.255.255.0/24"), None]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
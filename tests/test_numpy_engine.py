@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the NumPy vectorized aggregation engine
+"""
+
+import random
+import unittest
+
+from aggregate_prefixes import aggregate_prefixes
+from aggregate_prefixes.engine import aggregate_sorted
+from aggregate_prefixes.numpy_engine import AVAILABLE, _floor_log2, aggregate_records, numpy
+
+
+@unittest.skipUnless(AVAILABLE, "NumPy is not installed")
+class TestNumpyEngine(unittest.TestCase):
+    """
+    Provide tests for the NumPy vectorized aggregation engine
+    """
+    def test_00__compare_with_python_engine(self):
+        """Test if array operations match the integer engine"""
+        rng = random.Random(0)
+        for version, width in ((4, 32), (6, 128)):
+            for _ in range(200):
+                records = []
+                for _ in range(rng.randint(1, 60)):
+                    prefixlen = rng.choice([0, 1, 63, 64, 65] + list(range(width - 10, width + 1)))
+                    prefixlen = min(prefixlen, width)
+                    network = rng.getrandbits(10) << (width - 10)
+                    if rng.random() < 0.1:
+                        network = 2**width - 1
+                    network &= ~((1 << (width - prefixlen)) - 1)
+                    records.append((network, prefixlen))
+                self.assertEqual(
+                    list(aggregate_records(records, version)),
+                    list(aggregate_sorted(sorted(records), width))
+                )
+
+    def test_01__engine_selector(self):
+        """Test if aggregate_prefixes uses the engine"""
+        prefixes = [f"192.0.2.{i}/32" for i in range(5, 200)] + ["10.0.0.0/8", "10.1.0.0/16"]
+        self.assertEqual(
+            list(aggregate_prefixes(prefixes, engine="numpy")),
+            list(aggregate_prefixes(prefixes))
+        )
+        self.assertEqual(list(aggregate_prefixes(["2001:db8::/32"] * 2, engine="numpy")),
+                         list(aggregate_prefixes(["2001:db8::/32"])))
+
+    def test_02__floor_log2(self):
+        """Test if logarithms are exact where float64 rounds up"""
+        values = [1, 2, 3, 2**53 - 1, 2**53 + 1, 2**63 - 1, 2**63, 2**64 - 1]
+        values += [2**bits - 1 for bits in range(54, 64)]
+        self.assertEqual(
+            _floor_log2(numpy.array(values, dtype=numpy.uint64)).tolist(),
+            [value.bit_length() - 1 for value in values]
+        )
+
+    def test_03__ranges(self):
+        """Test if ranges are split in blocks, whole address space included"""
+        for records, expected in (
+            ([(0, 1), (2**31, 1)], [(0, 0)]),
+            ([(2**32 - 1, 32), (0, 32)], [(0, 32), (2**32 - 1, 32)]),
+            (
+                [(16, 32), (8, 29), (1, 32), (4, 30), (2, 31)],
+                [(1, 32), (2, 31), (4, 30), (8, 29), (16, 32)],
+            ),
+            ([(2**31 - 2**24, 8), (2**31, 9)], [(2**31 - 2**24, 8), (2**31, 9)]),
+            ([(2**30, 2), (2**31, 1)], [(2**30, 2), (2**31, 1)]),
+        ):
+            self.assertEqual(list(aggregate_records(records, 4)), expected, records)
+        self.assertEqual(list(aggregate_records([(0, 1), (2**127, 1)], 6)), [(0, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for multi-process aggregation
+"""
+
+import random
+import unittest
+
+from aggregate_prefixes import Stats, aggregate_prefixes
+from aggregate_prefixes.parallel import aggregate_parallel_records
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Provide tests for multi-process aggregation
+    """
+    def test_00__compare_with_single_process(self):
+        """Test if parallel aggregation matches single process aggregation"""
+        rng = random.Random(0)
+        prefixes = [f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.0/24" for _ in range(2000)]
+        self.assertEqual(
+            list(aggregate_prefixes(prefixes, workers=3)),
+            list(aggregate_prefixes(prefixes))
+        )
+
+    def test_01__covering_prefix(self):
+        """Test if prefixes covering other slices are handled correctly"""
+        prefixes = ["192.0.2.0/25", "192.0.2.0/32", "192.0.2.129/32", "192.0.2.128/26",
+                    "192.0.2.192/26", "198.51.100.0/24", "192.0.0.0/16", "192.1.0.0/16"]
+        self.assertEqual(
+            list(aggregate_prefixes(prefixes, workers=4)),
+            list(aggregate_prefixes(prefixes))
+        )
+        self.assertEqual(
+            list(aggregate_prefixes(prefixes, 24, 8, workers=4)),
+            list(aggregate_prefixes(prefixes, 24, 8))
+        )
+
+    def test_02__mix_v4_v6(self):
+        """Test if IPv4 and IPv6 are aggregated independently"""
+        prefixes = ["2001:db8::/33", "192.0.2.0/25", "2001:db8:8000::/33", "192.0.2.128/25"]
+        self.assertEqual(
+            list(aggregate_prefixes(prefixes, workers=2)), list(aggregate_prefixes(prefixes))
+        )
+
+    def test_03__sorted(self):
+        """Test if order is trusted or checked across slices"""
+        prefixes = ["192.0.2.0/26", "192.0.2.64/26", "192.0.2.128/25", "198.51.100.0/24"]
+        for arguments in ({"assume_sorted": True}, {"validate_sorted": True}):
+            self.assertEqual(
+                list(aggregate_prefixes(prefixes, workers=2, **arguments)),
+                list(aggregate_prefixes(prefixes))
+            )
+        # Unsorted within a slice, then across slices only
+        for unsorted in (prefixes[1::-1] + prefixes[2:], prefixes[2:] + prefixes[:2]):
+            with self.assertRaises(ValueError) as context:
+                list(aggregate_prefixes(unsorted, workers=2, validate_sorted=True))
+            self.assertIn("not sorted", str(context.exception))
+
+    def test_04__engines(self):
+        """Test if workers aggregate with the selected engine"""
+        rng = random.Random(0)
+        prefixes = [
+            f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.0/{rng.randint(20, 24)}"
+            for _ in range(500)
+        ] + ["2001:db8::/33", "2001:db8:8000::/33"]
+        expected = list(aggregate_prefixes(prefixes))
+        for engine in ("python", "trie", "numpy"):
+            self.assertEqual(
+                list(aggregate_prefixes(prefixes, workers=3, engine=engine)), expected, engine
+            )
+        # Timings of workers are collected, the trie is built by them
+        stats = Stats()
+        list(aggregate_prefixes(prefixes, workers=3, engine="trie", stats=stats))
+        self.assertIn("build", stats.timings)
+        with self.assertRaises(ValueError):
+            aggregate_parallel_records(prefixes, workers=2, engine="gpu")
+
+
+if __name__ == '__main__':
+    unittest.main()
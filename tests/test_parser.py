@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the fast text parser
+"""
+
+import io
+import ipaddress
+import unittest
+
+from aggregate_prefixes.parser import parse_buffer, parse_prefix, parse_prefixes, read_prefixes
+
+VALID = [
+    "192.0.2.0/24",
+    "192.0.2.1/24",
+    "192.0.2.1",
+    "0.0.0.0/0",
+    "1.2.3.4/024",
+    "1.2.3.4/255.0.0.0",
+    "2001:db8::/32",
+    "2001:DB8::1/64",
+    "::",
+    "::/0",
+    "::1",
+    "1:2:3:4:5:6:7::",
+    "1:2:3:4:5:6:7:8/128",
+    "::ffff:192.0.2.1/128",
+]
+
+INVALID = [
+    "WRONG",
+    "",
+    "1.2.3.4/",
+    "1.2.3.4/33",
+    "01.2.3.4/8",
+    "256.0.0.0/8",
+    "1.2.3/24",
+    " 1.2.3.4",
+    "1.2.3.4/+8",
+    "2001:db8::/129",
+    "1::2:3:4:5:6:7:8",
+    "1:::2",
+    "2001:db8::g/64",
+    "0x1::/16",
+]
+
+
+class TestParser(unittest.TestCase):
+    """
+    Provide tests for the fast text parser
+    """
+    def test_00__valid(self):
+        """Test if valid prefixes are parsed like ipaddress does"""
+        for prefix in VALID:
+            network = ipaddress.ip_network(prefix, False)
+            self.assertEqual(
+                parse_prefix(prefix),
+                (network.version, int(network.network_address), network.prefixlen),
+                prefix
+            )
+
+    def test_01__invalid(self):
+        """Test if invalid prefixes raise the same error ipaddress does"""
+        for prefix in INVALID:
+            with self.assertRaises(ValueError) as context:
+                parse_prefix(prefix)
+            self.assertIn("does not appear", str(context.exception))
+            self.assertIsNone(parse_prefix(prefix, strict=False))
+
+    def test_02__batch(self):
+        """Test if batches are split by IP version and invalid input is skipped"""
+        parsed = parse_prefixes(VALID + INVALID, strict=False)
+        self.assertEqual(len(parsed[4]) + len(parsed[6]), len(VALID))
+        self.assertEqual(parsed[4][0], (0xC0000200, 24))
+        with self.assertRaises(ValueError):
+            parse_prefixes(VALID + INVALID)
+
+    def test_03__buffer(self):
+        """Test if buffers with comments and whitespace are parsed"""
+        self.assertEqual(
+            parse_buffer("192.0.2.0/25 192.0.2.128/25 # comment\n\n#2001:db8::/32\n::1\n"),
+            {4: [(0xC0000200, 25), (0xC0000280, 25)], 6: [(1, 128)]}
+        )
+
+    def test_04__same_tokens(self):
+        """Test if buffers and files read line by line are tokenized alike"""
+        text = (
+            "192.0.2.0/25\t192.0.2.128/25  198.51.100.0/24 # comment\x0c::2\n"
+            "\v::1\u2028#\r\n# 2001:db8::/32\n \t\n203.0.113.0/24"
+        )
+        lines = io.StringIO(text, newline="").readlines()
+        self.assertEqual(
+            list(read_prefixes(lines)),
+            ["192.0.2.0/25", "192.0.2.128/25", "198.51.100.0/24", "::1", "203.0.113.0/24"],
+        )
+        self.assertEqual(
+            parse_buffer(text.replace("\r\n", "\n")), parse_prefixes(read_prefixes(lines))
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for compact prefix types
+"""
+
+import ipaddress
+import random
+import unittest
+
+from aggregate_prefixes import Prefix, PrefixArray, aggregate_prefixes
+
+
+class TestPrefix(unittest.TestCase):
+    """
+    Provide tests for Prefix and PrefixArray
+    """
+    def test_00__prefix(self):
+        """Test if Prefix behaves like a network object"""
+        for text in ("192.0.2.0/24", "10.0.0.1/32", "2001:db8::/32", "::/0", "::ffff:0:0/96"):
+            network = ipaddress.ip_network(text)
+            prefix = Prefix.parse(text)
+            self.assertEqual(str(prefix), str(network))
+            self.assertEqual(prefix.to_network(), network)
+            self.assertEqual(prefix.num_addresses, network.num_addresses)
+            self.assertEqual(prefix.broadcast, int(network.broadcast_address))
+            self.assertEqual(prefix.max_prefixlen, network.max_prefixlen)
+            self.assertEqual(Prefix.parse(network), prefix)
+        self.assertEqual(repr(Prefix.parse("192.0.2.0/24")), "Prefix('192.0.2.0/24')")
+
+    def test_01__order_and_hash(self):
+        """Test if Prefix sorts like aggregates and is hashable"""
+        texts = ["2001:db8::/32", "192.0.2.0/25", "192.0.2.0/24", "10.0.0.0/8"]
+        prefixes = sorted(map(Prefix.parse, texts))
+        self.assertEqual(
+            list(map(str, prefixes)),
+            ["10.0.0.0/8", "192.0.2.0/24", "192.0.2.0/25", "2001:db8::/32"]
+        )
+        self.assertEqual(len(set(map(Prefix.parse, texts + texts))), 4)
+
+    def test_02__array(self):
+        """Test if PrefixArray keeps prefixes in flat arrays"""
+        texts = ["192.0.2.0/24", "2001:db8::/32", "10.0.0.0/8", "2001:db8:ffff::1/128"]
+        prefixes = PrefixArray(texts)
+        self.assertEqual(len(prefixes), 4)
+        self.assertEqual(
+            list(map(str, prefixes)),
+            ["192.0.2.0/24", "10.0.0.0/8", "2001:db8::/32", "2001:db8:ffff::1/128"]
+        )
+        self.assertEqual(prefixes[-1], Prefix.parse("2001:db8:ffff::1/128"))
+        self.assertEqual(prefixes[1:3], PrefixArray(["10.0.0.0/8", "2001:db8::/32"]))
+        self.assertEqual(prefixes.nbytes, 2 * 5 + 2 * 17)
+        with self.assertRaises(IndexError):
+            prefixes[4]  # pylint: disable=pointless-statement
+
+    def test_03__result_type(self):
+        """Test if compact results match network results"""
+        rng = random.Random(0)
+        for version, template in ((4, "10.0.{}.{}/{}"), (6, "2001:db8::{:x}:{:x}/{}")):
+            prefixes = [
+                str(ipaddress.ip_network(
+                    template.format(rng.randint(0, 255), rng.randint(0, 255), rng.randint(
+                        20 if version == 4 else 112, 32 if version == 4 else 128
+                    )),
+                    False,
+                ))
+                for _ in range(500)
+            ]
+            compact = aggregate_prefixes(prefixes, result_type="compact")
+            self.assertIsInstance(compact, PrefixArray)
+            self.assertEqual(
+                [prefix.to_network() for prefix in compact], list(aggregate_prefixes(prefixes))
+            )
+        with self.assertRaises(ValueError):
+            aggregate_prefixes([], result_type="bytes")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,13 +7,24 @@ Regression tests for package aggregate-prefixes
 from __future__ import absolute_import
 
 import io
+import json
+import os
+import random
 import sys
 import ipaddress
+import tempfile
 import unittest
 
 from unittest.mock import patch
 
-from aggregate_prefixes import aggregate_prefixes
+from aggregate_prefixes import (
+    Stats,
+    aggregate_prefixes,
+    aggregate_provenance,
+    aggregate_records,
+    diff_aggregates,
+    merge_aggregates,
+)
 from aggregate_prefixes.__main__ import main as cli_main
 
 
@@ -61,11 +72,12 @@ class TestAggregatePrefixes(unittest.TestCase):
         )
 
     def test_02__mix_v4_v6_default(self):
-        """Test if error is raised when mixing IPv4 and IPv6"""
-        with self.assertRaises(Exception) as context:
-            list(aggregate_prefixes(["192.0.2.0/24", "2001:db8::/32"]))
-        self.assertIn(
-            "are not of the same version", str(context.exception)
+        """Test if IPv4 and IPv6 are aggregated independently, IPv4 first"""
+        self.assertEqual(
+            list(aggregate_prefixes(
+                ["2001:db8::/33", "192.0.2.0/25", "2001:db8:8000::/33", "192.0.2.128/25"]
+            )),
+            [ipaddress.ip_network("192.0.2.0/24"), ipaddress.ip_network("2001:db8::/32")]
         )
 
     def test_03__lot_of_ipv4(self):
@@ -152,6 +164,217 @@ class TestAggregatePrefixes(unittest.TestCase):
             cli_main()
         self.assertEqual(sys.stdout.getvalue(), '192.0.2.1\n192.0.2.2/31\n')
 
+    def test_11__stream(self):
+        """Test if stream mode is handled correctly"""
+        stub_stdin(self, '192.0.2.1/32\n192.0.2.2/32\n192.0.2.3/32 # comment\n')
+        stub_stdouts(self)
+        with patch.object(sys, 'argv', ["prog.py", "--stream", "--chunk-size", "1", "-"]):
+            cli_main()
+        self.assertEqual(sys.stdout.getvalue(), '192.0.2.1/32\n192.0.2.2/31\n')
+
+    def test_12__jobs(self):
+        """Test if jobs are handled correctly"""
+        stub_stdin(self, '192.0.2.1/32\n192.0.2.2/32\n192.0.2.3/32\n192.0.2.0/32\n')
+        stub_stdouts(self)
+        with patch.object(sys, 'argv', ["prog.py", "-j", "2", "-"]):
+            cli_main()
+        self.assertEqual(sys.stdout.getvalue(), '192.0.2.0/30\n')
+
+    def test_13__stats(self):
+        """Test if stats are collected and printed"""
+        stats = Stats()
+        list(aggregate_prefixes(
+            ["192.0.2.0/25", "192.0.2.0/26", "192.0.2.128/25", "198.51.100.0/32"],
+            max_length=31, stats=stats
+        ))
+        self.assertEqual(
+            (stats.inputs, stats.filtered, stats.covered, stats.chunks, stats.aggregates),
+            (4, 1, 1, 1, 1)
+        )
+        self.assertIn("parse", stats.timings)
+
+        stub_stdin(self, '192.0.2.1/32\n192.0.2.2/32\n192.0.2.3/32\n')
+        stub_stdouts(self)
+        argv = ["prog.py", "--stats", "--stats-format", "json", "-t", "31", "-"]
+        with patch.object(sys, 'argv', argv):
+            cli_main()
+        self.assertEqual(sys.stdout.getvalue(), '192.0.2.0/30\n')
+        output = json.loads(sys.stderr.getvalue())
+        self.assertEqual((output["inputs"], output["truncated"]), (3, 3))
+
+    def test_14__assume_sorted(self):
+        """Test if sorted input is aggregated without sorting"""
+        pfxs = ["192.0.2.0/25", "192.0.2.0/26", "192.0.2.128/25", "198.51.100.0/24"]
+        self.assertEqual(
+            list(aggregate_prefixes(pfxs, assume_sorted=True)),
+            list(aggregate_prefixes(pfxs))
+        )
+        self.assertEqual(
+            list(aggregate_prefixes(pfxs, validate_sorted=True)),
+            list(aggregate_prefixes(pfxs))
+        )
+        with self.assertRaises(ValueError) as context:
+            list(aggregate_prefixes(pfxs[::-1], validate_sorted=True))
+        self.assertIn("not sorted", str(context.exception))
+
+    def test_15__merge_aggregates(self):
+        """Test if sorted aggregates are merged and aggregated again"""
+        self.assertEqual(
+            list(merge_aggregates(
+                ["192.0.2.0/26", "192.0.2.128/25"],
+                iter(["192.0.2.64/26", "198.51.100.0/24"]),
+                [],
+                [ipaddress.ip_network("192.0.2.0/25")]
+            )),
+            [ipaddress.ip_network("192.0.2.0/24"), ipaddress.ip_network("198.51.100.0/24")]
+        )
+        with self.assertRaises(ValueError):
+            list(merge_aggregates(["192.0.2.128/25", "192.0.2.0/25"]))
+        self.assertEqual(
+            list(merge_aggregates(["2001:db8::/32"], ["192.0.2.0/25", "192.0.2.128/25"])),
+            [ipaddress.ip_network("192.0.2.0/24"), ipaddress.ip_network("2001:db8::/32")]
+        )
+        self.assertEqual(list(merge_aggregates()), [])
+
+    def test_16__max_prefixes(self):
+        """Test if max prefixes is handled correctly"""
+        stats = Stats()
+        self.assertEqual(
+            list(aggregate_prefixes(
+                ["10.0.0.0/24", "10.0.2.0/24", "10.0.3.0/25"], max_prefixes=2, stats=stats
+            )),
+            [ipaddress.ip_network("10.0.0.0/24"), ipaddress.ip_network("10.0.2.0/23")]
+        )
+        self.assertEqual(stats.added, 128)
+        self.assertEqual(
+            list(aggregate_prefixes(["10.0.0.0/24", "10.0.2.0/24"], max_prefixes=1, workers=2)),
+            [ipaddress.ip_network("10.0.0.0/22")]
+        )
+        stub_stdin(self, '192.0.2.1/32\n192.0.2.4/32\n')
+        stub_stdouts(self)
+        with patch.object(sys, 'argv', ["prog.py", "--max-prefixes", "1", "-"]):
+            cli_main()
+        self.assertEqual(sys.stdout.getvalue(), '192.0.2.0/29\n')
+        self.assertEqual(
+            sys.stderr.getvalue(), 'Added 6 addresses to fit 1 prefixes per IP version\n'
+        )
+        # The budget applies to every IP version
+        stub_stdin(self, '192.0.2.1/32\n192.0.2.4/32\n2001:db8::/128\n2001:db8::2/128\n')
+        stub_stdouts(self)
+        with patch.object(sys, 'argv', ["prog.py", "--max-prefixes", "1", "-"]):
+            cli_main()
+        self.assertEqual(sys.stdout.getvalue(), '192.0.2.0/29\n2001:db8::/126\n')
+        self.assertEqual(
+            sys.stderr.getvalue(), 'Added 8 addresses to fit 1 prefixes per IP version\n'
+        )
+        self.assertEqual(
+            list(aggregate_prefixes(
+                ["2001:db8::/128", "192.0.2.1/32", "2001:db8::2/128", "192.0.2.4/32"],
+                max_prefixes=1,
+            )),
+            [ipaddress.ip_network("192.0.2.0/29"), ipaddress.ip_network("2001:db8::/126")]
+        )
+        for argv in (["--stream"], ["--input-format", "bin"]):
+            stub_stdouts(self)
+            with patch.object(sys, 'argv', ["prog.py", "--max-prefixes", "1", *argv, "-"]):
+                with self.assertRaises(SystemExit):
+                    cli_main()
+            self.assertIn("--max-prefixes is not available", sys.stderr.getvalue())
+
+    def test_17__provenance(self):
+        """Test if aggregates reference the inputs they cover"""
+        prefixes = ["192.0.2.128/25", "10.0.0.1/32", "192.0.2.0/25", "10.0.0.0/32", "10.0.0.0/8"]
+        self.assertEqual(
+            aggregate_provenance(prefixes, max_length=25),
+            [(
+                4,
+                [(0x0A000000, 8), (0xC0000200, 25), (0xC0000280, 25)],
+                [(0x0A000000, 8, 0, 1), (0xC0000200, 24, 1, 3)],
+            )]
+        )
+        stub_stdin(self, "\n".join(prefixes) + "\n")
+        stub_stdouts(self)
+        with patch.object(sys, 'argv', ["prog.py", "--provenance", "-"]):
+            cli_main()
+        self.assertEqual(
+            [json.loads(line) for line in sys.stdout.getvalue().splitlines()],
+            [
+                {
+                    "aggregate": "10.0.0.0/8",
+                    "start": 0,
+                    "end": 3,
+                    "inputs": ["10.0.0.0/8", "10.0.0.0/32", "10.0.0.1/32"],
+                },
+                {
+                    "aggregate": "192.0.2.0/24",
+                    "start": 3,
+                    "end": 5,
+                    "inputs": ["192.0.2.0/25", "192.0.2.128/25"],
+                },
+            ]
+        )
+
+    def test_18__diff_aggregates(self):
+        """Test if only added and removed aggregates are returned"""
+        self.assertEqual(
+            list(diff_aggregates(
+                ["10.0.0.0/8", "192.0.2.0/24", "2001:db8::/32"],
+                iter(["10.0.0.0/8", "192.0.2.0/25", "2001:db8::/32", "2001:db8:1::/48"])
+            )),
+            [
+                ("-", ipaddress.ip_network("192.0.2.0/24")),
+                ("+", ipaddress.ip_network("192.0.2.0/25")),
+                ("+", ipaddress.ip_network("2001:db8:1::/48")),
+            ]
+        )
+        rng = random.Random(0)
+        for _ in range(50):
+            previous = {ipaddress.ip_network((rng.getrandbits(8) << 24, 8)) for _ in range(20)}
+            current = {ipaddress.ip_network((rng.getrandbits(8) << 24, 8)) for _ in range(20)}
+            deltas = list(diff_aggregates(sorted(previous), sorted(current)))
+            self.assertEqual(
+                deltas,
+                sorted(
+                    [("-", prefix) for prefix in previous - current]
+                    + [("+", prefix) for prefix in current - previous],
+                    key=lambda delta: delta[1]
+                )
+            )
+        with self.assertRaises(ValueError):
+            list(diff_aggregates(["192.0.2.128/25", "192.0.2.0/25"], []))
+        self.assertEqual(list(diff_aggregates([], [])), [])
+
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, "w") as file:
+            file.write("192.0.2.0/25\n192.0.2.128/32\n198.51.100.0/24\n")
+        self.addCleanup(os.remove, path)
+        for arguments in (["-s"], ["-s", "--stream"]):
+            stub_stdin(self, '192.0.2.0/25\n198.51.100.0/24\n2001:db8::1/128\n')
+            stub_stdouts(self)
+            with patch.object(sys, 'argv', ["prog.py", "--previous", path, *arguments, "-"]):
+                cli_main()
+            self.assertEqual(sys.stdout.getvalue(), '-192.0.2.128\n+2001:db8::1\n')
+
+    def test_19__invalid_lengths(self):
+        """Test if lengths out of range are refused the same way by every entry point"""
+        prefixes = ["10.0.0.0/25", "2001:db8::/48"]
+        for arguments in ({"truncate": -1}, {"truncate": 129}, {"max_length": -1}):
+            for engine in ("python", "trie", "numpy"):
+                with self.assertRaisesRegex(ValueError, "Invalid"):
+                    aggregate_records(prefixes, engine=engine, **arguments)
+                with self.assertRaisesRegex(ValueError, "Invalid"):
+                    list(aggregate_prefixes(prefixes, engine=engine, **arguments))
+            with self.assertRaisesRegex(ValueError, "Invalid"):
+                aggregate_records(prefixes, workers=2, **arguments)
+            with self.assertRaisesRegex(ValueError, "Invalid"):
+                aggregate_provenance(prefixes, **arguments)
+        for arguments in (["-t", "-1"], ["-m", "200"], ["--stream", "-t", "-1"]):
+            stub_stdin(self, '10.0.0.0/25\n')
+            stub_stdouts(self)
+            with patch.object(sys, 'argv', ["prog.py", *arguments, "-"]):
+                with self.assertRaisesRegex(SystemExit, "ERROR: Invalid"):
+                    cli_main()
+
 
 class StringIO(io.StringIO):
     """A "safely" wrapped version of StringIO"""
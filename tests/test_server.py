@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the aggregation service
+"""
+
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from aggregate_prefixes import server
+from aggregate_prefixes.client import aggregate_remote
+from aggregate_prefixes.server import serve
+
+
+class TestServer(unittest.TestCase):
+    """
+    Provide tests for the aggregation service
+    """
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "aggregate-prefixes.sock")
+        self.addCleanup(os.rmdir, directory)
+
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        async def run():
+            ready = asyncio.Event()
+            task = asyncio.ensure_future(serve(self.path, workers=1, inline_limit=2, started=ready))
+            await ready.wait()
+            started.set()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        def target():
+            self.task = self.loop.create_task(run())
+            try:
+                self.loop.run_until_complete(self.task)
+            finally:
+                self.loop.close()
+
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+        self.assertTrue(started.wait(10))
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(10)
+
+    def test_00__round_trip(self):
+        """Test if client returns aggregates"""
+        self.assertEqual(
+            list(aggregate_remote(["192.0.2.1/32"], self.path, strip_host_mask=True)),
+            ["192.0.2.1"]
+        )
+
+    def test_01__executor(self):
+        """Test if requests larger than inline limit are aggregated by workers"""
+        prefixes = ["192.0.2.0/26", "192.0.2.64/26", "192.0.2.128/25", "10.0.0.0/8"]
+        self.assertEqual(
+            list(aggregate_remote(prefixes, self.path)),
+            ["10.0.0.0/8", "192.0.2.0/24"]
+        )
+
+    def test_02__error(self):
+        """Test if errors are reported to client"""
+        with self.assertRaisesRegex(ValueError, "does not appear to be"):
+            list(aggregate_remote(["not a prefix"], self.path))
+
+    def test_03__pipelining(self):
+        """Test if pipelined requests are answered in order"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(self.path)
+            connection.sendall(
+                b"AGGREGATE truncate=24\n192.0.2.1/32\n.\n"
+                b"BOGUS\n192.0.2.1/32\n.\n"
+                b"AGGREGATE max-length=64\n2001:db8::/32 2001:db8::1/128\n.\n"
+            )
+            connection.shutdown(socket.SHUT_WR)
+            with connection.makefile("r") as response:
+                self.assertEqual(
+                    response.read(),
+                    "192.0.2.0/24\n.\nERROR: Unknown command: BOGUS\n.\n2001:db8::/32\n.\n"
+                )
+
+    def test_04__invalid_options(self):
+        """Test if requests with invalid options are answered without dropping the connection"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(self.path)
+            connection.sendall(
+                b"AGGREGATE truncate=-1\n192.0.2.1/32\n.\n"
+                b"AGGREGATE max-length=129\n192.0.2.1/32\n.\n"
+                b"AGGREGATE truncate=24\n192.0.2.1/32\n.\n"
+            )
+            connection.shutdown(socket.SHUT_WR)
+            with connection.makefile("r") as response:
+                self.assertEqual(
+                    response.read(),
+                    "ERROR: Invalid truncate length: -1\n.\n"
+                    "ERROR: Invalid maximum length: 129\n.\n"
+                    "192.0.2.0/24\n.\n"
+                )
+
+        # Unexpected failures are reported too
+        with patch.object(server, "aggregate_request", side_effect=RuntimeError("boom")), \
+                self.assertLogs("aggregate_prefixes.server", "ERROR"):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(self.path)
+                connection.sendall(b"AGGREGATE\n192.0.2.1/32\n.\nAGGREGATE\n10.0.0.0/8\n.\n")
+                connection.shutdown(socket.SHUT_WR)
+                with connection.makefile("r") as response:
+                    self.assertEqual(response.read(), "ERROR: boom\n.\nERROR: boom\n.\n")
+
+
+
+    def test_05__listening(self):
+        """Test if sockets other servers listen on are left alone"""
+        with self.assertRaisesRegex(FileExistsError, "a server is listening"):
+            asyncio.run(serve(self.path, workers=1))
+        self.assertEqual(list(aggregate_remote(["192.0.2.1/32"], self.path)), ["192.0.2.1/32"])
+
+
+class TestSocket(unittest.TestCase):
+    """
+    Provide tests for the Unix socket lifecycle
+    """
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "aggregate-prefixes.sock")
+        self.addCleanup(os.rmdir, directory)
+
+    def run_server(self, replace: bool = False) -> None:
+        """Starts and stops the server, optionally replacing its socket meanwhile"""
+        async def run():
+            ready = asyncio.Event()
+            task = asyncio.ensure_future(serve(self.path, workers=1, started=ready))
+            await ready.wait()
+            if replace:
+                os.remove(self.path)
+                with open(self.path, "w", encoding="utf-8"):
+                    pass
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(run())
+
+    def test_00__cleanup(self):
+        """Test if stale sockets are replaced and removed on shutdown"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(self.path)
+        self.run_server()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_01__not_a_socket(self):
+        """Test if files other than sockets are left alone"""
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("data")
+        self.addCleanup(os.remove, self.path)
+        with self.assertRaisesRegex(FileExistsError, "not a socket"):
+            asyncio.run(serve(self.path, workers=1))
+        with open(self.path, encoding="utf-8") as file:
+            self.assertEqual(file.read(), "data")
+
+    def test_02__replaced(self):
+        """Test if sockets replaced while serving are not removed on shutdown"""
+        self.addCleanup(os.remove, self.path)
+        self.run_server(replace=True)
+        self.assertTrue(os.path.isfile(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for set operations
+"""
+
+import gzip
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from aggregate_prefixes import difference, intersection, symmetric_difference, union
+from aggregate_prefixes.__main__ import main as cli_main
+
+
+def addresses(prefixes):
+    """Expands prefixes into the set of their addresses"""
+    return {
+        address
+        for prefix in prefixes
+        for address in ipaddress.ip_network(prefix, False)
+    }
+
+
+class TestSetOperations(unittest.TestCase):
+    """
+    Provide tests for set operations
+    """
+    def test_00__difference(self):
+        """Test if excluded prefixes are punched out"""
+        self.assertEqual(
+            list(map(str, difference(["192.0.2.0/24", "2001:db8::/32"], ["192.0.2.128/26"]))),
+            ["192.0.2.0/25", "192.0.2.192/26", "2001:db8::/32"]
+        )
+
+    def test_01__compare_with_sets(self):
+        """Test if operations match set operations over addresses"""
+        rng = random.Random(0)
+        operations = (
+            (difference, set.difference),
+            (intersection, set.intersection),
+            (union, set.union),
+            (symmetric_difference, set.symmetric_difference),
+        )
+        for _ in range(50):
+            left, right = (
+                [f"10.0.0.{rng.randint(0, 255)}/{rng.randint(25, 32)}" for _ in range(8)]
+                for _ in range(2)
+            )
+            for operation, expected in operations:
+                result = list(operation(left, right))
+                self.assertEqual(addresses(result), expected(addresses(left), addresses(right)))
+                # Output is minimal: no two results can be merged
+                self.assertEqual(list(union(result, [])), result)
+
+    def test_02__cli(self):
+        """Test if set operations are available as subcommands"""
+        paths = []
+        for content in ("192.0.2.0/24\n2001:db8::/32\n", "192.0.2.0/25 # comment\n"):
+            handle, path = tempfile.mkstemp()
+            with os.fdopen(handle, "w") as file:
+                file.write(content)
+            self.addCleanup(os.remove, path)
+            paths.append(path)
+        stdout = StringIO()
+        with patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'argv', ["prog.py", "diff"] + paths):
+            cli_main()
+        self.assertEqual(stdout.getvalue(), "192.0.2.128/25\n2001:db8::/32\n")
+
+        # Operands are decompressed
+        handle, path = tempfile.mkstemp(suffix=".gz")
+        with os.fdopen(handle, "wb") as file:
+            file.write(gzip.compress(b"192.0.2.128/25\n"))
+        self.addCleanup(os.remove, path)
+        stdout = StringIO()
+        with patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'argv', ["prog.py", "union", paths[1], path]):
+            cli_main()
+        self.assertEqual(stdout.getvalue(), "192.0.2.0/24\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for multi-file input
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+from aggregate_prefixes import aggregate_prefixes
+from aggregate_prefixes.__main__ import main as cli_main
+from aggregate_prefixes.sources import (
+    _submit_ahead,
+    aggregate_by_source,
+    aggregate_sources,
+    expand_sources,
+)
+
+
+class TestSources(unittest.TestCase):
+    """
+    Provide tests for multi-file input
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        rng = random.Random(0)
+        self.contents = []
+        for index in range(5):
+            prefixes = [
+                f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.0/{rng.randint(22, 24)}"
+                for _ in range(200)
+            ]
+            self.contents.append(prefixes)
+            with open(self.path(f"peer{index}.txt"), "w", encoding="utf-8") as file:
+                file.write("# peer\n" + "\n".join(prefixes) + "\n")
+
+    def path(self, name):
+        """Returns path of a file in the temporary directory"""
+        return os.path.join(self.directory, name)
+
+    def test_00__expand_sources(self):
+        """Test if glob patterns are expanded in order"""
+        self.assertEqual(
+            expand_sources(["-", self.path("peer[3-4].txt"), self.path("peer0.txt")]),
+            ["-", self.path("peer3.txt"), self.path("peer4.txt"), self.path("peer0.txt")]
+        )
+        with self.assertRaises(ValueError):
+            expand_sources([self.path("*.csv")])
+
+    def test_01__combined(self):
+        """Test if files are aggregated together, in one or more processes"""
+        paths = expand_sources([self.path("*.txt")])
+        expected = [
+            (int(aggregate.network_address), aggregate.prefixlen)
+            for aggregate in aggregate_prefixes(sum(self.contents, []))
+        ]
+        for workers in (1, 2):
+            self.assertEqual(aggregate_sources(paths, workers=workers), [(4, expected)])
+
+    def test_02__by_source(self):
+        """Test if every file is aggregated on its own"""
+        paths = expand_sources([self.path("*.txt")])
+        for workers in (1, 2):
+            for (path, groups), prefixes in zip(
+                aggregate_by_source(paths, workers=workers), self.contents
+            ):
+                self.assertTrue(path.endswith(".txt"))
+                self.assertEqual(
+                    groups[0][1],
+                    [
+                        (int(aggregate.network_address), aggregate.prefixlen)
+                        for aggregate in aggregate_prefixes(prefixes)
+                    ]
+                )
+
+    def test_03__errors(self):
+        """Test if errors name the file"""
+        with open(self.path("bogus.txt"), "w", encoding="utf-8") as file:
+            file.write("192.0.2.0/24\nbogus\n")
+        for workers in (1, 2):
+            with self.assertRaisesRegex(ValueError, "bogus.txt: .*bogus"):
+                aggregate_sources([self.path("peer0.txt"), self.path("bogus.txt")], workers=workers)
+            with self.assertRaisesRegex(ValueError, "can't open .*missing.txt"):
+                aggregate_sources([self.path("missing.txt")], workers=workers)
+
+    def test_04__cli(self):
+        """Test if several files are accepted by CLI"""
+        with open(self.path("a.list"), "w", encoding="utf-8") as file:
+            file.write("192.0.2.0/25\n")
+        with open(self.path("b.list"), "w", encoding="utf-8") as file:
+            file.write("192.0.2.128/25 # comment\n")
+        stdout = StringIO()
+        with patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'argv', ["prog.py", self.path("*.list")]):
+            cli_main()
+        self.assertEqual(stdout.getvalue(), "192.0.2.0/24\n")
+
+        stdout = StringIO()
+        with patch.object(sys, 'stdout', stdout), \
+                patch.object(sys, 'argv', ["prog.py", "--group-by-source", self.path("*.list")]):
+            cli_main()
+        self.assertEqual(
+            stdout.getvalue(),
+            f"# {self.path('a.list')}\n192.0.2.0/25\n# {self.path('b.list')}\n192.0.2.128/25\n"
+        )
+
+    def test_05__read_ahead(self):
+        """Test if sources are submitted at most window tasks ahead"""
+        submitted = []
+
+        def submit(path):
+            submitted.append(path)
+            return path
+
+        paths = [f"peer{index}.txt" for index in range(5)]
+        consumed = []
+        for path, _ in _submit_ahead(paths, submit, 2):
+            self.assertLessEqual(len(submitted) - len(consumed), 3)
+            consumed.append(path)
+        self.assertEqual(consumed, paths)
+
+
+if __name__ == '__main__':
+    unittest.main()
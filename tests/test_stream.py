@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for bounded memory aggregation
+"""
+
+import random
+import unittest
+from unittest.mock import patch
+
+from aggregate_prefixes import aggregate_prefixes, stream
+from aggregate_prefixes.stream import aggregate_stream, pack_records, unpack_records
+
+
+class TestStream(unittest.TestCase):
+    """
+    Provide tests for bounded memory aggregation
+    """
+    def test_00__records(self):
+        """Test if binary records survive a round trip"""
+        for version, records in ((4, [(0, 0), (2**32 - 1, 32)]), (6, [(0, 0), (2**128 - 1, 128)])):
+            self.assertEqual(list(unpack_records(pack_records(records, version), version)), records)
+
+    def test_01__spill(self):
+        """Test if spilled chunks aggregate like aggregate_prefixes does"""
+        rng = random.Random(0)
+        for address in ("192.0.2.{}/32", "2001:db8::{:x}/128"):
+            prefixes = [address.format(rng.randint(0, 255)) for _ in range(500)]
+            lines = [" ".join(prefixes[i:i + 3]) + " # comment" for i in range(0, 500, 3)]
+            self.assertEqual(
+                list(aggregate_stream(lines, chunk_size=7)),
+                list(aggregate_prefixes(prefixes))
+            )
+
+    def test_02__max_length_truncate(self):
+        """Test if max_length and truncate are applied"""
+        lines = ["192.0.2.0/25", "192.0.2.128/26", "192.0.2.192/26", "198.51.100.1"]
+        self.assertEqual(
+            list(aggregate_stream(lines, 25, chunk_size=2)),
+            list(aggregate_prefixes(lines, 25))
+        )
+        self.assertEqual(
+            list(aggregate_stream(lines, truncate=16, chunk_size=2)),
+            list(aggregate_prefixes(lines, truncate=16))
+        )
+
+    def test_03__mix_v4_v6(self):
+        """Test if IPv4 and IPv6 are aggregated independently"""
+        prefixes = ["2001:db8::/33", "192.0.2.0/25", "2001:db8:8000::/33", "192.0.2.128/25"]
+        self.assertEqual(
+            list(aggregate_stream(prefixes, chunk_size=1)), list(aggregate_prefixes(prefixes))
+        )
+
+    def test_04__fan_in(self):
+        """Test if spill files are merged in intermediate runs, chunk_size prefixes each"""
+        rng = random.Random(0)
+        prefixes = [f"10.0.{rng.randint(0, 255)}.0/{rng.randint(23, 24)}" for _ in range(500)]
+        lines = [" ".join(prefixes[i:i + 10]) + " # comment" for i in range(0, 500, 10)]
+        with patch.object(stream, "_spill", wraps=stream._spill) as spill, \
+                patch.object(stream, "_merge_spills", wraps=stream._merge_spills) as merge:
+            self.assertEqual(
+                list(aggregate_stream(lines, chunk_size=7, fan_in=3)),
+                list(aggregate_prefixes(prefixes))
+            )
+        self.assertTrue(all(len(call.args[0]) <= 7 for call in spill.call_args_list))
+        self.assertTrue(all(len(call.args[0]) <= 3 for call in merge.call_args_list))
+        self.assertGreater(merge.call_count, 10)
+        with self.assertRaises(ValueError):
+            list(aggregate_stream(lines, fan_in=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
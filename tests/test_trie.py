@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the path-compressed binary trie
+"""
+
+import ipaddress
+import random
+import unittest
+
+from aggregate_prefixes import PrefixTrie, aggregate_prefixes
+
+
+class TestTrie(unittest.TestCase):
+    """
+    Provide tests for the binary trie
+    """
+    def test_00__collapse(self):
+        """Test if siblings and covered children are collapsed"""
+        trie = PrefixTrie(["192.0.2.0/25", "192.0.2.128/26", "192.0.2.192/27"])
+        trie.add("192.0.2.224/27")
+        self.assertEqual(list(trie.aggregates()), [ipaddress.ip_network("192.0.2.0/24")])
+        trie.add("192.0.0.0/16")
+        self.assertEqual(list(trie.aggregates()), [ipaddress.ip_network("192.0.0.0/16")])
+
+    def test_01__compare_with_python_engine(self):
+        """Test if trie engine matches python engine"""
+        rng = random.Random(0)
+        for address in ("10.0.{}.{}/{}", "2001:db8::{:x}:{:x}/{}"):
+            for _ in range(20):
+                prefixes = [
+                    address.format(rng.randint(0, 3), rng.randint(0, 255), rng.randint(14, 32))
+                    for _ in range(rng.randint(1, 100))
+                ]
+                self.assertEqual(
+                    list(aggregate_prefixes(prefixes, engine="trie")),
+                    list(aggregate_prefixes(prefixes))
+                )
+
+    def test_02__covers_lookup(self):
+        """Test if coverage and lookup queries are answered"""
+        trie = PrefixTrie(["2001:db8::/33", "2001:db8:8000::/33", "2001:db9::/48"])
+        self.assertTrue(trie.covers("2001:db8:1234::/48"))
+        self.assertIn("2001:db8::/32", trie)
+        self.assertNotIn("2001:db8::/31", trie)
+        self.assertNotIn("192.0.2.0/24", trie)
+        self.assertEqual(trie.lookup("2001:db9::1"), ipaddress.ip_network("2001:db9::/48"))
+        self.assertEqual(
+            trie.lookup(ipaddress.ip_address("2001:db8::1")),
+            ipaddress.ip_network("2001:db8::/32")
+        )
+        self.assertIsNone(trie.lookup("2001:db9:1::1"))
+
+    def test_03__node_recycling(self):
+        """Test if released nodes are recycled"""
+        trie = PrefixTrie(f"192.0.2.{i}/32" for i in range(0, 256, 2))
+        nodes = len(trie._full)  # pylint: disable=protected-access
+        trie.add("192.0.2.0/24")
+        trie.add("198.51.100.0/24")
+        self.assertEqual(len(trie._full), nodes)  # pylint: disable=protected-access
+        self.assertEqual(len(list(trie.aggregates())), 2)
+
+    def test_04__mix_v4_v6(self):
+        """Test if IPv4 and IPv6 are aggregated independently, IPv4 first"""
+        trie = PrefixTrie(["2001:db8::/33", "0.0.0.0/1", "2001:db8:8000::/33", "128.0.0.0/1"])
+        self.assertEqual(
+            list(trie.aggregates()),
+            [ipaddress.ip_network("0.0.0.0/0"), ipaddress.ip_network("2001:db8::/32")]
+        )
+        self.assertEqual(list(trie.records(6)), [(0x20010DB8 << 96, 32)])
+        self.assertIn("192.0.2.0/24", trie)
+        self.assertNotIn("::/0", trie)
+        self.assertEqual(trie.lookup("2001:db8::1"), ipaddress.ip_network("2001:db8::/32"))
+
+    def test_05__path_compression(self):
+        """Test if single-child paths are skipped"""
+        prefixes = [f"2001:db8:{i:x}::/48" for i in range(3, 3000, 3)]
+        trie = PrefixTrie(prefixes)
+        nodes = len(trie._full)  # pylint: disable=protected-access
+        # Roots, aggregates and one branching node per aggregate but one
+        self.assertEqual(nodes, 2 + 2 * len(prefixes) - 1)
+        self.assertEqual(list(map(str, trie.aggregates())), prefixes)
+        self.assertTrue(trie.covers("2001:db8:3:1::/64"))
+        self.assertFalse(trie.covers("2001:db8:4::/48"))
+        self.assertFalse(trie.covers("2001:db8::/46"))
+        trie = PrefixTrie(["10.0.0.0/24", "10.0.2.0/24"])
+        trie.add("10.0.1.0/24")
+        trie.add("10.0.3.0/24")
+        self.assertEqual(list(trie.records(4)), [(0x0A000000, 22)])
+
+    def test_06__lookup_addresses_only(self):
+        """Test if lookup refuses prefixes other than host routes"""
+        trie = PrefixTrie(["192.0.2.0/24"])
+        self.assertEqual(trie.lookup("192.0.2.1/32"), ipaddress.ip_network("192.0.2.0/24"))
+        for prefix in ("192.0.2.0/24", "192.0.2.0/31", "2001:db8::/64"):
+            with self.assertRaises(ValueError):
+                trie.lookup(prefix)
+
+
+if __name__ == '__main__':
+    unittest.main()